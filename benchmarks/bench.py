@@ -0,0 +1,254 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import click
+from rich.console import Console
+
+from pdh import Filters, Transformations, accessor
+from pdh.main import incident_transformations
+from pdh.output import print_items, VALID_OUTPUTS
+
+import synthetic
+
+"""
+  Benchmarks of the incidents pipeline: filter, transform, sort and render, on synthetic datasets.
+
+  python benchmarks/bench.py generate -s 10k -o /tmp/pdh-10k
+  python benchmarks/bench.py run -s 1k,10k -o results.json
+  python benchmarks/bench.py compare baseline.json results.json
+  python benchmarks/bench.py importtime -b 150
+"""
+
+DEFAULT_FIELDS = ["id", "assignee", "title", "status", "created_at", "service.summary"]
+ALERT_FIELDS = ["status", "created_at", "service.summary", "body.details"]
+# relative slowdown reported as a regression by compare
+DEFAULT_THRESHOLD = 0.10
+# milliseconds allowed to import the CLI entry point
+DEFAULT_IMPORT_BUDGET = 150
+# modules the CLI must not import before running a command needing them
+HEAVY_MODULES = ["rich", "pagerduty", "requests", "jsonpath_ng", "yaml", "dikdik", "pdh.core", "pdh.pd"]
+
+
+def cases(data: Dict[str, List[Dict]], outputs: List[str]) -> Dict[str, Callable[[], Any]]:
+    """Build the benchmarked callables over the given dataset"""
+    incs = data["incidents"]
+    title_re = re.compile(".*EC2.*")
+    transformations = incident_transformations(list(DEFAULT_FIELDS), ALERT_FIELDS)
+    transformed = Transformations.apply(incs, transformations)
+    projection = Transformations.Projection(transformations)
+
+    def render(items: List[Dict], output: str) -> None:
+        console = Console(file=io.StringIO(), width=200)
+        print_items(items, output, plain_print_f=lambda i: console.print("\t".join(f"{v}" for v in i.values())), console=console)
+
+    def pipeline(output: str) -> Callable[[], None]:
+        def f() -> None:
+            items = Filters.apply(incs, filters=[Filters.regexp("title", title_re)])
+            items = Transformations.apply(items, incident_transformations(list(DEFAULT_FIELDS), ALERT_FIELDS))
+            items = sorted(items, key=lambda x: x["created_at"])
+            render(items, output)
+        return f
+
+    # reading one field per item: jsonpath parsed for every item (as before pdh.accessor), compiled once, plain dotted lookup
+    def read(get: Callable[[Dict], Any]) -> Callable[[], None]:
+        return lambda: [get(i) for i in incs] and None
+
+    import jsonpath_ng
+    jsonpath = accessor.compile("assignments[0].assignee.summary")
+
+    ret: Dict[str, Callable[[], Any]] = {
+        "field.jsonpath_per_item": read(lambda i: [m.value for m in jsonpath_ng.parse("service.summary").find(i)]),
+        "field.jsonpath_compiled": read(lambda i: jsonpath.find(i)),
+        "field.dotted": read(accessor.compile("service.summary").find),
+        "filter.regexp": lambda: Filters.apply(incs, filters=[Filters.regexp("title", title_re)]),
+        "filter.eq": lambda: Filters.apply(incs, filters=[Filters.eq("status", "triggered"), Filters.eq("urgency", "high")]),
+        "filter.chain": lambda: Filters.apply(incs, filters=[Filters.regexp("title", title_re), Filters.inStr("description", "db"), Filters.eq("urgency", "high"), Filters.eq("status", "resolved")]),
+        "filter.inList": lambda: Filters.apply(incs, filters=[Filters.inList("service.summary", [s["name"] for s in data["services"][:10]])]),
+        "transform.extract": lambda: Transformations.apply(incs, {"id": Transformations.extract("id"), "service": Transformations.extract("service.summary")}),
+        "transform.extract_date": lambda: Transformations.apply(incs, {"created_at": Transformations.extract_date("created_at")}),
+        "transform.extract_decorate": lambda: Transformations.apply(incs, {"status": transformations["status"], "title": transformations["title"]}),
+        "transform.fields": lambda: Transformations.apply(incs, incident_transformations(list(DEFAULT_FIELDS), ALERT_FIELDS)),
+        "transform.projection": lambda: Transformations.apply(incs, projection),
+        "sort": lambda: sorted(transformed, key=lambda x: [x["assignee"], x["status"]]),
+    }
+    if "alerts" in incs[0]:
+        alerts = {"alerts": Transformations.extract_alerts("alerts", ALERT_FIELDS)}
+        ret["transform.extract_alerts"] = lambda: Transformations.apply(incs, alerts)
+    for output in outputs:
+        ret[f"render.{output}"] = (lambda o: lambda: render(transformed, o))(output)
+        ret[f"pipeline.{output}"] = pipeline(output)
+    try:
+        from pdh.columnar import Columns, Frame
+    except ImportError:
+        return ret
+    columnar_fields = ["title", "description", "status", "urgency", "service.summary", "created_at"]
+    frame = Frame.from_items(incs, columnar_fields)
+    services = [s["name"] for s in data["services"][:10]]
+    ret["columnar.build"] = lambda: Frame.from_items(incs, columnar_fields)
+    ret["columnar.eq"] = lambda: frame.apply([Columns.eq("status", "triggered"), Columns.eq("urgency", "high")]).items()
+    ret["columnar.inList"] = lambda: frame.apply([Columns.inList("service.summary", services)]).items()
+    ret["columnar.chain"] = lambda: frame.apply([Columns.regexp("title", title_re), Columns.regexp("description", "db"), Columns.eq("urgency", "high"), Columns.eq("status", "resolved")]).items()
+    ret["columnar.sort"] = lambda: frame.sort(["status", "created_at"]).items(limit=50)
+    ret["columnar.counts"] = lambda: frame.counts("service.summary", "status")
+    return ret
+
+
+def import_time(module: str) -> Dict[str, Any]:
+    """Import module in a fresh interpreter, return the cumulative import time (ms) and the imported modules"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    imported: Dict[str, float] = {}
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported[name.strip()] = int(cumulative) / 1000
+    return {"ms": imported.get(module, 0.0), "modules": imported}
+
+
+def measure(f: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings), "max": max(timings), "repeat": repeat}
+
+
+@click.group(help="pdh benchmarks")
+def main():
+    pass
+
+
+@main.command(help="Write a synthetic dataset as json files (incidents, users, services, teams)")
+@click.option("-s", "--size", default="1k", help="Number of incidents: 1k, 10k, 100k or any number")
+@click.option("-a", "--alerts", default=0, help="Alerts embedded in every incident")
+@click.option("--seed", default=42, help="Random seed")
+@click.option("-o", "--out", required=True, help="Output directory")
+def generate(size, alerts, seed, out):
+    data = synthetic.dataset(synthetic.size(size), seed=seed, alerts=alerts)
+    os.makedirs(out, exist_ok=True)
+    for kind, items in data.items():
+        with open(os.path.join(out, f"{kind}_list.json"), "w") as f:
+            json.dump(items, f)
+        print(f"{kind}: {len(items)}")
+
+
+@main.command(help="Run the benchmarks and save the timings as json")
+@click.option("-s", "--sizes", default="1k,10k", help="Comma separated dataset sizes")
+@click.option("-a", "--alerts", default=2, help="Alerts embedded in every incident")
+@click.option("--outputs", default=",".join(o for o in VALID_OUTPUTS), help="Comma separated output formats to render")
+@click.option("-k", "--filter", "name_re", default=None, help="Run only the benchmarks matching this regexp")
+@click.option("-r", "--repeat", default=3, help="Runs per benchmark")
+@click.option("--seed", default=42, help="Random seed")
+@click.option("-o", "--out", default=None, help="Save the results to this file")
+def run(sizes, alerts, outputs, name_re, repeat, seed, out):
+    results: Dict[str, Dict[str, float]] = {}
+    for s in sizes.split(","):
+        n = synthetic.size(s)
+        data = synthetic.dataset(n, seed=seed, alerts=alerts)
+        for name, f in cases(data, outputs.split(",")).items():
+            if name_re and not re.search(name_re, name):
+                continue
+            key = f"{name}@{s}"
+            results[key] = measure(f, repeat)
+            results[key]["per_item"] = results[key]["median"] / n
+            print(f"{key:<40} {results[key]['median'] * 1000:>12.2f} ms {results[key]['per_item'] * 1e6:>10.2f} us/item", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "alerts": alerts,
+        },
+        "results": results,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+@main.command(help="Compare two result files, exit with 1 if any benchmark is slower than threshold")
+@click.argument("baseline")
+@click.argument("current")
+@click.option("-t", "--threshold", default=DEFAULT_THRESHOLD, help="Relative slowdown reported as a regression (0.1 = 10%)")
+def compare(baseline, current, threshold):
+    with open(baseline) as f:
+        base = json.load(f)["results"]
+    with open(current) as f:
+        cur = json.load(f)["results"]
+
+    rows = []
+    regressions = 0
+    for key in sorted(set(base) & set(cur)):
+        before, after = base[key]["median"], cur[key]["median"]
+        change = (after - before) / before if before else 0.0
+        verdict = "ok"
+        if change > threshold:
+            verdict = "[red]slower[/red]"
+            regressions += 1
+        elif change < -threshold:
+            verdict = "[green]faster[/green]"
+        rows.append({"benchmark": key, "baseline ms": f"{before * 1000:.2f}", "current ms": f"{after * 1000:.2f}", "change": f"{change:+.1%}", "": verdict})
+    print_items(rows, "table")
+
+    missing = sorted(set(base) - set(cur))
+    if missing:
+        print(f"Not run: {', '.join(missing)}")
+    sys.exit(1 if regressions else 0)
+
+
+@main.command(help="Measure the cold import of the CLI, exit with 1 if over budget or if heavy modules are imported")
+@click.option("-m", "--module", default="pdh.main", help="Module to import")
+@click.option("-b", "--budget", default=DEFAULT_IMPORT_BUDGET, help="Milliseconds allowed for the import (best of the runs)")
+@click.option("-r", "--repeat", default=5, help="Fresh interpreters to run")
+def importtime(module, budget, repeat):
+    runs = [import_time(module) for _ in range(repeat)]
+    best = min(r["ms"] for r in runs)
+    print(f"import {module}: best {best:.1f} ms, median {statistics.median(r['ms'] for r in runs):.1f} ms (budget {budget} ms)")
+
+    heavy = sorted({m for r in runs for m in r["modules"] if any(m == h or m.startswith(h + ".") for h in HEAVY_MODULES)})
+    top = sorted(runs[0]["modules"].items(), key=lambda m: m[1], reverse=True)[:10]
+    print_items([{"module": m, "cumulative ms": f"{ms:.1f}"} for m, ms in top], "table")
+
+    failed = False
+    if heavy:
+        print(f"Heavy modules imported: {', '.join(heavy)}")
+        failed = True
+    if best > budget:
+        print(f"Over budget by {best - budget:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import random
+import string
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+"""
+  Synthetic module generates PagerDuty shaped users, teams, services, incidents and alerts.
+  Entities follow the REST API v2 schema of the fixtures in tests/, the same seed always produces the same data.
+"""
+
+API = "https://api.pagerduty.com"
+WEB = "https://subdomain.pagerduty.com"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+WORDS = ["disk", "cpu", "memory", "latency", "errors", "backup", "EC2", "RDS", "kafka", "api", "queue", "certificate",
+         "replication", "timeout", "5xx", "node", "pod", "ingress", "dns", "billing", "login", "[prod]", "[staging]"]
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Linus", "Margaret", "Dennis", "Barbara", "Ken", "Frances", "Edsger", "Vito", "Earline"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Torvalds", "Hamilton", "Ritchie", "Liskov", "Thompson", "Allen", "Dijkstra", "Catozzo"]
+STATUSES = ["triggered", "acknowledged", "resolved"]
+URGENCIES = ["high", "low"]
+
+
+def size(value: str | int) -> int:
+    """Parse a dataset size: 1k, 10k, 100k or a plain number"""
+    if isinstance(value, int):
+        return value
+    return SIZES[value] if value in SIZES else int(value)
+
+
+class Generator(object):
+
+    def __init__(self, seed: int = 42, now: datetime | None = None) -> None:
+        self.random = random.Random(seed)
+        self.now = now or datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def id(self, prefix: str = "P", length: int = 7) -> str:
+        return prefix + "".join(self.random.choices(string.ascii_uppercase + string.digits, k=length - len(prefix)))
+
+    def date(self, max_age: timedelta = timedelta(days=30), after: datetime | None = None) -> datetime:
+        start = after or self.now - max_age
+        return start + timedelta(seconds=self.random.randint(0, max(0, int((self.now - start).total_seconds()))))
+
+    def reference(self, kind: str, id: str, summary: str, path: str | None = None) -> Dict[str, Any]:
+        path = path or f"{kind}s/{id}"
+        return {"id": id, "type": f"{kind}_reference", "summary": summary, "self": f"{API}/{path}", "html_url": f"{WEB}/{path}"}
+
+    def teams(self, n: int) -> List[Dict]:
+        ret = []
+        for _ in range(n):
+            id = self.id()
+            name = f"{self.random.choice(WORDS).strip('[]').capitalize()} team {id[-3:]}"
+            ret.append({"id": id, "type": "team", "summary": name, "name": name, "description": None,
+                        "self": f"{API}/teams/{id}", "html_url": f"{WEB}/teams/{id}", "default_role": "manager", "parent": None})
+        return ret
+
+    def users(self, n: int, teams: List[Dict]) -> List[Dict]:
+        ret = []
+        for _ in range(n):
+            id = self.id()
+            first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+            name = f"{first} {last}"
+            ret.append({
+                "id": id,
+                "type": "user",
+                "summary": name,
+                "self": f"{API}/users/{id}",
+                "html_url": f"{WEB}/users/{id}",
+                "name": name,
+                "email": f"{first.lower()}.{last.lower()}.{id.lower()}@example.com",
+                "time_zone": "Europe/Rome",
+                "color": "green",
+                "role": self.random.choice(["admin", "user", "limited_user"]),
+                "avatar_url": f"https://secure.gravatar.com/avatar/{id}.png?d=mm&r=PG",
+                "description": None,
+                "invitation_sent": False,
+                "contact_methods": [self.reference("email_contact_method", self.id(), "Default", f"users/{id}/contact_methods/{self.id()}")],
+                "notification_rules": [self.reference("assignment_notification_rule", self.id(), "Default", f"users/{id}/notification_rules/{self.id()}")],
+                "job_title": "Engineer",
+                "teams": [self.reference("team", t["id"], t["name"]) for t in self.random.sample(teams, k=min(len(teams), self.random.randint(1, 2)))],
+            })
+        return ret
+
+    def services(self, n: int, teams: List[Dict]) -> List[Dict]:
+        ret = []
+        for _ in range(n):
+            id = self.id()
+            name = f"{self.random.choice(['SAAS', 'Platform', 'Payments', 'Search'])} {self.random.choice(WORDS)} {id[-3:]}"
+            ret.append({
+                "id": id,
+                "type": "service",
+                "summary": name,
+                "self": f"{API}/services/{id}",
+                "html_url": f"{WEB}/service-directory/{id}",
+                "name": name,
+                "description": None,
+                "status": self.random.choice(["active", "warning", "critical", "disabled"]),
+                "created_at": self.date(timedelta(days=900)).strftime(DATE_FORMAT),
+                "escalation_policy": self.reference("escalation_policy", self.id(), f"{name} policy"),
+                "teams": [self.reference("team", t["id"], t["name"]) for t in self.random.sample(teams, k=min(len(teams), 1))],
+                "alert_creation": "create_alerts_and_incidents",
+            })
+        return ret
+
+    def alerts(self, incident: Dict, n: int) -> List[Dict]:
+        ret = []
+        for _ in range(n):
+            id = self.id("Q", 14)
+            ret.append({
+                "id": id,
+                "type": "alert",
+                "summary": incident["title"],
+                "self": f"{API}/alerts/{id}",
+                "html_url": f"{WEB}/alerts/{id}",
+                "created_at": incident["created_at"],
+                "status": self.random.choice(["triggered", "resolved"]),
+                "alert_key": self.id("", 32),
+                "service": incident["service"],
+                "severity": self.random.choice(["critical", "error", "warning", "info"]),
+                "incident": self.reference("incident", incident["id"], incident["summary"]),
+                "body": {"type": "alert_body", "details": {"description": incident["description"], "host": f"node-{self.random.randint(1, 500)}"}},
+            })
+        return ret
+
+    def incidents(self, n: int, users: List[Dict], services: List[Dict], teams: List[Dict], alerts: int = 0) -> List[Dict]:
+        ret = []
+        for number in range(n):
+            id = self.id("Q", 14)
+            created = self.date()
+            changed = self.date(after=created)
+            status = self.random.choices(STATUSES, weights=[5, 4, 1])[0]
+            service = self.random.choice(services)
+            assignees = self.random.sample(users, k=min(len(users), self.random.randint(1, 2)))
+            title = " ".join(self.random.choices(WORDS, k=self.random.randint(3, 8)))
+            inc = {
+                "incident_number": 100_000 + number,
+                "title": title,
+                "description": title,
+                "created_at": created.strftime(DATE_FORMAT),
+                "status": status,
+                "incident_key": None,
+                "service": self.reference("service", service["id"], service["name"], f"services/{service['id']}"),
+                "assignments": [{"at": created.strftime(DATE_FORMAT), "assignee": self.reference("user", u["id"], u["name"])} for u in assignees],
+                "assigned_via": "escalation_policy",
+                "last_status_change_at": changed.strftime(DATE_FORMAT),
+                "first_trigger_log_entry": self.reference("trigger_log_entry", self.id("R", 26), "Triggered through the API", f"log_entries/{self.id('R', 26)}"),
+                "alert_counts": {"all": max(1, alerts), "triggered": 1, "resolved": 0},
+                "is_mergeable": True,
+                "escalation_policy": service["escalation_policy"],
+                "teams": service["teams"],
+                "pending_actions": [{"type": "unacknowledge", "at": self.date(after=changed).strftime(DATE_FORMAT)}] if status == "acknowledged" else [],
+                "acknowledgements": [{"at": changed.strftime(DATE_FORMAT), "acknowledger": self.reference("user", assignees[0]["id"], assignees[0]["name"])}] if status == "acknowledged" else [],
+                "basic_alert_grouping": None,
+                "alert_grouping": None,
+                "last_status_change_by": self.reference("user", assignees[0]["id"], assignees[0]["name"]),
+                "priority": None,
+                "incidents_responders": [],
+                "responder_requests": [],
+                "subscriber_requests": [],
+                "urgency": self.random.choices(URGENCIES, weights=[1, 3])[0],
+                "id": id,
+                "type": "incident",
+                "summary": f"[#{100_000 + number}] {title}",
+                "self": f"{API}/incidents/{id}",
+                "html_url": f"{WEB}/incidents/{id}",
+            }
+            if alerts:
+                inc["alerts"] = self.alerts(inc, alerts)
+            ret.append(inc)
+        return ret
+
+
+def dataset(n: int, seed: int = 42, alerts: int = 0) -> Dict[str, List[Dict]]:
+    """Generate a consistent account with n incidents, directories scale with the incidents"""
+    g = Generator(seed)
+    teams = g.teams(max(2, n // 500))
+    users = g.users(max(5, n // 20), teams)
+    services = g.services(max(3, n // 50), teams)
+    return {
+        "teams": teams,
+        "users": users,
+        "services": services,
+        "incidents": g.incidents(n, users, services, teams, alerts),
+    }
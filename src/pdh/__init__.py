@@ -14,11 +14,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
-from . import transformations as _Transformations
-from .filters import Filter as _Filters
-from .pd import PagerDuty as _PagerDuty
+import importlib
 
-# Exposing Internal things
-Transformations = _Transformations
-Filters = _Filters
-PagerDuty = _PagerDuty
+# Exposing Internal things, imported on first access (PEP 562): `import pdh` must stay cheap
+# for the CLI and the rules, the API client and the jsonpath parser are loaded only when used
+_EXPORTS = {
+    "Transformations": ("transformations", None),
+    "Filters": ("filters", "Filter"),
+    "PagerDuty": ("pd", "PagerDuty"),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _EXPORTS[name]
+    value = importlib.import_module(f".{module}", __name__)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
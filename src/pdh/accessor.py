@@ -0,0 +1,98 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import functools
+import re
+from typing import Any, Callable, List
+
+"""
+  Accessor module compiles field paths once and reads them from many items.
+
+  Plain dotted paths (service.summary) are read with direct dictionary lookups, any other
+  JSONPath expression (assignments[0].assignee.id, alerts[*].id) is parsed once by jsonpath_ng.
+  Both return the same matches: a dotted path only walks dictionaries, a key holding None is a match.
+"""
+
+# returned by Path.get when nothing matches and no default is given
+MISSING = object()
+
+# the identifiers jsonpath_ng reads as fields, minus its reserved words
+PLAIN = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*(\.[A-Za-z_][A-Za-z0-9_\-]*)*")
+RESERVED = {"where", "wherenot"}
+
+
+def is_plain(path: str) -> bool:
+    """True if path is a dotted path of field names"""
+    return PLAIN.fullmatch(path) is not None and not any(k in RESERVED for k in path.split("."))
+
+
+def _lookup(keys: List[str]) -> Callable[[Any, Any], Any]:
+    if len(keys) == 1:
+        key = keys[0]
+
+        def get_one(item: Any, default: Any = MISSING) -> Any:
+            if isinstance(item, dict):
+                return item.get(key, default)
+            return default
+        return get_one
+
+    def get(item: Any, default: Any = MISSING) -> Any:
+        for k in keys:
+            if not isinstance(item, dict) or k not in item:
+                return default
+            item = item[k]
+        return item
+    return get
+
+
+class Path(object):
+    """A compiled field path"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.plain = is_plain(path)
+        if self.plain:
+            self.keys = path.split(".")
+            self.get = _lookup(self.keys)
+        else:
+            import jsonpath_ng
+
+            self.expr = jsonpath_ng.parse(path)
+            self.get = self._first
+
+    def __repr__(self) -> str:
+        return f"Path({self.path!r})"
+
+    def _first(self, item: Any, default: Any = MISSING) -> Any:
+        matches = self.expr.find(item)
+        return matches[0].value if matches else default
+
+    def find(self, item: Any) -> List[Any]:
+        """All the values matching the path, as jsonpath_ng.parse(path).find(item) would return them"""
+        if self.plain:
+            value = self.get(item)
+            return [] if value is MISSING else [value]
+        return [m.value for m in self.expr.find(item)]
+
+    def __call__(self, item: Any, default: Any = None) -> Any:
+        """The first value matching the path, default if none"""
+        return self.get(item, default)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile(path: str) -> Path:
+    """Compile a path, the same path is compiled only once"""
+    return Path(path)
@@ -0,0 +1,513 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import asyncio
+import json
+import re
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Dict, List
+from rich import print
+
+from pagerduty import Error, HttpError, UrlError, ITERATION_LIMIT, TIMEOUT, canonical_path, entity_wrappers, truncate_text, unwrap
+
+from .config import Config
+from .cache import DirectoryCache
+from .index import DirectoryIndex
+from . import executor
+from . import metrics
+from . import scheduler
+from .executor import TaskResult
+from .pd import (
+    PagerDuty,
+    Incidents,
+    Directory,
+    BulkUpdate,
+    UnauthorizedException,
+    RuleExecutionError,
+    RuleInvalidOutput,
+    DEFAULT_STATUSES,
+    DEFAULT_URGENCIES,
+    STATUS_ACK,
+    STATUS_RESOLVED,
+    BULK_UPDATE_LIMIT,
+    BULK_UPDATE_RETRIES,
+    MATCH_MAX_AGE,
+    log_entry_incidents,
+    log_entry_params,
+    match_services,
+    rule_output,
+    user_teams,
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+"""
+  Aio module is the asyncio counterpart of the PagerDuty facade, for applications embedding pdh in an event loop.
+  Methods have the same names of the synchronous ones and must be awaited, paginated listings are async generators.
+  Requests share the rate limit scheduler and the metrics registry of the synchronous client,
+  the on disk cache is read and written in a worker thread not to block the event loop.
+  It requires httpx: pip install 'pdh[async]'
+"""
+
+BASE_URL = "https://api.pagerduty.com"
+PAGE_SIZE = 100
+NETWORK_ATTEMPTS = 5
+# seconds before retrying after a network error, doubled at every attempt
+NETWORK_BACKOFF = 0.5
+
+
+def successful(response: "httpx.Response") -> "httpx.Response":
+    """Raise HttpError if the response is not a success"""
+    if response.is_success:
+        return response
+    raise HttpError(f"{response.request.method} {response.request.url}: API responded with error (status {response.status_code}): {truncate_text(response.text)}", response)
+
+
+class AsyncSession(object):
+    """
+    Minimal asyncio REST API v2 client on top of httpx.AsyncClient.
+    At most `concurrency` requests are in flight at the same time, over a pool of as many connections.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        default_from: str | None = None,
+        concurrency: int = executor.DEFAULT_WORKERS,
+        scheduler: scheduler.Scheduler | None = None,
+        registry: metrics.Registry = metrics.registry,
+        transport: Any = None,
+        base_url: str = BASE_URL,
+    ) -> None:
+        if httpx is None:
+            raise ImportError("the asyncio client requires httpx: pip install 'pdh[async]'")
+        headers = {
+            "Authorization": f"Token token={api_key}",
+            "Accept": "application/vnd.pagerduty+json;version=2",
+            "Content-Type": "application/json",
+        }
+        if default_from:
+            headers["From"] = default_from
+        self.url = base_url
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.scheduler = scheduler
+        self.metrics = registry
+        self.max_network_attempts = NETWORK_ATTEMPTS
+
+    def canonical_path(self, url: str) -> str:
+        try:
+            return canonical_path(self.url, url)
+        except UrlError:
+            return url
+
+    async def request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        """
+        Send a request, retrying network errors and throttled responses.
+        Raises UnauthorizedException on 401 and, like the synchronous client, Error once the network attempts are exhausted
+        """
+        method = method.upper()
+        response = None
+        attempts = 0
+        failures = 0
+        throttled = 0
+        waited = 0.0
+        start = time.perf_counter()
+        try:
+            async with self.semaphore:
+                while True:
+                    attempts += 1
+                    if self.scheduler:
+                        waited += await self.scheduler.acquire_async()
+                    try:
+                        response = await self.client.request(method, url, **kwargs)
+                    except httpx.TransportError as e:
+                        failures += 1
+                        if failures >= self.max_network_attempts:
+                            raise Error(f"{method} {url}: Non-transient network error; exceeded maximum number of attempts "
+                                        f"({self.max_network_attempts}) to connect to the API.") from e
+                        await asyncio.sleep(NETWORK_BACKOFF * 2 ** (failures - 1))
+                        continue
+                    if self.scheduler:
+                        self.scheduler.observe(response)
+                    if response.status_code == 429 and throttled < scheduler.MAX_THROTTLED_RETRIES:
+                        throttled += 1
+                        continue
+                    break
+        finally:
+            params = kwargs.get("params") or {}
+            self.metrics.record(
+                method,
+                self.canonical_path(url),
+                response.status_code if response is not None else None,
+                time.perf_counter() - start,
+                retries=attempts - 1,
+                size=len(response.content) if response is not None else 0,
+                page="offset" in params or "cursor" in params,
+                waited=waited,
+            )
+        if response.status_code == 401:
+            raise UnauthorizedException(f"{method} {url}: API key rejected")
+        return response
+
+    async def get(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("PUT", url, **kwargs)
+
+    async def _wrapped(self, method: str, url: str, **kwargs) -> Any:
+        try:
+            request_wrapper, response_wrapper = entity_wrappers(method, canonical_path(self.url, url))
+        except UrlError:
+            request_wrapper, response_wrapper = None, None
+        if request_wrapper is not None and "json" in kwargs:
+            kwargs["json"] = {request_wrapper: kwargs["json"]}
+        return unwrap(successful(await self.request(method, url, **kwargs)), response_wrapper)
+
+    async def rget(self, url: str, **kwargs) -> Any:
+        """GET an entity, returning the unwrapped body"""
+        return await self._wrapped("GET", url, **kwargs)
+
+    async def rput(self, url: str, **kwargs) -> Any:
+        """PUT an entity (or a list of entities), wrapping the request body and unwrapping the response"""
+        return await self._wrapped("PUT", url, **kwargs)
+
+    async def rpost(self, url: str, **kwargs) -> Any:
+        """POST an entity, wrapping the request body and unwrapping the response"""
+        return await self._wrapped("POST", url, **kwargs)
+
+    async def iter_all(self, url: str, params: Dict | None = None, page_size: int = PAGE_SIZE) -> AsyncIterator[Any]:
+        """Iterate over all the results of a classic (offset based) paginated listing, fetching a page at a time"""
+        _, wrapper = entity_wrappers("GET", canonical_path(self.url, url))
+        data = dict(params or {})
+        data["limit"] = page_size
+        offset = 0
+        while offset + page_size <= ITERATION_LIMIT:
+            data["offset"] = offset
+            body = successful(await self.request("GET", url, params=data)).json()
+            items = body.get(wrapper) or []
+            for i in items:
+                yield i
+            if not body.get("more") or not items:
+                break
+            offset += len(items)
+
+    async def list_all(self, url: str, params: Dict | None = None, page_size: int = PAGE_SIZE) -> List[Any]:
+        return [i async for i in self.iter_all(url, params=params, page_size=page_size)]
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class AsyncPagerDuty(object):
+    """
+    The asyncio PagerDuty facade: the same attributes of PagerDuty, every call must be awaited.
+
+        async with AsyncPagerDuty(cfg) as pd:
+            incs = await pd.incidents.list()
+            me = await pd.me
+    """
+
+    INCIDENT_STATUS_TRIGGERED = PagerDuty.INCIDENT_STATUS_TRIGGERED
+    INCIDENT_STATUS_ACK = PagerDuty.INCIDENT_STATUS_ACK
+    INCIDENT_STATUS_RESOLVED = PagerDuty.INCIDENT_STATUS_RESOLVED
+
+    INCIDENT_URGENCY_HIGH = PagerDuty.INCIDENT_URGENCY_HIGH
+    INCIDENT_URGENCY_LOW = PagerDuty.INCIDENT_URGENCY_LOW
+
+    DEFAULT_STATUSES = DEFAULT_STATUSES
+    DEFAULT_URGENCIES = DEFAULT_URGENCIES
+
+    def __init__(self, cfg: Config, transport: Any = None) -> None:
+        self.cfg: Config = cfg
+        self.scheduler = scheduler.shared(cfg["apikey"], cfg["rate_limit"] if "rate_limit" in cfg else scheduler.DEFAULT_RATE_LIMIT)
+        self.session = AsyncSession(
+            cfg["apikey"],
+            default_from=cfg["email"],
+            concurrency=cfg["workers"] if "workers" in cfg else executor.DEFAULT_WORKERS,
+            scheduler=self.scheduler,
+            transport=transport,
+        )
+        self.metrics: metrics.Registry = self.session.metrics
+        self.cache = DirectoryCache.for_config(cfg)
+        self.users = AsyncUsers(self.cfg, self.session, self.cache)
+        self.services = AsyncServices(self.cfg, self.session, self.cache)
+        self.incidents = AsyncIncidents(self.cfg, self.session)
+        self.teams = AsyncTeams(self.cfg, self.session, self.cache)
+        self._abilities: List | Dict | None = None
+        self._me: List[Any] | Dict[Any, Any] | None = None
+
+    async def __aenter__(self) -> "AsyncPagerDuty":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.session.aclose()
+
+    @property
+    def abilities(self) -> Awaitable[List | Dict]:
+        """The account abilities, loaded on first use: await pd.abilities"""
+        return self._load_abilities()
+
+    async def _load_abilities(self) -> List | Dict:
+        if self._abilities is None:
+            self._abilities = await asyncio.to_thread(self.cache.get_value, "abilities")
+        if self._abilities is None:
+            try:
+                self._abilities = await self.session.rget("/abilities")
+            except Error as e:
+                raise UnauthorizedException(str(e))
+            await asyncio.to_thread(self.cache.set_value, "abilities", self._abilities)
+        return self._abilities
+
+    @property
+    def me(self) -> Awaitable[List[Any] | Dict[Any, Any]]:
+        """The user owning the API key, loaded on first use: await pd.me"""
+        return self._load_me()
+
+    async def _load_me(self) -> List[Any] | Dict[Any, Any]:
+        if self._me is None:
+            self._me = await asyncio.to_thread(self.cache.get_value, "me")
+        if self._me is None:
+            try:
+                self._me = await self.session.rget("/users/me")
+                await asyncio.to_thread(self.cache.set_value, "me", self._me)
+            except UnauthorizedException:
+                raise
+            except Error:
+                self._me = {}
+        return self._me
+
+
+class AsyncIncidents(object):
+
+    params = staticmethod(Incidents.params)
+    references = staticmethod(Incidents.references)
+
+    def __init__(self, cfg: Config, session: AsyncSession) -> None:
+        self.cfg = cfg
+        self.session = session
+        self.workers: int = cfg["workers"] if "workers" in cfg else executor.DEFAULT_WORKERS
+
+    async def list(self, userid: List | None = None, statuses: List = DEFAULT_STATUSES, urgencies: List = DEFAULT_URGENCIES, teams=None, services=None,
+                   since: str | None = None, until: str | None = None) -> List[Any]:
+        """List all incidents"""
+        return await self.session.list_all("incidents", params=self.params(userid, statuses, urgencies, teams, services, since, until))
+
+    def iter(self, userid: List | None = None, statuses: List = DEFAULT_STATUSES, urgencies: List = DEFAULT_URGENCIES, teams=None, services=None,
+             since: str | None = None, until: str | None = None) -> AsyncIterator[Any]:
+        """Iterate over all incidents, fetching a page at a time: async for i in pd.incidents.iter()"""
+        return self.session.iter_all("incidents", params=self.params(userid, statuses, urgencies, teams, services, since, until))
+
+    async def changed_since(self, since: datetime, teams: List[str] | None = None, services: List[str] | None = None, limit: int | None = None) -> List[str]:
+        """Return the IDs of the incidents with at least one log entry since the given time, see Incidents.changed_since"""
+        ids: Dict[str, None] = {}
+        async for entry in self.session.iter_all("log_entries", params=log_entry_params(since, teams)):
+            ids.update(dict.fromkeys(log_entry_incidents([entry], services)))
+            if limit is not None and len(ids) > limit:
+                break
+        return list(ids)
+
+    async def mine(self, statuses: List = DEFAULT_STATUSES, urgencies: List = DEFAULT_URGENCIES) -> List:
+        """List all incidents assigned to the configured UserID"""
+        return await self.list([self.cfg["uid"]], statuses, urgencies)
+
+    async def alerts(self, id: str) -> Dict | List:
+        return await self.session.rget(f"/incidents/{id}/alerts")
+
+    async def alerts_batch(self, ids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Retrieve the alerts of many incidents concurrently, one result per ID in the same order"""
+        return await executor.run_async(self.alerts, ids, workers=workers or self.workers)
+
+    async def get(self, id: str) -> Dict | List:
+        """Retrieve a single incident by ID"""
+        return await self.session.rget(f"/incidents/{id}")
+
+    async def get_many(self, ids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Retrieve many incidents by ID concurrently, one result per ID in the same order"""
+        return await executor.run_async(self.get, ids, workers=workers or self.workers)
+
+    async def ack(self, incs) -> List[TaskResult]:
+        return await self.change_status(incs, STATUS_ACK)
+
+    async def resolve(self, incs) -> List[TaskResult]:
+        return await self.change_status(incs, STATUS_RESOLVED)
+
+    async def change_status(self, incs, status: str = STATUS_ACK) -> List[TaskResult]:
+        for i in incs:
+            i["status"] = status
+
+        return await self.bulk_update(incs)
+
+    async def snooze(self, incs, duration=14400, workers: int | None = None) -> List[TaskResult]:
+        """Snooze the given incidents concurrently, returning one result per incident"""
+        async def f(i) -> Any:
+            return successful(await self.session.post(f"/incidents/{i['id']}/snooze", json={"duration": duration}))
+
+        return await executor.run_async(f, incs, key=lambda i: i["id"], workers=workers or self.workers)
+
+    async def bulk_update(self, incs, chunk_size: int = BULK_UPDATE_LIMIT, retries: int = BULK_UPDATE_RETRIES, workers: int | None = None) -> List[TaskResult]:
+        """Update many incidents at once, see Incidents.bulk_update"""
+        update = BulkUpdate(incs, chunk_size, retries)
+
+        async def send(chunk: List) -> Any:
+            return await self.session.rput("incidents", json=chunk)
+
+        for delay in update.rounds():
+            if delay:
+                await asyncio.sleep(delay)
+            update.collect(await executor.run_async(send, update.pending, key=update.key, workers=workers or self.workers))
+
+        return update.results()
+
+    async def update(self, inc):
+        ret = None
+        try:
+            ret = await self.session.rput(f"/incidents/{inc['id']}", json=inc)
+        except HttpError as e:
+            print(e)
+        return ret
+
+    async def reassign(self, incs, uids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Reassign the given incidents concurrently to the users IDs, returning one result per incident"""
+        assignments = [{"assignee": {"id": u, "type": "user_reference"}} for u in uids]
+
+        async def f(i) -> Any:
+            new_inc = {
+                "id": i["id"],
+                "type": "incident_reference",
+                "assignments": assignments,
+            }
+            return successful(await self.session.put(f"/incidents/{i['id']}", json={"incident": new_inc}))
+
+        return await executor.run_async(f, incs, key=lambda i: i["id"], workers=workers or self.workers)
+
+    async def apply(self, incs, paths: List[str], printFunc, errFunc) -> Any:
+        try:
+            output = incs
+            for script in paths:
+                output = await self.apply_single(output, script)
+                printFunc(script)
+            return output
+        except (RuleExecutionError, RuleInvalidOutput) as e:
+            errFunc(str(e))
+        return incs
+
+    async def apply_single(self, incs, script: str) -> Dict:
+        process = await asyncio.create_subprocess_shell(
+            script, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate(json.dumps(incs).encode())
+        return rule_output(process.returncode, stdout, stderr)
+
+
+class AsyncDirectory(Directory):
+    """
+    The asyncio counterpart of Directory, sharing the same on disk cache and in memory index.
+    """
+
+    async def list(self, refresh: bool = False) -> List[Dict]:
+        """List all the entries of the directory, fetching them only if not cached or refresh is True"""
+        if not refresh and await asyncio.to_thread(self._loaded):
+            return self._items
+        items = await asyncio.to_thread(self.cache.load, self.kind) if self.cache and not refresh else None
+        fetched = items is None
+        if fetched:
+            items = await self.session.list_all(self.kind)
+            if self.cache:
+                await asyncio.to_thread(self.cache.store, self.kind, items)
+        return await asyncio.to_thread(self._keep, items, fetched)
+
+    async def index(self) -> DirectoryIndex:
+        """The lookup index over the current directory"""
+        items = await self.list()
+        if self._index is None:
+            self._index = DirectoryIndex(items)
+        return self._index
+
+    async def get(self, id: str) -> Dict | List:
+        """Get a single entry by ID"""
+        item = await asyncio.to_thread(self.cache.get, self.kind, id) if self.cache else None
+        if item is None:
+            return await self.session.rget(f"/{self.kind}/{id}")
+        return item
+
+    async def search(self, query: str, key: str = "name", fuzzy: bool = False) -> List[dict]:
+        """Retrieve all entries matching query on the attribute name, best matches first"""
+        return (await self.index()).search(query, key, fuzzy)
+
+    async def id(self, query: str, key: str = "name", fuzzy: bool = False) -> List[str]:
+        """Retrieve all IDs matching query on the attribute name, best matches first"""
+        return [u["id"] for u in await self.search(query, key, fuzzy)]
+
+
+class AsyncUsers(AsyncDirectory):
+
+    kind = "users"
+
+    async def id_by_email(self, query) -> List[str]:
+        """Retrieve all usersIDs matching the given (partial) email"""
+        return await self.id(query, "email")
+
+    async def teams(self, name: str) -> List[Dict]:
+        """Retrieve all teams for a given user"""
+        return user_teams(await self.search(query=name))
+
+    async def team_id(self, name: str) -> List[str]:
+        """Retrieve all team IDs for a given user"""
+        return [team["id"] for team in await self.teams(name)]
+
+
+class AsyncServices(AsyncDirectory):
+
+    kind = "services"
+
+    async def match(self, regexp: str | re.Pattern | None = None, excluded_regexp: str | re.Pattern | None = None,
+                    max_age: float = MATCH_MAX_AGE) -> List[str]:
+        """Retrieve all serviceIDs whose name matches regexp and doesn't match excluded_regexp, see Services.match"""
+        services, refreshed = await self.list(), False
+        if self.age() > max_age:
+            services, refreshed = await self.list(refresh=True), True
+        ids = match_services(services, regexp, excluded_regexp)
+        if not ids and not refreshed:
+            ids = match_services(await self.list(refresh=True), regexp, excluded_regexp)
+        return ids
+
+    async def list(self, params: dict | None = None, refresh: bool = False) -> List[Dict]:
+        """List all services in PagerDuty account, queries with params are never cached"""
+        if params:
+            return await self.session.list_all("services", params=params)
+        return await super().list(refresh)
+
+
+class AsyncTeams(AsyncDirectory):
+
+    kind = "teams"
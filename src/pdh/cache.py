@@ -0,0 +1,167 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from .config import Config
+from .defaults import DIRECTORIES
+
+"""
+  Cache module persists the account directories (users, teams, services) on disk using SQLite.
+  Every directory has its own time to live, one database file is kept per API key.
+"""
+
+# seconds before a cached directory is fetched again, 0 disables the cache
+# "session" is used by the short lived values describing the API key (abilities and current user)
+DEFAULT_TTLS = {"users": 86_400, "teams": 86_400, "services": 3_600, "session": 300}
+
+
+def cache_dir(cfg: Config) -> str:
+    """Return the cache directory: the `cache_dir` config key, $XDG_CACHE_HOME/pdh or ~/.cache/pdh"""
+    if "cache_dir" in cfg:
+        return os.path.expanduser(cfg["cache_dir"])
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdh")
+
+
+def account_id(cfg: Config) -> str:
+    """A stable identifier of the account configured in cfg, not revealing its API key"""
+    return hashlib.sha256(cfg["apikey"].encode()).hexdigest()[:16]
+
+
+# cache files that could not be opened, warned about once
+_unavailable: set = set()
+
+
+class DirectoryCache(object):
+
+    def __init__(self, path: str, ttls: Dict[str, int] | None = None) -> None:
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            # the cache holds user names and emails: readable by the owner only
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+            try:
+                # files written by older versions
+                os.chmod(path, 0o600)
+            except PermissionError:
+                pass
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS entities (kind TEXT, id TEXT, data TEXT, PRIMARY KEY (kind, id))")
+            self.db.execute("CREATE TABLE IF NOT EXISTS refreshes (kind TEXT PRIMARY KEY, refreshed_at REAL, count INTEGER)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS session (name TEXT PRIMARY KEY, data TEXT, stored_at REAL)")
+
+    @staticmethod
+    def for_config(cfg: Config) -> "DirectoryCache":
+        """Open the cache of the account configured in cfg, an in memory one if the file can't be opened (read-only home)"""
+        ttls = cfg["cache_ttl"] if "cache_ttl" in cfg else None
+        path = os.path.join(cache_dir(cfg), f"{account_id(cfg)}.db")
+        try:
+            return DirectoryCache(path, ttls)
+        except (OSError, sqlite3.Error) as e:
+            if path not in _unavailable:
+                _unavailable.add(path)
+                sys.stderr.write(f"Warning: cache {path} unavailable ({e}), directories are cached in memory only\n")
+            return DirectoryCache(":memory:", ttls)
+
+    def refreshed_at(self, kind: str) -> float | None:
+        with self.lock:
+            row = self.db.execute("SELECT refreshed_at FROM refreshes WHERE kind = ?", (kind,)).fetchone()
+        return row[0] if row else None
+
+    def fresh(self, kind: str) -> bool:
+        """True if the directory is cached and not expired"""
+        refreshed = self.refreshed_at(kind)
+        ttl = self.ttls.get(kind, 0)
+        return refreshed is not None and ttl > 0 and time.time() - refreshed < ttl
+
+    def load(self, kind: str) -> List[Dict] | None:
+        """Return the cached directory, None if missing or expired"""
+        if not self.fresh(kind):
+            return None
+        with self.lock:
+            rows = self.db.execute("SELECT data FROM entities WHERE kind = ? ORDER BY rowid", (kind,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def store(self, kind: str, items: List[Dict]) -> None:
+        """Replace the cached directory with the given items"""
+        if self.ttls.get(kind, 0) <= 0:
+            return
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM entities WHERE kind = ?", (kind,))
+            self.db.executemany("INSERT OR REPLACE INTO entities (kind, id, data) VALUES (?, ?, ?)", [(kind, i["id"], json.dumps(i)) for i in items])
+            self.db.execute("INSERT OR REPLACE INTO refreshes (kind, refreshed_at, count) VALUES (?, ?, ?)", (kind, time.time(), len(items)))
+
+    def get(self, kind: str, id: str) -> Dict | None:
+        """Return a single cached entity, None if missing or expired"""
+        if not self.fresh(kind):
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT data FROM entities WHERE kind = ? AND id = ?", (kind, id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_value(self, name: str) -> Any | None:
+        """Return a session value, None if missing or older than the session ttl"""
+        ttl = self.ttls.get("session", 0)
+        if ttl <= 0:
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT data, stored_at FROM session WHERE name = ?", (name,)).fetchone()
+        if row is None or time.time() - row[1] >= ttl:
+            return None
+        return json.loads(row[0])
+
+    def set_value(self, name: str, value: Any) -> None:
+        """Store a session value"""
+        if self.ttls.get("session", 0) <= 0:
+            return
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO session (name, data, stored_at) VALUES (?, ?, ?)", (name, json.dumps(value), time.time()))
+
+    def clear(self, kinds: List[str] | None = None) -> None:
+        """Drop the given directories (all of them if kinds is None) and the session values"""
+        with self.lock, self.db:
+            for kind in kinds if kinds else DIRECTORIES:
+                self.db.execute("DELETE FROM entities WHERE kind = ?", (kind,))
+                self.db.execute("DELETE FROM refreshes WHERE kind = ?", (kind,))
+            self.db.execute("DELETE FROM session")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Return one entry per directory with its size, age and freshness"""
+        ret = []
+        for kind in DIRECTORIES:
+            with self.lock:
+                row = self.db.execute("SELECT refreshed_at, count FROM refreshes WHERE kind = ?", (kind,)).fetchone()
+            ret.append({
+                "directory": kind,
+                "entries": row[1] if row else 0,
+                "age": round(time.time() - row[0]) if row else None,
+                "ttl": self.ttls.get(kind, 0),
+                "fresh": self.fresh(kind),
+            })
+        return ret
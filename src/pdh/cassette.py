@@ -0,0 +1,199 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, IO, List, Mapping, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+"""
+  Cassette module records the HTTP exchanges with PagerDuty APIs to a file and replays them without network.
+  A cassette is a JSON lines file (gzip compressed if its name ends with .gz), one exchange per line.
+  Every exchange is appended with a single locked write (one complete gzip member when compressed): many clients
+  and processes can record to the same cassette, and a killed process never leaves a truncated one behind.
+  Only the request method, url and body and the response status, content type and body are kept: API keys are never written.
+
+  PDH_RECORD=<file>          record every exchange to file
+  PDH_REPLAY=<file>          serve the exchanges from file instead of the API
+  PDH_REPLAY_LATENCY=<secs>  simulated latency added to every replayed response
+"""
+
+RECORD_ENV = "PDH_RECORD"
+REPLAY_ENV = "PDH_REPLAY"
+LATENCY_ENV = "PDH_REPLAY_LATENCY"
+
+# response headers kept in the cassette
+KEPT_HEADERS = ["content-type"]
+
+
+# recording adapters still open, closed at exit
+_recording: "weakref.WeakSet[RecordingAdapter]" = weakref.WeakSet()
+
+
+class CassetteError(Exception):
+    """The request has not been recorded in the cassette"""
+
+
+def _open(path: str, mode: str) -> IO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _append(path: str, line: str) -> None:
+    """Append a line to a cassette with one write, holding an exclusive lock on the file where supported"""
+    data = line.encode("utf-8")
+    if path.endswith(".gz"):
+        # concatenated gzip members read back as a single stream
+        data = gzip.compress(data)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
+def _close_recording() -> None:
+    for adapter in list(_recording):
+        adapter.close()
+
+
+atexit.register(_close_recording)
+
+
+def _text(body: bytes | str | None) -> str:
+    if body is None:
+        return ""
+    return body.decode("utf-8") if isinstance(body, bytes) else body
+
+
+def key(method: str, url: str, body: bytes | str | None = None) -> Tuple[str, str, str]:
+    """Identify a request regardless of the host and of the query parameters order"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return (method.upper(), parts.path + ("?" + query if query else ""), _text(body))
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter sending the requests through `inner` and appending every exchange to a cassette.
+    The cassette is not kept open: other clients and the rules run by the recorded command add their exchanges to the same file.
+    """
+
+    def __init__(self, path: str, inner: BaseAdapter | None = None) -> None:
+        super().__init__()
+        self.path = path
+        self.inner = inner if inner is not None else HTTPAdapter()
+        self.lock = threading.Lock()
+        self.closed = False
+        # create the cassette now, so a wrong path fails early
+        os.close(os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600))
+        _recording.add(self)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        response = self.inner.send(request, **kwargs)
+        method, url, body = key(request.method or "GET", request.url or "", request.body)
+        entry = {
+            "method": method,
+            "url": url,
+            "body": body,
+            "status": response.status_code,
+            "headers": {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            "response": _text(response.content),
+        }
+        with self.lock:
+            _append(self.path, json.dumps(entry, separators=(",", ":")) + "\n")
+        return response
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        _recording.discard(self)
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter serving the responses recorded in a cassette.
+    The same request recorded many times is answered in the recorded order, then the last answer is repeated.
+    """
+
+    def __init__(self, path: str, latency: float = 0.0, sleep: Callable[[float], None] = time.sleep) -> None:
+        super().__init__()
+        self.path = path
+        self.latency = latency
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.exchanges: Dict[Tuple[str, str, str], List[Dict]] = {}
+        self.served: Dict[Tuple[str, str, str], int] = {}
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    self.exchanges.setdefault((e["method"], e["url"], e["body"]), []).append(e)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        k = key(request.method or "GET", request.url or "", request.body)
+        with self.lock:
+            if k not in self.exchanges:
+                raise CassetteError(f"{k[0]} {k[1]} not found in {self.path}")
+            n = self.served.get(k, 0)
+            self.served[k] = n + 1
+            entry = self.exchanges[k][min(n, len(self.exchanges[k]) - 1)]
+        if self.latency > 0:
+            self.sleep(self.latency)
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["response"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url or ""
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def from_env(environ: Mapping[str, str] = os.environ) -> BaseAdapter | None:
+    """Return the adapter selected by PDH_REPLAY or PDH_RECORD, None to use the network as usual"""
+    if environ.get(REPLAY_ENV):
+        return ReplayAdapter(environ[REPLAY_ENV], latency=float(environ.get(LATENCY_ENV) or 0))
+    if environ.get(RECORD_ENV):
+        return RecordingAdapter(environ[RECORD_ENV])
+    return None
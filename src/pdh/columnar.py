@@ -0,0 +1,334 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from . import accessor
+from .filters import COST_EQ, COST_REGEXP, COST_STR, cost, costed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+  Columnar module keeps large incident lists as NumPy columns, to filter, sort and count hundreds of thousands of them.
+  It requires numpy: pip install 'pdh[columnar]'
+
+    frame = Frame.from_items(incidents, ["status", "urgency", "service.summary", "created_at", "incident_number"])
+    frame = frame.apply([Columns.eq("status", "resolved"), Columns.regexp("service.summary", "db"), Columns.ge("created_at", "2025-01-01")])
+    frame.counts("service.summary")
+    Transformations.apply(frame.sort("created_at", reverse=True).items(limit=20), transformations)
+
+  Low cardinality fields (status, urgency, service) are categorical: every row keeps an integer code
+  and the distinct values are compared once. Fields ending with _at are times. Only the rows asked
+  by items() are converted back, as the original incident dictionaries.
+"""
+
+# fields encoded as categories unless told otherwise
+CATEGORICAL = ["status", "urgency", "service.id", "service.summary", "priority.summary", "escalation_policy.summary"]
+
+Mask = Any
+ColumnFilter = Callable[["Frame"], Mask]
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("the columnar backend requires numpy: pip install 'pdh[columnar]'")
+
+
+def _time(value: Any) -> Any:
+    """An API timestamp as numpy datetime64 (UTC, seconds)"""
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        value = value.isoformat()
+    return np.datetime64(value, "s")
+
+
+def _factorize(values: Any) -> Tuple[Any, List[Any]]:
+    """Codes of the values into their distinct values, in order of appearance, -1 for None"""
+    codes: Dict[Any, int] = {}
+    categories: List[Any] = []
+
+    def code(v: Any) -> int:
+        if v is None:
+            return -1
+        try:
+            key = v
+            hash(key)
+        except TypeError:
+            # lists and dicts are grouped by their representation
+            key = repr(v)
+        if key not in codes:
+            codes[key] = len(categories)
+            categories.append(v)
+        return codes[key]
+    return np.fromiter((code(v) for v in values), dtype=np.int32, count=len(values)), categories
+
+
+class Column(object):
+    """
+    The values of a field for every row: categorical (codes into categories, -1 if missing),
+    times (datetime64, NaT if missing), numbers (float64, NaN if missing) or objects.
+    """
+
+    def __init__(self, values: Any, categories: List[Any] | None = None) -> None:
+        self.values = values
+        self.categories = categories
+        self._factorized: Tuple[Any, List[Any]] | None = None
+
+    @property
+    def categorical(self) -> bool:
+        return self.categories is not None
+
+    @property
+    def times(self) -> bool:
+        return self.values.dtype.kind == "M"
+
+    @staticmethod
+    def build(values: List[Any], categorical: bool = False, times: bool = False) -> "Column":
+        if categorical:
+            return Column(*_factorize(values))
+        if times:
+            try:
+                return Column(np.array([v[:-1] if isinstance(v, str) and v.endswith("Z") else (v or None) for v in values], dtype="datetime64[s]"))
+            except ValueError:
+                return Column(np.array([None if v is None else _time(v) for v in values], dtype="datetime64[s]"))
+        if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+            return Column(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        ret = np.empty(len(values), dtype=object)
+        ret[:] = values
+        return Column(ret)
+
+    def code(self, value: Any) -> int:
+        """The code of a category, -2 (matching no row) if unknown"""
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return -2
+
+    def factorize(self) -> Tuple[Any, List[Any]]:
+        """Codes into distinct values (-1 if missing) of a categorical or object column, computed once"""
+        if self.categorical:
+            return self.values, self.categories
+        if self._factorized is None:
+            self._factorized = _factorize(self.values)
+        return self._factorized
+
+    def keys(self) -> Any:
+        """Comparable keys: the rank of the value for categorical and object columns (missing first), the values otherwise"""
+        if not self.categorical and self.values.dtype != object:
+            return self.values
+        codes, categories = self.factorize()
+        try:
+            order = sorted(range(len(categories)), key=lambda n: categories[n])
+        except TypeError:
+            # values of different types: order them by their text
+            order = sorted(range(len(categories)), key=lambda n: str(categories[n]))
+        ranks = np.empty(len(categories) + 1, dtype=np.int32)
+        # missing values (-1) sort first
+        ranks[-1] = -1
+        ranks[np.array(order, dtype=np.intp)] = np.arange(len(order), dtype=np.int32)
+        return ranks[codes]
+
+
+class Frame(object):
+    """A selection of rows over the columns of a list of items"""
+
+    def __init__(self, items: List[Dict], columns: Dict[str, Column], index: Any) -> None:
+        self._items = items
+        self.columns = columns
+        self.index = index
+
+    @staticmethod
+    def from_items(items: List[Dict], fields: List[str], categorical: List[str] | None = None) -> "Frame":
+        """
+        Build the columns of the given fields (dotted paths or JSONPath expressions).
+        categorical: fields encoded as categories, defaults to CATEGORICAL. Fields ending with _at are times.
+        """
+        _require()
+        items = items if isinstance(items, list) else list(items)
+        categorical = CATEGORICAL if categorical is None else categorical
+        columns = {}
+        for field in fields:
+            get = accessor.compile(field)
+            values = [get(i) for i in items]
+            columns[field] = Column.build(values, categorical=field in categorical, times=field.endswith("_at"))
+        return Frame(items, columns, np.arange(len(items), dtype=np.intp))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def column(self, field: str) -> Column:
+        if field not in self.columns:
+            raise KeyError(f"{field} is not a column, available: {', '.join(self.columns)}")
+        return self.columns[field]
+
+    def values(self, field: str) -> Any:
+        """The raw column values (codes for categorical columns) of the selected rows"""
+        return self.column(field).values[self.index]
+
+    def select(self, mask: Mask) -> "Frame":
+        return Frame(self._items, self.columns, self.index[mask])
+
+    def apply(self, filters: List[ColumnFilter]) -> "Frame":
+        """The rows matching all the filters: cheapest first, each one sees only the rows left by the previous ones"""
+        frame = self
+        for f in sorted(filters, key=cost):
+            if not len(frame):
+                break
+            frame = frame.select(f(frame))
+        return frame
+
+    def sort(self, fields: str | List[str], reverse: bool = False) -> "Frame":
+        """Sort the rows by one or more fields, stable"""
+        fields = [fields] if isinstance(fields, str) else fields
+        # lexsort sorts by the last key first
+        keys = [self.column(f).keys()[self.index] for f in reversed(fields)]
+        order = np.lexsort(keys) if len(keys) > 1 else np.argsort(keys[0], kind="stable")
+        if reverse:
+            order = order[::-1]
+        return Frame(self._items, self.columns, self.index[order])
+
+    def head(self, n: int) -> "Frame":
+        return Frame(self._items, self.columns, self.index[:n])
+
+    def counts(self, *fields: str) -> List[Dict[str, Any]]:
+        """Rows per distinct combination of the fields, most frequent first"""
+        codes = []
+        uniques = []
+        for field in fields:
+            col = self.column(field)
+            if col.categorical or col.values.dtype == object:
+                # -1 (missing) becomes the last category
+                values, categories = col.factorize()
+                values = values[self.index]
+                codes.append(np.where(values < 0, len(categories), values))
+                uniques.append(categories + [None])
+            else:
+                u, inverse = np.unique(self.values(field), return_inverse=True)
+                codes.append(inverse.reshape(-1))
+                uniques.append(u.tolist())
+        if not len(self.index):
+            return []
+        combined = np.ravel_multi_index(codes, [len(u) for u in uniques])
+        found, count = np.unique(combined, return_counts=True)
+        ret = []
+        for c, n in zip(found, count):
+            row = {f: uniques[k][i] for k, (f, i) in enumerate(zip(fields, np.unravel_index(c, [len(u) for u in uniques])))}
+            row["count"] = int(n)
+            ret.append(row)
+        ret.sort(key=lambda r: -r["count"])
+        return ret
+
+    def items(self, limit: int | None = None) -> List[Dict]:
+        """The original items of the selected rows, only the first limit ones if given"""
+        index = self.index if limit is None else self.index[:limit]
+        return [self._items[i] for i in index]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self._items[i] for i in self.index)
+
+
+class Columns(object):
+    """
+    Vectorized counterparts of pdh.filters.Filter: every method returns a function
+    taking a Frame and returning the boolean mask of its matching rows.
+    """
+
+    @staticmethod
+    def eq(field: str, value: Any) -> ColumnFilter:
+        def f(frame: Frame) -> Mask:
+            col = frame.column(field)
+            if col.categorical:
+                return frame.values(field) == col.code(value)
+            if col.times:
+                return frame.values(field) == _time(value)
+            return frame.values(field) == value
+        return costed(f, COST_EQ)
+
+    @staticmethod
+    def inList(field: str, listOfValues: List[Any]) -> ColumnFilter:
+        def f(frame: Frame) -> Mask:
+            col = frame.column(field)
+            if col.categorical:
+                return np.isin(frame.values(field), [col.code(v) for v in listOfValues])
+            return np.isin(frame.values(field), listOfValues)
+        return costed(f, COST_EQ)
+
+    @staticmethod
+    def _ordering(field: str, value: Any, op: Callable[[Any, Any], Mask]) -> ColumnFilter:
+        def f(frame: Frame) -> Mask:
+            col = frame.column(field)
+            values = frame.values(field)
+            if col.categorical:
+                # compare the labels once, then select the rows by code
+                matching = np.array([op(c, value) for c in col.categories] + [False], dtype=bool)
+                return matching[values]
+            if col.times:
+                return op(values, _time(value))
+            if values.dtype == object:
+                return np.fromiter((v is not None and op(v, value) for v in values), dtype=bool, count=len(values))
+            return op(values, value)
+        return costed(f, COST_STR)
+
+    @staticmethod
+    def le(field: str, value: Any) -> ColumnFilter:
+        return Columns._ordering(field, value, lambda a, b: a <= b)
+
+    @staticmethod
+    def ge(field: str, value: Any) -> ColumnFilter:
+        return Columns._ordering(field, value, lambda a, b: a >= b)
+
+    @staticmethod
+    def lt(field: str, value: Any) -> ColumnFilter:
+        return Columns._ordering(field, value, lambda a, b: a < b)
+
+    @staticmethod
+    def gt(field: str, value: Any) -> ColumnFilter:
+        return Columns._ordering(field, value, lambda a, b: a > b)
+
+    @staticmethod
+    def regexp(field: str, regexp: str | re.Pattern) -> ColumnFilter:
+        """Rows whose field matches the regexp, every distinct value is searched once"""
+        if isinstance(regexp, str):
+            regexp = re.compile(regexp)
+
+        def f(frame: Frame) -> Mask:
+            col = frame.column(field)
+            if col.categorical:
+                matching = np.array([regexp.search(str(c)) is not None for c in col.categories] + [False], dtype=bool)
+                return matching[frame.values(field)]
+            seen: Dict[Any, bool] = {}
+
+            def match(v: Any) -> bool:
+                if v not in seen:
+                    seen[v] = v is not None and regexp.search(str(v)) is not None
+                return seen[v]
+            values = frame.values(field)
+            return np.fromiter((match(v) for v in values), dtype=bool, count=len(values))
+        return costed(f, COST_REGEXP)
+
+    @staticmethod
+    def not_regexp(field: str, regexp: str | re.Pattern) -> ColumnFilter:
+        match = Columns.regexp(field, regexp)
+        return costed(lambda frame: ~match(frame), COST_REGEXP)
@@ -14,12 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
-from typing import Any, Dict
+from typing import Any, Dict, List
 import yaml
 import os
 import sys
 import json
 from rich import print
+from .defaults import DEFAULT_ACCOUNT, ALL_ACCOUNTS
 
 REQUIRED_KEYS = ["apikey", "uid", "email"]
 
@@ -71,6 +72,26 @@ class Config(object):
                 return False
         return True
 
+    def accounts(self) -> List[str]:
+        """Names of the configured accounts"""
+        names = [DEFAULT_ACCOUNT] if self.validate() else []
+        return names + list(self.cfg.get("accounts") or {})
+
+    def account(self, name: str) -> "Config":
+        """Configuration of the named account: the top level settings overridden by the account ones"""
+        if name not in self.accounts():
+            raise ValueError(f"Unknown account: {name}, available accounts: {', '.join(self.accounts())}")
+        c = Config()
+        c.from_dict({k: v for k, v in self.cfg.items() if k != "accounts"})
+        if name != DEFAULT_ACCOUNT:
+            c.from_dict(self.cfg["accounts"][name])
+        return c
+
+    def select(self, names: str) -> Dict[str, "Config"]:
+        """Configurations of a comma separated list of account names, or of every account with `all`"""
+        selected = self.accounts() if names == ALL_ACCOUNTS else [n.strip() for n in names.split(",") if n.strip()]
+        return {n: self.account(n) for n in selected}
+
     def __getitem__(self, key: str) -> Any:
         return self.cfg[key]
 
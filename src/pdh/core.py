@@ -16,24 +16,65 @@
 #
 from .filters import Filter
 from . import Transformations
-from .pd import PagerDuty, UnauthorizedException
+from .pd import PagerDuty, Incidents, UnauthorizedException
 from .config import Config
+from .cache import DirectoryCache, DIRECTORIES
 from .output import print, print_items
-from typing import List
+from . import executor
+from .executor import TaskResult
+from . import daemon
+from .defaults import ACCOUNT_FIELD
+from typing import Callable, Dict, List
 from datetime import timezone
 
+
 class PDH(object):
 
     @staticmethod
-    def list_user(cfg: Config, output: str, fields: list | None = None) -> bool:
+    def fan_out(cfg: Config, accounts: str | None, func: Callable[[Config], List[Dict]], sort_key: Callable[[Dict], object] | None = None) -> List[Dict]:
+        """
+        Call func with the configuration of every selected account concurrently (only the default account if accounts is None).
+        Rows of multiple accounts are copied, tagged with their account name and merged, sorted by sort_key.
+        Raises ValueError for unknown accounts, UnauthorizedException if every account fails.
+        """
+        if not accounts:
+            return func(cfg)
+        selected = cfg.select(accounts)
+        results = executor.run(lambda name: func(selected[name]), list(selected), workers=max(1, len(selected)))
+        rows = []
+        for r in results:
+            if not r.ok:
+                print(f"[red]Account {r.id}: {r.error}[/red]")
+                continue
+            # tag copies, the API objects stay as returned
+            rows.extend({**row, ACCOUNT_FIELD: r.id} for row in r.value)
+        if results and all(not r.ok for r in results):
+            raise UnauthorizedException("no account could be listed")
+        return sorted(rows, key=sort_key) if sort_key else rows
+
+    @staticmethod
+    def print_results(results: List[TaskResult], action: str) -> bool:
+        """Print failed incidents and a summary line, return True if every incident succeeded"""
+        for r in executor.failed(results):
+            status = f" (HTTP {r.status})" if r.status else ""
+            print(f"[red]✘[/red] {r.id} {action} failed{status}: [grey50]{r.error}[/grey50]")
+        s = executor.summary(results)
+        color = "green" if s["failed"] == 0 else "yellow"
+        print(f"[{color}]{action}: {s['ok']}/{s['total']} incidents succeeded, {s['failed']} failed[/{color}]")
+        return s["failed"] == 0
+
+    @staticmethod
+    def list_user(cfg: Config, output: str, fields: list | None = None, accounts: str | None = None) -> bool:
         try:
             if fields is None:
                 fields = ["id", "name", "email", "time_zone", "role", "job_title", "teams"]
 
             if isinstance(fields, str):
                 fields = fields.split(",")
+            if accounts:
+                fields = [ACCOUNT_FIELD] + fields
 
-            users = PagerDuty(cfg).users.list()
+            users = PDH.fan_out(cfg, accounts, lambda c: list(PagerDuty(c).users.list()), sort_key=lambda u: u.get("name") or "")
 
             if output == "raw":
                 filtered = users
@@ -47,7 +88,7 @@ class PDH(object):
 
             print_items(filtered, output)
             return True
-        except UnauthorizedException as e:
+        except (UnauthorizedException, ValueError) as e:
             print(f"[red]{e}[/red]")
             return False
 
@@ -120,10 +161,9 @@ class PDH(object):
             return False
 
     @staticmethod
-    def list_services(cfg: Config, output: str = 'table', fields: List | None = None, sort_by:  str| None = None, reverse_sort: bool = False, status: str = "active,warning,critical") -> bool:
+    def list_services(cfg: Config, output: str = 'table', fields: List | None = None, sort_by:  str| None = None, reverse_sort: bool = False, status: str = "active,warning,critical", accounts: str | None = None) -> bool:
         try:
-            pd = PagerDuty(cfg)
-            svcs = pd.services.list()
+            svcs = PDH.fan_out(cfg, accounts, lambda c: list(PagerDuty(c).services.list()), sort_key=lambda s: s.get("name") or "")
 
             svcs = Filter.apply(svcs, [Filter.inList("status", status.split(","))])
 
@@ -132,6 +172,8 @@ class PDH(object):
                 fields = fields.lower().strip().split(",")
             else:
                 fields = ["id", "name", "description", "status","created_at", "updated_at", "html_url"]
+            if accounts:
+                fields = [ACCOUNT_FIELD] + fields
 
             if output != "raw":
                 transformations = dict()
@@ -173,7 +215,7 @@ class PDH(object):
             print_items(filtered, output, plain_print_f=plain_print_f)
             return True
 
-        except UnauthorizedException as e:
+        except (UnauthorizedException, ValueError) as e:
                 print(f"[red]{e}[/red]")
                 return False
         except KeyError:
@@ -182,47 +224,98 @@ class PDH(object):
                 print(f"[yellow]Available fields: {ff}[/yellow]")
                 return False
 
+    @staticmethod
+    def cache_warm(cfg: Config, directories: List[str] = DIRECTORIES) -> bool:
+        try:
+            pd = PagerDuty(cfg)
+            for d in directories:
+                items = getattr(pd, d).list(refresh=True)
+                print(f"[green]✔[/green] {d}: {len(items)} entries cached")
+            return True
+        except UnauthorizedException as e:
+            print(f"[red]{e}[/red]")
+            return False
+
+    @staticmethod
+    def cache_stats(cfg: Config, output: str = "table") -> bool:
+        print_items(DirectoryCache.for_config(cfg).stats(), output)
+        return True
+
+    @staticmethod
+    def cache_clear(cfg: Config, directories: List[str] = DIRECTORIES) -> bool:
+        DirectoryCache.for_config(cfg).clear(directories)
+        print(f"[green]✔[/green] cleared {', '.join(directories)}")
+        return True
+
+    @staticmethod
+    def serve(cfg: Config, max_age: int = daemon.DEFAULT_MAX_AGE, stop: bool = False) -> bool:
+        path = daemon.socket_path(cfg)
+        if stop:
+            remote = daemon.connect_path(path)
+            if remote is None:
+                print(f"[yellow]No daemon listening on {path}[/yellow]")
+                return False
+            remote.call("stop")
+            print(f"[green]✔[/green] daemon on {path} stopped")
+            return True
+        try:
+            d = daemon.Daemon(cfg, max_age=max_age)
+            d.warm()
+            print(f"[green]✔[/green] listening on {path}")
+            d.serve(path)
+            return True
+        except (UnauthorizedException, daemon.DaemonError) as e:
+            print(f"[red]{e}[/red]")
+            return False
+        except KeyboardInterrupt:
+            return True
+
+    @staticmethod
+    def change_status(cfg: Config, incIDs: list, command: str) -> List[TaskResult]:
+        """Run ack or resolve through the daemon if running, so its snapshots see the change, otherwise call the API"""
+        remote = daemon.connect(cfg)
+        if remote is not None:
+            try:
+                return [TaskResult(**r) for r in remote.call(command, ids=list(incIDs))]
+            except (OSError, ValueError, daemon.DaemonError) as e:
+                print(f"[yellow]Daemon unavailable, calling the API: {e}[/yellow]")
+        return getattr(PagerDuty(cfg).incidents, command)(Incidents.references(incIDs))
+
     @staticmethod
     def ack(cfg: Config, incIDs: list = []) -> None:
-        pd = PagerDuty(cfg)
-        incs = pd.incidents.list()
-        incs = Filter.apply(incs, filters=[Filter.inList("id", incIDs)])
-        for i in incs:
-            print(f"[yellow]✔[/yellow] {i['id']} [grey50]{i['title']}[/grey50]")
-        pd.incidents.ack(incs)
+        results = PDH.change_status(cfg, incIDs, "ack")
+        for r in results:
+            if r.ok:
+                print(f"[yellow]✔[/yellow] {r.id} [grey50]{r.value.get('title', '')}[/grey50]")
+        PDH.print_results(results, "ack")
 
     @staticmethod
     def resolve(cfg: Config, incIDs: list = []) -> None:
-        pd = PagerDuty(cfg)
-        incs = pd.incidents.list()
-        incs = Filter.apply(incs, filters=[Filter.inList("id", incIDs)])
-        for i in incs:
-            print(f"[green]✅[/green] {i['id']} [grey50]{i['title']}[/grey50]")
-        pd.incidents.resolve(incs)
+        results = PDH.change_status(cfg, incIDs, "resolve")
+        for r in results:
+            if r.ok:
+                print(f"[green]✅[/green] {r.id} [grey50]{r.value.get('title', '')}[/grey50]")
+        PDH.print_results(results, "resolve")
 
     @staticmethod
     def snooze(cfg: Config, incIDs: list = [], duration: int = 14400) -> None:
         pd = PagerDuty(cfg)
         import datetime
 
-        incs = pd.incidents.list()
-        incs = Filter.apply(incs, filters=[Filter.inList("id", incIDs)])
         for id in incIDs:
             print(f"Snoozing incident {id} for { str(datetime.timedelta(seconds=duration))}")
 
-        pd.incidents.snooze(incs, duration)
+        PDH.print_results(pd.incidents.snooze(Incidents.references(incIDs), duration), "snooze")
 
     @staticmethod
     def reassign(cfg: Config, incIDs: list = [], user: str | None = None):
         pd = PagerDuty(cfg)
-        incs = pd.incidents.list()
-        incs = Filter.apply(incs, filters=[Filter.inList("id", incIDs)])
 
         users = pd.users.id(user)
         if users is None or len(users) == 0:
-            users = pd.users.id(user)
+            users = pd.users.id_by_email(user)
 
         for id in incIDs:
             print(f"Reassign incident {id} to {users}")
 
-        pd.incidents.reassign(incs, users)
+        PDH.print_results(pd.incidents.reassign(Incidents.references(incIDs), users), "reassign")
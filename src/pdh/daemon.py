@@ -0,0 +1,219 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from .config import Config
+from .cache import DIRECTORIES, account_id, cache_dir
+from .pd import PagerDuty, Incidents
+from .snapshot import IncidentSnapshot
+from .defaults import DEFAULT_MAX_AGE
+
+"""
+  Daemon module keeps an authenticated PagerDuty session, the directories and the open incidents warm
+  in a long running process, serving the CLI over a Unix socket.
+
+  The protocol is one JSON request per connection: {"command": ..., "args": {...}},
+  answered with {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+"""
+
+# snapshots not requested for this amount of seconds are dropped
+IDLE = 600
+# seconds the CLI waits for the daemon before falling back to the API
+CONNECT_TIMEOUT = 0.5
+# set to any value to never use the daemon
+DISABLE_ENV = "PDH_NO_DAEMON"
+
+
+class DaemonError(Exception):
+    pass
+
+
+def socket_path(cfg: Config) -> str:
+    """The socket of the daemon serving the account: the `socket` config key or <cache_dir>/<account>.sock"""
+    if "socket" in cfg:
+        return os.path.expanduser(cfg["socket"])
+    return os.path.join(cache_dir(cfg), f"{account_id(cfg)}.sock")
+
+
+class Daemon(object):
+
+    def __init__(self, cfg: Config, max_age: int = DEFAULT_MAX_AGE, clock: Callable[[], float] = time.time) -> None:
+        self.cfg = cfg
+        self.pd = PagerDuty(cfg)
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.snapshots: Dict[str, IncidentSnapshot] = {}
+        self.locks: Dict[str, threading.Lock] = {}
+        self.used: Dict[str, float] = {}
+        self.invalidated_at = 0.0
+        self.stopped = threading.Event()
+
+    def warm(self) -> None:
+        """Load the session values and the directories, fetching only what is missing or expired"""
+        self.pd.abilities
+        self.pd.me
+        for d in DIRECTORIES:
+            getattr(self.pd, d).list()
+
+    def incidents(self, query: Dict) -> List[Dict]:
+        """The incidents matching an Incidents.list query, from a snapshot refreshed at most max_age seconds ago"""
+        key = json.dumps(query, sort_keys=True)
+        with self.lock:
+            if key not in self.snapshots:
+                self.snapshots[key] = IncidentSnapshot(self.pd.incidents, clock=self.clock, **query)
+                self.locks[key] = threading.Lock()
+            snapshot, lock = self.snapshots[key], self.locks[key]
+            self.used[key] = self.clock()
+        with lock:
+            if snapshot.refreshed_at is None or snapshot.refreshed_at <= self.invalidated_at or self.clock() - snapshot.refreshed_at >= self.max_age:
+                return snapshot.refresh()
+            return snapshot.items()
+
+    def change_status(self, ids: List[str], command: str) -> List[Dict]:
+        """Ack or resolve the incidents, the snapshots are refreshed on the next request"""
+        results = getattr(self.pd.incidents, command)(Incidents.references(ids))
+        # the next listing must see the change
+        self.invalidated_at = self.clock()
+        return [r._asdict() for r in results]
+
+    def refresh(self) -> None:
+        """Refresh the snapshots in use and drop the idle ones"""
+        now = self.clock()
+        with self.lock:
+            for key in [k for k, used in self.used.items() if now - used >= IDLE]:
+                del self.snapshots[key], self.locks[key], self.used[key]
+            snapshots = list(zip(self.snapshots.values(), self.locks.values()))
+        for snapshot, lock in snapshots:
+            with lock:
+                if snapshot.refreshed_at is None or now - snapshot.refreshed_at >= self.max_age:
+                    snapshot.refresh()
+        self.warm()
+
+    def handle(self, request: Dict) -> Dict:
+        """Run a request, errors are returned to the client"""
+        command = request.get("command")
+        args = request.get("args") or {}
+        try:
+            if command == "ping":
+                result: Any = {"pid": os.getpid()}
+            elif command == "incidents":
+                result = self.incidents(args["query"])
+            elif command in ("ack", "resolve"):
+                result = self.change_status(args["ids"], command)
+            elif command == "stop":
+                self.stopped.set()
+                result = None
+            else:
+                return {"ok": False, "error": f"unknown command: {command}"}
+            return {"ok": True, "result": result}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def serve(self, path: str) -> None:
+        """Listen on the Unix socket until stopped"""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                response = daemon.handle(json.loads(self.rfile.readline()))
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        # the daemon answers with the account incidents: the socket is reachable by the owner only
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(path):
+            if connect_path(path) is not None:
+                raise DaemonError(f"a daemon is already listening on {path}")
+            os.unlink(path)
+
+        # created 0600 by bind, not opened to other users until a chmod
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        finally:
+            os.umask(umask)
+        server.daemon_threads = True
+
+        def refresher() -> None:
+            while not self.stopped.wait(self.max_age):
+                try:
+                    self.refresh()
+                except Exception:
+                    # keep serving the last known state, the next request retries
+                    pass
+
+        def stopper() -> None:
+            self.stopped.wait()
+            server.shutdown()
+
+        threading.Thread(target=refresher, daemon=True).start()
+        threading.Thread(target=stopper, daemon=True).start()
+        try:
+            server.serve_forever()
+        finally:
+            self.stopped.set()
+            server.server_close()
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+class Client(object):
+
+    def __init__(self, path: str, timeout: float | None = None) -> None:
+        self.path = path
+        self.timeout = timeout
+
+    def call(self, command: str, **args) -> Any:
+        """Send a request to the daemon and return its result, raise DaemonError if it failed"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self.timeout)
+            s.connect(self.path)
+            s.sendall(json.dumps({"command": command, "args": args}).encode() + b"\n")
+            s.shutdown(socket.SHUT_WR)
+            data = b""
+            while chunk := s.recv(65536):
+                data += chunk
+        if not data:
+            raise DaemonError("empty answer from the daemon")
+        response = json.loads(data)
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+
+def connect_path(path: str) -> Client | None:
+    """Return a client of the daemon listening on path, None if no daemon is answering"""
+    if not os.path.exists(path):
+        return None
+    try:
+        Client(path, CONNECT_TIMEOUT).call("ping")
+    except (OSError, ValueError, DaemonError):
+        return None
+    return Client(path)
+
+
+def connect(cfg: Config) -> Client | None:
+    """Return a client of the daemon serving the account, None if disabled or not running"""
+    if os.environ.get(DISABLE_ENV):
+        return None
+    return connect_path(socket_path(cfg))
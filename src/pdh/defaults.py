@@ -0,0 +1,47 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+  Defaults module holds the constants needed to declare the CLI.
+  It must not import anything: it is loaded by every pdh invocation, the modules using heavy dependencies
+  are imported only by the commands needing them.
+"""
+
+# output formats
+VALID_OUTPUTS = ["plain", "table", "json", "yaml", "raw", "ndjson"]
+# outputs written one item at a time, they can consume an iterator without loading it all
+STREAM_OUTPUTS = ["plain", "ndjson"]
+
+# directories kept in the local cache
+DIRECTORIES = ["users", "teams", "services"]
+
+# the account configured by the top level keys, other accounts are listed under the `accounts` key
+DEFAULT_ACCOUNT = "default"
+ALL_ACCOUNTS = "all"
+# the field tagging every row with its account when listing more than one account
+ACCOUNT_FIELD = "account"
+
+# seconds between two full reloads of the incidents list
+DEFAULT_RESYNC = 300
+# seconds an incidents snapshot is served by the daemon without being refreshed
+DEFAULT_MAX_AGE = 10
+
+# how dates are rendered: relative (3d 4h ago), absolute (ISO 8601) or epoch seconds
+DATE_RELATIVE = "relative"
+DATE_ABSOLUTE = "absolute"
+DATE_EPOCH = "epoch"
+DATE_MODES = [DATE_RELATIVE, DATE_ABSOLUTE, DATE_EPOCH]
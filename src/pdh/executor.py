@@ -0,0 +1,101 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+"""
+  Executor module runs the same call over many items on a bounded pool of workers.
+  Every item produces a TaskResult, failures are collected instead of aborting the whole run.
+"""
+
+DEFAULT_WORKERS = 8
+
+# id: the item identifier, ok: True if the call succeeded, value: the call return value,
+# error: the error message (if any), status: the HTTP status code (if known)
+TaskResult = namedtuple("TaskResult", "id ok value error status")
+
+
+def status_of(obj: Any) -> int | None:
+    """Return the HTTP status code carried by a response or by an exception wrapping one"""
+    if hasattr(obj, "status_code"):
+        return obj.status_code
+    response = getattr(obj, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def run(func: Callable[[Any], Any], items: Iterable[Any], key: Callable[[Any], Any] | None = None, workers: int = DEFAULT_WORKERS) -> List[TaskResult]:
+    """
+    Call func on every item using at most `workers` threads.
+
+    Args:
+        func (Callable): the function to call for each item.
+        items (Iterable): the items to process.
+        key (Callable, optional): extract the identifier of an item, defaults to the item itself.
+        workers (int, optional): the maximum number of concurrent calls. Defaults to DEFAULT_WORKERS.
+
+    Returns:
+        List[TaskResult]: one result per item, in the same order of the input.
+    """
+    items = list(items)
+
+    def call(item: Any) -> TaskResult:
+        id = key(item) if key else item
+        try:
+            value = func(item)
+            return TaskResult(id, True, value, None, status_of(value))
+        except Exception as e:
+            return TaskResult(id, False, None, str(e), status_of(e))
+
+    if workers <= 1 or len(items) <= 1:
+        return [call(i) for i in items]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(call, items))
+
+
+async def run_async(func: Callable[[Any], Awaitable[Any]], items: Iterable[Any], key: Callable[[Any], Any] | None = None, workers: int = DEFAULT_WORKERS) -> List[TaskResult]:
+    """
+    Await func on every item, at most `workers` calls at a time. The asyncio counterpart of run.
+
+    Returns:
+        List[TaskResult]: one result per item, in the same order of the input.
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def call(item: Any) -> TaskResult:
+        id = key(item) if key else item
+        async with semaphore:
+            try:
+                value = await func(item)
+                return TaskResult(id, True, value, None, status_of(value))
+            except Exception as e:
+                return TaskResult(id, False, None, str(e), status_of(e))
+
+    return list(await asyncio.gather(*(call(i) for i in items)))
+
+
+def failed(results: List[TaskResult]) -> List[TaskResult]:
+    """Return only the failed results"""
+    return [r for r in results if not r.ok]
+
+
+def summary(results: List[TaskResult]) -> Dict[str, int]:
+    """Count total, succeeded and failed results"""
+    errors = len(failed(results))
+    return {"total": len(results), "ok": len(results) - errors, "failed": errors}
@@ -15,9 +15,100 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import re
-from typing import Callable, Iterator, List, Dict, Any
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Any
+
+from . import accessor
+from .timeindex import TimeIndex, epoch, parse_when
+
+# relative cost of evaluating a filter, cheap filters run first: equality before regexp before date parsing.
+# Functions without a cost attribute (custom filters) are assumed expensive.
+COST_EQ = 1
+COST_STR = 2
+COST_REGEXP = 4
+COST_DATE = 8
+COST_UNKNOWN = 16
+
+# items evaluated measuring every filter before fixing their order for the rest of the pass
+SAMPLE = 128
+
+
+def costed(f: Callable[[dict], bool], cost: float) -> Callable[[dict], bool]:
+    """Annotate a filter function with its relative cost"""
+    f.cost = cost  # type: ignore[attr-defined]
+    return f
+
+
+def cost(f: Callable[[dict], Any]) -> float:
+    return getattr(f, "cost", COST_UNKNOWN)
+
+
+def fuse(filters: List[Callable[[Dict], Any]], any_of: bool = False) -> Callable[[Dict], bool]:
+    """Combine filters in one short-circuiting function: all of them must match, or any with any_of"""
+    filters = list(filters)
+    if len(filters) == 1:
+        return filters[0]
+    if any_of:
+        def f_any(item: Dict) -> bool:
+            for f in filters:
+                if f(item):
+                    return True
+            return False
+        return f_any
+    if len(filters) == 2:
+        first, second = filters
+        return lambda item: bool(first(item) and second(item))
+
+    def f_all(item: Dict) -> bool:
+        for f in filters:
+            if not f(item):
+                return False
+        return True
+    return f_all
+
+
+class Plan(object):
+    """
+    Orders the filters of a pass: by their relative cost at first, then by the measured time spent
+    per rejected item over the first `sample` items, so the filters dropping most items cheaply run first.
+    """
+
+    def __init__(self, filters: List[Callable[[Dict], Any]], sample: int = SAMPLE, clock: Callable[[], float] = time.perf_counter) -> None:
+        # sorted is stable: filters with the same cost keep the caller order
+        self.filters = sorted(filters, key=cost)
+        self.sample = sample
+        self.clock = clock
+        self.elapsed = [0.0] * len(self.filters)
+        self.rejected = [0] * len(self.filters)
+
+    def measure(self, item: Dict) -> bool:
+        """Evaluate the filters on item, recording their time and outcome"""
+        for n, f in enumerate(self.filters):
+            start = self.clock()
+            ok = f(item)
+            self.elapsed[n] += self.clock() - start
+            if not ok:
+                self.rejected[n] += 1
+                return False
+        return True
+
+    def order(self) -> List[Callable[[Dict], Any]]:
+        """The filters by measured time per rejection, never rejecting ones last"""
+        def rank(n: int) -> float:
+            if self.rejected[n] == 0:
+                return float("inf")
+            return self.elapsed[n] / self.rejected[n]
+        return [self.filters[n] for n in sorted(range(len(self.filters)), key=rank)]
+
+    def select(self, objects: Any) -> Iterator[Any]:
+        """Yield the objects matching all the filters in a single pass"""
+        it = iter(objects)
+        for o in islice(it, self.sample):
+            if self.measure(o):
+                yield o
+        yield from filter(fuse(self.order()), it)
 
-import jsonpath_ng
 
 class Filter(object):
     """
@@ -36,14 +127,15 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the value of the specified field is less than or equal to the given value, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             if len(values) > 0 and values[0] <= value:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def ge(field: str, value: int)-> Callable[[dict], bool]:
@@ -57,14 +149,15 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the value of the specified field is greater than or equal to the given value, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             if len(values)>0 and values[0] >= value:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def lt(field: str, value: int) -> Callable[[dict], bool]:
@@ -78,15 +171,16 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the specified field's value is less than the given value, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else value
             if val < value:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def gt(field: str, value: int) -> Callable[[dict], bool]:
@@ -100,15 +194,122 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the value of the specified field is greater than the given value, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else value
             if val > value:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
+
+    @staticmethod
+    def since(field: str, when: Any, now: float | None = None) -> Callable[[dict], bool]:
+        """
+        Creates a filter function that checks if the time in a specified field is at or after a given time.
+
+        Args:
+            field (str): The key in the dictionary holding a timestamp (e.g. created_at).
+            when (Any): ISO date, epoch seconds, a duration ago (2h) or now-2h, see pdh.timeindex.parse_when.
+            now (float, optional): Epoch seconds relative times are resolved against. Defaults to the current time.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if its time is at or after when, otherwise False.
+        """
+        path = accessor.compile(field)
+        bound = parse_when(when, now)
+
+        def f(item: dict) -> bool:
+            t = epoch(path(item))
+            return t is not None and t >= bound
+
+        return costed(f, COST_DATE)
+
+    @staticmethod
+    def until(field: str, when: Any, now: float | None = None) -> Callable[[dict], bool]:
+        """
+        Creates a filter function that checks if the time in a specified field is before a given time.
+
+        Args:
+            field (str): The key in the dictionary holding a timestamp (e.g. created_at).
+            when (Any): ISO date, epoch seconds, a duration ago (2h) or now-2h, see pdh.timeindex.parse_when.
+            now (float, optional): Epoch seconds relative times are resolved against. Defaults to the current time.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if its time is before when, otherwise False.
+        """
+        path = accessor.compile(field)
+        bound = parse_when(when, now)
+
+        def f(item: dict) -> bool:
+            t = epoch(path(item))
+            return t is not None and t < bound
+
+        return costed(f, COST_DATE)
+
+    @staticmethod
+    def between(field: str, since: Any = None, until: Any = None, now: float | None = None, missing: bool = False) -> Callable[[dict], bool]:
+        """
+        Creates a filter function that checks if the time in a specified field is in [since, until), in a single pass keeping the order.
+
+        Args:
+            field (str): The key in the dictionary holding a timestamp (e.g. created_at).
+            since (Any, optional): Lower bound, see pdh.timeindex.parse_when. Defaults to None (no bound).
+            until (Any, optional): Upper bound, excluded. Defaults to None (no bound).
+            now (float, optional): Epoch seconds relative times are resolved against. Defaults to the current time.
+            missing (bool, optional): Whether objects without a time pass. Defaults to False.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if its time is in the range, otherwise False.
+        """
+        path = accessor.compile(field)
+        lower = parse_when(since, now) if since is not None else None
+        upper = parse_when(until, now) if until is not None else None
+
+        def f(item: dict) -> bool:
+            t = epoch(path(item))
+            if t is None:
+                return missing
+            return (lower is None or t >= lower) and (upper is None or t < upper)
+
+        return costed(f, COST_DATE)
+
+    @staticmethod
+    def older_than(field: str, duration: Any, now: float | None = None) -> Callable[[dict], bool]:
+        """
+        Creates a filter function that checks if the time in a specified field is at least a given duration ago.
+
+        Args:
+            field (str): The key in the dictionary holding a timestamp (e.g. created_at).
+            duration (Any): Seconds or a duration like 2h.
+            now (float, optional): Epoch seconds the age is measured from. Defaults to the current time.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if its time is at least duration old, otherwise False.
+        """
+        now = time.time() if now is None else now
+        seconds = duration if isinstance(duration, (int, float)) else now - parse_when(duration, now)
+        return Filter.until(field, int(now - seconds) + 1)
+
+    @staticmethod
+    def time_range(objects: Iterable[Dict], since: Any = None, until: Any = None, field: str = "created_at", now: float | None = None) -> List[Dict]:
+        """
+        Selects the objects with since <= time < until with a TimeIndex: timestamps are parsed once and the bounds found by bisection.
+        Use TimeIndex directly to run several ranges over the same objects.
+
+        Args:
+            objects (Iterable): The objects to select from.
+            since (Any, optional): Lower bound, see pdh.timeindex.parse_when. Defaults to None (no bound).
+            until (Any, optional): Upper bound, excluded. Defaults to None (no bound).
+            field (str, optional): The field holding the time. Defaults to created_at.
+            now (float, optional): Epoch seconds relative times are resolved against. Defaults to the current time.
+
+        Returns:
+            list: The selected objects sorted by time, objects without a time are dropped.
+        """
+        return TimeIndex(objects, field).range(since, until, now)
 
     @staticmethod
     def inList(field: str, listOfValues: List[str]) -> Callable[[dict], bool]:
@@ -124,15 +325,16 @@ class Filter(object):
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the
             value of the specified field is in the list of values, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else ""
             if val in listOfValues:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def inStr(field: str, value: str) -> Callable[[dict], bool]:
@@ -146,15 +348,16 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary as input and returns True if the value is found in the specified field, otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else ""
             if value.lower() in val.lower():
                 return True
             return False
 
-        return f
+        return costed(f, COST_STR)
 
     @staticmethod
     def ieq(field: str, value: str) -> Callable[[dict], bool]:
@@ -168,15 +371,16 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the value of the specified field matches the given value (case-insensitive), otherwise False.
         """
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else ""
             if val.lower() == value.lower():
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def eq(field: str, value: Any) -> Callable[[dict], bool]:
@@ -190,16 +394,16 @@ class Filter(object):
         Returns:
             Callable[[dict], bool]: A function that takes a dictionary and returns True if the specified field's value equals the given value, otherwise False.
         """
+        path = accessor.compile(field)
 
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else None
             if val == value:
                 return True
             return False
 
-        return f
+        return costed(f, COST_EQ)
 
     @staticmethod
     def regexp(field: str, regexp) -> Callable[[dict], bool]:
@@ -217,15 +421,16 @@ class Filter(object):
         if type(regexp) is str:
             regexp = re.compile(regexp)
 
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else ""
             if regexp.search(val):
                 return True
             return False
 
-        return f
+        return costed(f, COST_REGEXP)
 
     @staticmethod
     def not_regexp(field: str, regexp) -> Callable[[dict], bool]:
@@ -240,31 +445,94 @@ class Filter(object):
         if type(regexp) is str:
             regexp = re.compile(regexp)
 
+        path = accessor.compile(field)
+
         def f(item: dict) -> bool:
-            expr = jsonpath_ng.parse(field)
-            values = [match.value for match in expr.find(item)]
+            values = path.find(item)
             val = values[0] if len(values) > 0 else ""
             if regexp.search(val):
                 return False
             return True
 
-        return f
+        return costed(f, COST_REGEXP)
+
+    @staticmethod
+    def where(expression: str) -> Callable[[dict], bool]:
+        """
+        Creates a filter function from a query expression (see pdh.query), parsed and compiled once.
+
+        Args:
+            expression (str): e.g. 'urgency == "high" and service.summary =~ /db/i and created_at > now-2h'
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if it matches the expression, otherwise False.
+
+        Raises:
+            QueryError: If the expression is not valid.
+        """
+        from .query import Query
+
+        return Query(expression).compile()
+
+    @staticmethod
+    def all_of(filters: List[Callable[[Dict], Any]]) -> Callable[[dict], bool]:
+        """
+        Creates a filter function matching the items matched by all the given filters (AND), cheapest first.
+
+        Args:
+            filters (list): The filter functions to combine.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if every filter returns True, otherwise False.
+        """
+        filters = sorted(filters, key=cost)
+        return costed(fuse(filters), sum(cost(f) for f in filters))
+
+    @staticmethod
+    def any_of(filters: List[Callable[[Dict], Any]]) -> Callable[[dict], bool]:
+        """
+        Creates a filter function matching the items matched by at least one of the given filters (OR), cheapest first.
+
+        Args:
+            filters (list): The filter functions to combine.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if any filter returns True, otherwise False.
+        """
+        filters = sorted(filters, key=cost)
+        return costed(fuse(filters, any_of=True), sum(cost(f) for f in filters))
+
+    @staticmethod
+    def negate(filter_func: Callable[[Dict], Any]) -> Callable[[dict], bool]:
+        """
+        Creates a filter function matching the items not matched by the given filter (NOT).
+
+        Args:
+            filter_func (Callable): The filter function to negate.
+
+        Returns:
+            Callable[[dict], bool]: A function that takes a dictionary and returns True if filter_func returns False, otherwise False.
+        """
+        return costed(lambda item: not filter_func(item), cost(filter_func))
 
     @staticmethod
-    def apply(objects: List[Any] | List[Dict[Any, Any]] | Iterator[Any], filters: List[Callable[[Dict], Any]] = []) -> List[Any] | List[Dict[Any, Any]] | Iterator[Any]:
+    def apply(objects: List[Any] | List[Dict[Any, Any]] | Iterator[Any], filters: List[Callable[[Dict], Any]] = [], lazy: bool = False) -> List[Any] | List[Dict[Any, Any]] | Iterator[Any]:
         """
-        Filters a collection of objects.
+        Filters a collection of objects in a single pass: every object is tested by the filters until one rejects it.
+        Filters run cheapest first, after a sample of objects they are reordered by their measured cost per rejected object.
 
         Args:
             objects (Iterator): An iterator of objects to be filtered and transformed.
-            transformations (dict | None, optional): A dictionary where keys are paths and values are functions to transform the objects. Defaults to None.
-            filters (list, optional): A list of filter functions to apply to the objects. Defaults to an empty list.
+            filters (list, optional): A list of filter functions to apply to the objects (all must match, see all_of, any_of and negate for other combinations). Defaults to an empty list.
+            lazy (bool, optional): If True, return a generator consuming objects one at a time. Defaults to False.
 
         Returns:
-            list: A list of filtered objects (object for which at least one filter function returned True).
+            list: A list of filtered objects (object for which all filter functions returned True).
         """
-        ret = objects
-        for filter_func in filters:
-            ret = [o for o in filter(filter_func, ret)]
+        if not filters:
+            return (o for o in objects) if lazy else objects
 
-        return ret
+        selected = Plan(filters).select(objects)
+        if lazy:
+            return selected
+        return list(selected)
@@ -0,0 +1,119 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import re
+import unicodedata
+from typing import Any, Dict, List, Set
+
+"""
+  Index module provides fast, ranked lookups over a directory (users, teams, services).
+  Values are normalized once and indexed by n-grams, so a query only checks the entries sharing all its n-grams.
+"""
+
+NGRAM = 3
+# minimum n-gram similarity for an entry to be returned by a fuzzy search
+FUZZY_THRESHOLD = 0.3
+
+# ranks, lower is better
+EXACT = 0
+TOKEN = 1
+PREFIX = 2
+TOKEN_PREFIX = 3
+SUBSTRING = 4
+FUZZY = 5
+
+
+def normalize(value: Any) -> str:
+    """Lowercase, strip accents and collapse the whitespaces"""
+    s = unicodedata.normalize("NFKD", str(value or ""))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.lower().split())
+
+
+def tokens(value: str) -> List[str]:
+    return [t for t in re.split(r"[^\w]+", value) if t]
+
+
+def ngrams(value: str, n: int = NGRAM) -> Set[str]:
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+
+class DirectoryIndex(object):
+    """
+    Index the entries of a directory on any of their keys, keys are indexed on first use.
+    """
+
+    def __init__(self, items: List[Dict]) -> None:
+        self.items = items
+        self.values: Dict[str, List[str]] = {}
+        self.grams: Dict[str, Dict[str, Set[int]]] = {}
+
+    def _build(self, key: str) -> None:
+        values = [normalize(i.get(key)) for i in self.items]
+        grams: Dict[str, Set[int]] = {}
+        for n, v in enumerate(values):
+            for g in ngrams(v):
+                grams.setdefault(g, set()).add(n)
+        self.values[key] = values
+        self.grams[key] = grams
+
+    def rank(self, query: str, value: str) -> int:
+        if value == query:
+            return EXACT
+        if query in tokens(value):
+            return TOKEN
+        if value.startswith(query):
+            return PREFIX
+        if any(t.startswith(query) for t in tokens(value)):
+            return TOKEN_PREFIX
+        return SUBSTRING
+
+    def search(self, query: str, key: str = "name", fuzzy: bool = False) -> List[Dict]:
+        """
+        Retrieve the entries containing query in the given key, best matches first:
+        exact, whole word, prefix, word prefix, substring.
+        With fuzzy=True, entries sharing enough n-grams with the query are appended as well.
+        """
+        if key not in self.values:
+            self._build(key)
+        values = self.values[key]
+        q = normalize(query)
+        qgrams = ngrams(q)
+
+        if qgrams:
+            postings = sorted((self.grams[key].get(g, set()) for g in qgrams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            # query shorter than an n-gram
+            candidates = set(range(len(values)))
+
+        ranked = sorted(((self.rank(q, values[n]), len(values[n]), n) for n in candidates if q in values[n]))
+
+        if fuzzy and qgrams:
+            found = {n for _, _, n in ranked}
+            counts: Dict[int, int] = {}
+            for g in qgrams:
+                for n in self.grams[key].get(g, set()):
+                    if n not in found:
+                        counts[n] = counts.get(n, 0) + 1
+            similar = []
+            for n, shared in counts.items():
+                similarity = shared / len(qgrams | ngrams(values[n]))
+                if similarity >= FUZZY_THRESHOLD:
+                    similar.append((-similarity, len(values[n]), n))
+            ranked += [(FUZZY, length, n) for _, length, n in sorted(similar)]
+
+        return [self.items[n] for _, _, n in ranked]
@@ -15,37 +15,86 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import click
+import importlib
 import importlib.metadata
 import sys
 import re
 import os
 import time
-from rich import print
-from rich.console import Console
-from .core import PDH
-
-from .pd import PagerDuty
-from .pd import (
-    STATUS_TRIGGERED,
-    STATUS_ACK,
-    STATUS_RESOLVED,
-    URGENCY_HIGH,
-    URGENCY_LOW,
-    DEFAULT_URGENCIES,
+from .defaults import (
+    VALID_OUTPUTS,
+    STREAM_OUTPUTS,
+    DIRECTORIES,
+    DEFAULT_ACCOUNT,
+    ACCOUNT_FIELD,
+    DEFAULT_RESYNC,
+    DEFAULT_MAX_AGE,
+    DATE_MODES,
+    DATE_RELATIVE,
 )
-from . import Filters, Transformations
-from .config import load_and_validate, setup_config
-from .output import print_items, VALID_OUTPUTS
+
+# Only click and pdh.defaults are imported here: `pdh version`, `pdh config` and shell completion must start fast.
+# Every command imports the modules it needs, see tests/test_main.py::test_import_is_lazy
+
+# names historically importable from pdh.main, resolved on first access (PEP 562)
+_LAZY = {
+    "PDH": "core",
+    "PagerDuty": "pd",
+    "Filters": "",
+    "Transformations": "",
+    "print_items": "output",
+    "load_and_validate": "config",
+    "setup_config": "config",
+    "IncidentSnapshot": "snapshot",
+    "STATUS_TRIGGERED": "pd",
+    "STATUS_ACK": "pd",
+    "STATUS_RESOLVED": "pd",
+    "URGENCY_HIGH": "pd",
+    "URGENCY_LOW": "pd",
+    "DEFAULT_URGENCIES": "pd",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"pdh.{_LAZY[name]}".rstrip("."))
+    return getattr(module, name)
+
+# above this number of matching services --service-re and --excluded-service-re are applied client side
+MAX_SERVICE_IDS = 100
 
 
 @click.group(help="PDH - PagerDuty for Humans")
-def main():
-    pass
+@click.option("--http-stats", is_flag=True, default=False, help="Print a per endpoint summary of the API requests on exit")
+@click.pass_context
+def main(ctx, http_stats):
+    if http_stats:
+        ctx.call_on_close(print_http_stats)
+
+
+def load_config(path: str):
+    """Load and validate the configuration file, exit on errors"""
+    from .config import load_and_validate
+
+    return load_and_validate(path)
+
+
+def print_http_stats():
+    from rich.console import Console
+    from . import metrics
+    from .output import print_items
+
+    summary = metrics.registry.summary()
+    if summary:
+        print_items(summary, "table", console=Console(stderr=True))
 
 
 @main.command(help="Create default configuration file")
 @click.option("-c","--config",default="~/.config/pdh.yaml",help="Configuration file location (default: ~/.config/pdh.yaml)")
 def config(config):
+    from .config import setup_config
+
     setup_config(config)
 
 
@@ -58,17 +107,19 @@ def version():
 @click.option("-c","--config",envvar="PDH_CONFIG",default="~/.config/pdh.yaml",help="Configuration file location (default: ~/.config/pdh.yaml)")
 @click.pass_context
 def user(ctx, config):
-    cfg = load_and_validate(config)
     ctx.ensure_object(dict)
-    ctx.obj = cfg
+    ctx.obj = load_config(config)
 
 
 @user.command(help="List users", name="ls")
 @click.pass_context
 @click.option("-o","--output","output",help="output format",required=False,type=click.Choice(VALID_OUTPUTS),default="table")
 @click.option("-f","--fields","fields",help="Filter fields",required=False,type=str,default=None,)
-def user_list(ctx, output, fields):
-    if not PDH.list_user(ctx.obj, output, fields):
+@click.option("--accounts", "accounts", required=False, default=None, help="Comma separated account names to list, or all")
+def user_list(ctx, output, fields, accounts):
+    from .core import PDH
+
+    if not PDH.list_user(ctx.obj, output, fields, accounts):
         sys.exit(1)
 
 
@@ -78,6 +129,8 @@ def user_list(ctx, output, fields):
 @click.option("-o", "--output", "output", help="output format", required=False, type=click.Choice(VALID_OUTPUTS), default="table",)
 @click.option( "-f", "--fields", "fields", help="Filter fields", required=False, type=str, default=None)
 def user_get(ctx, user, output, fields):
+    from .core import PDH
+
     if not PDH.get_user(ctx.obj, user, output, fields):
         sys.exit(1)
 
@@ -86,15 +139,16 @@ def user_get(ctx, user, output, fields):
 @click.option( "-c", "--config", envvar="PDH_CONFIG", default="~/.config/pdh.yaml", help="Configuration file location (default: ~/.config/pdh.yaml)")
 @click.pass_context
 def inc(ctx, config):
-    cfg = load_and_validate(config)
     ctx.ensure_object(dict)
-    ctx.obj = cfg
+    ctx.obj = load_config(config)
 
 
 @inc.command(help="Acknowledge specific incidents IDs")
 @click.pass_context
 @click.argument("incidentids", nargs=-1)
 def ack(ctx, incidentids):
+    from .core import PDH
+
     PDH.ack(ctx.obj, incidentids)
 
 
@@ -102,6 +156,8 @@ def ack(ctx, incidentids):
 @click.pass_context
 @click.argument("incidentids", nargs=-1)
 def resolve(ctx, incidentids):
+    from .core import PDH
+
     PDH.resolve(ctx.obj, incidentids)
 
 
@@ -110,6 +166,8 @@ def resolve(ctx, incidentids):
 @click.option("-d", "--duration", required=False, default=14400, help="Duration of snooze in seconds")
 @click.argument("incidentids", nargs=-1)
 def snooze(ctx, incidentids, duration):
+    from .core import PDH
+
     PDH.snooze(ctx.obj, incidentids, duration)
 
 
@@ -118,8 +176,77 @@ def snooze(ctx, incidentids, duration):
 @click.option("-u", "--user", required=True, help="User name or email to assign to (fuzzy find!)")
 @click.argument("incident", nargs=-1)
 def reassign(ctx, incident, user):
+    from .core import PDH
+
     PDH.reassign(ctx.obj, incident, user)
 
+def by_account(incs: list, account_of=lambda i: DEFAULT_ACCOUNT) -> dict:
+    """Group the incidents by the account they have been listed from, account_of returns the account of an incident"""
+    groups: dict = {}
+    for i in incs:
+        groups.setdefault(account_of(i), []).append(i)
+    return groups
+
+
+class Listed(object):
+    """
+    The account every incident has been listed from: by object, else by incident ID (incidents returned by rules).
+    The listed objects are kept referenced until cleared, so their id() can't be reused by other dicts.
+    """
+
+    def __init__(self) -> None:
+        self.objects: dict = {}
+        self.ids: dict = {}
+
+    def add(self, inc: dict, account: str) -> None:
+        self.objects[id(inc)] = (inc, account)
+        self.ids[inc["id"]] = account
+
+    def clear(self) -> None:
+        self.objects.clear()
+        self.ids.clear()
+
+    def __call__(self, inc: dict) -> str:
+        entry = self.objects.get(id(inc))
+        if entry is not None and entry[0] is inc:
+            return entry[1]
+        return self.ids.get(inc.get("id"), DEFAULT_ACCOUNT)
+
+
+def incident_transformations(fields: list, alert_fields: list, dates: str = DATE_RELATIVE) -> dict:
+    """Build the transformations rendering the given incident fields, dates as relative, absolute or epoch times"""
+    from . import Transformations
+    from .pd import STATUS_TRIGGERED, STATUS_ACK, STATUS_RESOLVED, URGENCY_HIGH, URGENCY_LOW
+
+    transformations = dict()
+    for f in fields:
+        transformations[f] = Transformations.extract(f)
+        # special cases
+        if f == "assignee":
+            transformations[f] = Transformations.extract_assignees()
+        if f == "status":
+            transformations[f] = Transformations.extract_decorate("status", color_map={STATUS_TRIGGERED: "red", STATUS_ACK: "yellow", STATUS_RESOLVED: "green"}, default_color="cyan", change_map={STATUS_TRIGGERED: "✘", STATUS_ACK: "✔", STATUS_RESOLVED: "✔"})
+        if f == "url":
+            transformations[f] = Transformations.extract("html_url")
+        if f == "urgency":
+            transformations[f] = Transformations.extract_decorate("urgency", color_map={URGENCY_HIGH: "red", URGENCY_LOW: "green"}, change_map={URGENCY_HIGH: "HIGH", URGENCY_LOW: "LOW"})
+        if f == "service.summary":
+            transformations["service"] = Transformations.extract("service.summary")
+        if f in ["title", "urgency"]:
+            def mapper(item:str, d:dict) -> str:
+                if "urgency" in d and d["urgency"] == URGENCY_HIGH:
+                    return f"[red]{item}[/red]"
+                return f"[cyan]{item}[/cyan]"
+
+            transformations[f] = Transformations.extract_decorate(f, default_color="cyan", color_map={
+                                                         URGENCY_HIGH: "red"}, map_func=mapper)
+        if f in ["created_at", "last_status_change_at"]:
+            transformations[f] = Transformations.extract_date(f, mode=dates)
+        if f in ["alerts"]:
+            transformations[f] = Transformations.extract_alerts(f, alert_fields)
+    return transformations
+
+
 @inc.command(help="List incidents", name="ls")
 @click.pass_context
 @click.option("-e", "--everything", help="List all incidents not only assigned to me", is_flag=True, default=False)
@@ -144,9 +271,32 @@ def reassign(ctx, incident, user):
 @click.option("--sort", "sort_by", required=False, help="Sort by field name", default=None)
 @click.option("--reverse", "reverse_sort", required=False, help="Reverse the sort", is_flag=True, default=False)
 @click.option("-T", "--teams", "teams", required=False, help="Filter only incidents assigned to this team IDs", default=None)
-def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low, watch, timeout, regexp, rules, rules_path, fields, alerts, alert_fields, service_re, excluded_service_re, sort_by, reverse_sort, teams):
+@click.option("--incremental", "incremental", required=False, help="With --watch, fetch only the incidents changed since the previous refresh", is_flag=True, default=False)
+@click.option("--resync", "resync", required=False, help="With --incremental, reload the full list every x seconds", default=DEFAULT_RESYNC)
+@click.option("--accounts", "accounts", required=False, default=None, help="Comma separated account names to list, or all")
+@click.option("-W", "--where", "where", required=False, default=None, help='Filter expression, e.g. \'urgency == "high" and service.summary =~ /db/ and created_at > now-2h\'')
+@click.option("--since", "since", required=False, default=None, help="Only incidents created since this time: ISO date, epoch seconds, a duration ago (2h) or now-2h")
+@click.option("--until", "until", required=False, default=None, help="Only incidents created before this time, same formats as --since")
+@click.option("--dates", "dates", required=False, type=click.Choice(DATE_MODES), default=DATE_RELATIVE, help="Render dates as relative (3d 4h ago), absolute (ISO 8601) or epoch seconds")
+def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low, watch, timeout, regexp, rules, rules_path, fields, alerts, alert_fields, service_re, excluded_service_re, sort_by, reverse_sort, teams, incremental, resync, accounts, where, since, until, dates):
+    from rich import print
+    from rich.console import Console
+    from . import Filters, Transformations
+    from . import daemon
+    from . import executor
+    from .output import print_items
+    from .pd import PagerDuty, STATUS_TRIGGERED, STATUS_ACK, URGENCY_HIGH, URGENCY_LOW, DEFAULT_URGENCIES
+    from .snapshot import IncidentSnapshot
+    from .query import Query, QueryError, merge
+    from . import timeindex
 
-    pd = PagerDuty(ctx.obj)
+    try:
+        configs = ctx.obj.select(accounts) if accounts else {DEFAULT_ACCOUNT: ctx.obj}
+    except ValueError as e:
+        print(f"[red]{e}[/red]")
+        sys.exit(1)
+    clients = {name: PagerDuty(c) for name, c in configs.items()}
+    pd = next(iter(clients.values()))
 
     # Prepare defaults
     status = [STATUS_TRIGGERED]
@@ -157,16 +307,30 @@ def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low
         urgencies = [URGENCY_LOW]
     if not new:
         status.append(STATUS_ACK)
-    userid = None
-    if user:
-        userid = pd.users.id(query=user, key="name")
-
     filter_re = None
     try:
         filter_re = re.compile(regexp)
     except Exception as e:
         print(f"[red]Invalid regular expression: {str(e)}[/red]")
         sys.exit(-2)
+    # parsed once, compiled on every refresh so relative times (now-2h) move with --watch
+    where_query = None
+    if where:
+        try:
+            where_query = Query(where)
+        except QueryError as e:
+            print(f"[red]Invalid --where expression: {e}[/red]")
+            sys.exit(-2)
+    # created_at bounds, relative ones (2h, now-2h) are resolved again on every refresh
+    bounds = {}
+    for name, value in (("since", since), ("until", until)):
+        if not value:
+            continue
+        try:
+            bounds[name] = timeindex.parse_when(value)
+        except ValueError as e:
+            print(f"[red]Invalid --{name}: {e}[/red]")
+            sys.exit(-2)
 
     incs = []
     console = Console()
@@ -179,24 +343,114 @@ def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low
         fields = ["id", "assignee", "title", "status", "created_at","service.summary"]
     if alerts:
         fields.append("alerts")
+    if accounts:
+        fields.insert(0, ACCOUNT_FIELD)
 
     if type(alert_fields) is str:
         alert_fields = alert_fields.lower().strip().split(",")
     else:
         alert_fields = ["status", "created_at", "service.summary", "body.details"]
 
-    if type(teams) is str:
-        if teams == "mine":
-            teamNames = dict(pd.me)["teams"] if "teams" in dict(pd.me) else []
-            teams = [ t["id"] for t in teamNames if "id" in t ]
-        else:
-            teams = teams.lower().strip().split(",")
+    def query(pd: PagerDuty) -> dict | None:
+        """Incidents list parameters of an account, None if no service of the account matches"""
+        userid = pd.users.id(query=user, key="name") if user else None
+        team_ids = teams
+        if type(teams) is str:
+            if teams == "mine":
+                teamNames = dict(pd.me)["teams"] if "teams" in dict(pd.me) else []
+                team_ids = [ t["id"] for t in teamNames if "id" in t ]
+            else:
+                team_ids = teams.lower().strip().split(",")
+
+        if not everything and not userid:
+            userid = pd.cfg["uid"]
+
+        # resolve the service regexp against the service catalog and let the API filter the incidents.
+        # An exclusion alone stays client side: as an allow-list it would drop the services created since
+        services = None
+        if service_re:
+            try:
+                services = pd.services.match(service_re, excluded_service_re)
+            except re.error as e:
+                print(f"[red]Invalid regular expression: {str(e)}[/red]")
+                sys.exit(-2)
+            if len(services) > MAX_SERVICE_IDS:
+                # too many IDs for a query string, filter client side instead
+                services = None
+        if services is not None and len(services) == 0:
+            return None
+        return {"userid": userid, "statuses": status, "urgencies": urgencies, "teams": team_ids, "services": services}
+
+    def plan() -> dict:
+        """The incidents list parameters of every account"""
+        queries = {name: query(c) for name, c in clients.items()}
+        if where_query is not None:
+            # let the API drop what the expression would filter out anyway (status, urgency, services, teams, created_at)
+            pushed = where_query.pushdown()
+            queries = {name: merge(q, pushed) if q is not None else None for name, q in queries.items()}
+        if bounds:
+            # a relative upper bound moves forward while watching, pushing it would drop new incidents
+            pushed = {name: timeindex.iso(when) for name, when in bounds.items() if name == "since" or not timeindex.relative(until)}
+            queries = {name: merge(q, pushed) if q is not None else None for name, q in queries.items()}
+        return queries
+
+    queries = plan()
+    # the service regexps are applied client side if any account has too many matching services
+    # (or, with an exclusion only, the service IDs have not been pushed)
+    client_side = not service_re or any(q is not None and q["services"] is None for q in queries.values())
+    # plain and ndjson outputs can be written while pages are still being fetched
+    streaming = output in STREAM_OUTPUTS and not (watch or rules or sort_by or alerts or ack or snooze or resolve or accounts)
+
+    # the row builder of the displayed fields, compiled once for every --watch refresh
+    transformations = incident_transformations(fields, alert_fields, dates)
+    # the account of every incident listed from several accounts, the API incidents are given untouched
+    # to rules and updates and the account column is added when rendering
+    account_of = Listed()
+
+    if accounts:
+        transformations[ACCOUNT_FIELD] = account_of
+    projection = Transformations.Projection(transformations)
+
+    snapshots = {}
+    if incremental:
+        snapshots = {name: IncidentSnapshot(clients[name].incidents, resync=resync, **q) for name, q in queries.items() if q is not None}
+
+    # a running `pdh serve` answers from its warm snapshot of the account
+    remote = daemon.connect(ctx.obj) if not (accounts or incremental) else None
+
+    def fetch(name: str) -> list:
+        nonlocal remote
+        q = queries[name]
+        if q is None:
+            return []
+        if name in snapshots:
+            return snapshots[name].refresh()
+        if remote is not None:
+            try:
+                return remote.call("incidents", query=q)
+            except (OSError, ValueError, daemon.DaemonError) as e:
+                print(f"[yellow]Daemon unavailable, querying the API: {e}[/yellow]")
+                remote = None
+        if streaming:
+            return clients[name].incidents.iter(**q)
+        return clients[name].incidents.list(**q)
 
-    if not everything and not userid:
-        userid = pd.cfg["uid"]
     while True:
 
-        incs = pd.incidents.list(userid, statuses=status, urgencies=urgencies, teams=teams)
+        if accounts:
+            # query every account concurrently and merge the incidents by creation time
+            incs = []
+            account_of.clear()
+            for r in executor.run(fetch, list(clients), workers=len(clients)):
+                if not r.ok:
+                    print(f"[red]Account {r.id}: {r.error}[/red]")
+                    continue
+                for i in r.value:
+                    account_of.add(i, r.id)
+                    incs.append(i)
+            incs.sort(key=lambda i: i.get("created_at") or "")
+        else:
+            incs = fetch(DEFAULT_ACCOUNT)
 
         if rules:
             scripts = []
@@ -221,49 +475,36 @@ def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low
             else:
                 print(ret)
 
-        incs = Filters.apply(incs, filters=[Filters.regexp("title", filter_re)])
-
-        if service_re:
-            incs = Transformations.apply(incs, {"service": Transformations.extract("service.summary")}, preserve=True)
-            incs = Filters.apply(incs, [Filters.regexp("service", service_re)])
-
-        if excluded_service_re:
-            incs = Transformations.apply(incs, {"service": Transformations.extract("service.summary")}, preserve=True)
-            incs = Filters.apply(incs, [Filters.not_regexp("service", excluded_service_re)])
+        # all the filters go through a single Filters.apply
+        filters = [Filters.regexp("title", filter_re)]
+        if service_re and client_side:
+            filters.append(Filters.regexp("service.summary", service_re))
+        if excluded_service_re and client_side:
+            filters.append(Filters.not_regexp("service.summary", excluded_service_re))
+        if where_query is not None:
+            filters.append(where_query.compile())
+        if bounds:
+            now = time.time()
+            lower = timeindex.parse_when(since, now) if since else None
+            upper = timeindex.parse_when(until, now) if until else None
+            # in the order of the API, incidents without a creation time can't be ruled out
+            filters.append(Filters.between("created_at", lower, upper, missing=True))
+        incs = Filters.apply(incs, filters=filters, lazy=streaming)
 
         if alerts:
-            for i in incs:
-                i["alerts"] = pd.incidents.alerts(i["id"])
+            for name, group in by_account(incs, account_of).items():
+                results = clients[name].incidents.alerts_batch([i["id"] for i in group])
+                for i, r in zip(group, results):
+                    i["alerts"] = r.value if r.ok else []
+                    if not r.ok:
+                        print(f"[red]Unable to retrieve alerts for {r.id}: {r.error}[/red]")
 
         # Build filtered list for output
         if output != "raw":
-            transformations = dict()
-            for f in fields:
-                transformations[f] = Transformations.extract(f)
-                # special cases
-                if f == "assignee":
-                    transformations[f] = Transformations.extract_assignees()
-                if f == "status":
-                    transformations[f] = Transformations.extract_decorate("status", color_map={STATUS_TRIGGERED: "red", STATUS_ACK: "yellow", STATUS_RESOLVED: "green"}, default_color="cyan", change_map={STATUS_TRIGGERED: "✘", STATUS_ACK: "✔", STATUS_RESOLVED: "✔"})
-                if f == "url":
-                    transformations[f] = Transformations.extract("html_url")
-                if f == "urgency":
-                    transformations[f] = Transformations.extract_decorate("urgency", color_map={URGENCY_HIGH: "red", URGENCY_LOW: "green"}, change_map={URGENCY_HIGH: "HIGH", URGENCY_LOW: "LOW"})
-                if f == "service.summary":
-                    transformations["service"] = Transformations.extract("service.summary")
-                if f in ["title", "urgency"]:
-                    def mapper(item:str, d:dict) -> str:
-                        if "urgency" in d and d["urgency"] == URGENCY_HIGH:
-                            return f"[red]{item}[/red]"
-                        return f"[cyan]{item}[/cyan]"
-
-                    transformations[f] = Transformations.extract_decorate(f, default_color="cyan", color_map={
-                                                                 URGENCY_HIGH: "red"}, map_func=mapper)
-                if f in ["created_at", "last_status_change_at"]:
-                    transformations[f] = Transformations.extract_date(f)
-                if f in ["alerts"]:
-                    transformations[f] = Transformations.extract_alerts(f, alert_fields)
-            filtered = Transformations.apply(incs, transformations)
+            filtered = Transformations.apply(incs, projection, lazy=streaming)
+        elif accounts:
+            # raw output, using json format, the account tagged on copies
+            filtered = [dict(i, **{ACCOUNT_FIELD: account_of(i)}) for i in incs]
         else:
             # raw output, using json format
             filtered = incs
@@ -292,35 +533,52 @@ def inc_list(ctx, everything, user, new, ack, output, snooze, resolve, high, low
         print_items(filtered, output, plain_print_f=plain_print_f)
 
         # now apply actions like snooze, resolve, ack...
-        ids = [i["id"] for i in incs]
         if ack:
-            pd.incidents.ack(incs)
-            if output not in ["yaml", "json"]:
-                for i in ids:
-                    print(f"Marked {i} as [yellow]ACK[/yellow]")
+            results = [r for name, group in by_account(incs, account_of).items() for r in clients[name].incidents.ack(group)]
+            if output not in ["yaml", "json", "ndjson"]:
+                for r in results:
+                    if r.ok:
+                        print(f"Marked {r.id} as [yellow]ACK[/yellow]")
+                    else:
+                        print(f"[red]Unable to ACK {r.id}: {r.error}[/red]")
         if snooze:
-            pd.incidents.snooze(incs)
-            if output not in ["yaml", "json"]:
-                for i in ids:
-                    print(f"Snoozing incident {i} for 4h")
+            results = [r for name, group in by_account(incs, account_of).items() for r in clients[name].incidents.snooze(group)]
+            if output not in ["yaml", "json", "ndjson"]:
+                for r in results:
+                    if r.ok:
+                        print(f"Snoozing incident {r.id} for 4h")
+                    else:
+                        print(f"[red]Unable to snooze incident {r.id}: {r.error}[/red]")
         if resolve:
-            pd.incidents.resolve(incs)
-            if output not in ["yaml", "json"]:
-                for i in ids:
-                    print(f"Mark {i} as [green]RESOLVED[/green]")
+            results = [r for name, group in by_account(incs, account_of).items() for r in clients[name].incidents.resolve(group)]
+            if output not in ["yaml", "json", "ndjson"]:
+                for r in results:
+                    if r.ok:
+                        print(f"Mark {r.id} as [green]RESOLVED[/green]")
+                    else:
+                        print(f"[red]Unable to resolve {r.id}: {r.error}[/red]")
 
         if not watch:
             break
         time.sleep(timeout)
         console.clear()
 
+        if service_re and not client_side:
+            # services created while watching: resolve the regexp again, the catalog is refetched when stale
+            previous, queries = queries, plan()
+            client_side = any(q is not None and q["services"] is None for q in queries.values())
+            for name, q in queries.items():
+                if incremental and q != previous[name]:
+                    snapshots.pop(name, None)
+                    if q is not None:
+                        snapshots[name] = IncidentSnapshot(clients[name].incidents, resync=resync, **q)
+
 @main.group(help="Operate on Services", name="svc")
 @click.option( "-c", "--config", envvar="PDH_CONFIG", default="~/.config/pdh.yaml", help="Configuration file location (default: ~/.config/pdh.yaml)" )
 @click.pass_context
 def svc(ctx, config):
-    cfg = load_and_validate(config)
     ctx.ensure_object(dict)
-    ctx.obj = cfg
+    ctx.obj = load_config(config)
 
 
 @svc.command(help="List services", name="ls")
@@ -329,18 +587,20 @@ def svc(ctx, config):
 @click.option("--sort", "sort_by", required=False, help="Sort by field name", default=None)
 @click.option("--reverse", "reverse_sort", required=False, help="Reverse the sort", is_flag=True, default=False)
 @click.option("-s", "--status", "status", required=False, help="Filter for service status", default="active,warning,critical")
+@click.option("--accounts", "accounts", required=False, default=None, help="Comma separated account names to list, or all")
 @click.pass_context
-def svc_list(ctx, output, fields, sort_by, reverse_sort, status):
-    if not PDH.list_services(ctx.obj, output, fields, sort_by, reverse_sort, status):
+def svc_list(ctx, output, fields, sort_by, reverse_sort, status, accounts):
+    from .core import PDH
+
+    if not PDH.list_services(ctx.obj, output, fields, sort_by, reverse_sort, status, accounts):
         sys.exit(1)
 
 @main.group(help="Operate on Teams", name="teams")
 @click.option( "-c", "--config", envvar="PDH_CONFIG", default="~/.config/pdh.yaml", help="Configuration file location (default: ~/.config/pdh.yaml)", )
 @click.pass_context
 def teams(ctx, config):
-    cfg = load_and_validate(config)
     ctx.ensure_object(dict)
-    ctx.obj = cfg
+    ctx.obj = load_config(config)
 
 
 @teams.command(help="List teams where current user belongs", name="mine")
@@ -348,6 +608,8 @@ def teams(ctx, config):
 @click.option("-f", "--fields", "fields", required=False, help="Fields to filter and output", default=None)
 @click.pass_context
 def teams_mine(ctx, output, fields) -> None:
+    from .core import PDH
+
     if not PDH.list_teams(ctx.obj, mine=True, output=output, fields=fields):
         sys.exit(1)
 
@@ -358,5 +620,68 @@ def teams_mine(ctx, output, fields) -> None:
 @click.option("-f", "--fields", "fields", required=False, help="Fields to filter and output", default=None)
 @click.pass_context
 def teams_list(ctx, output, fields) -> None:
+    from .core import PDH
+
     if not PDH.list_teams(ctx.obj, mine=False, output=output, fields=fields):
         sys.exit(1)
+
+
+@main.group(help="Operate on the local cache of users, teams and services", name="cache")
+@click.option( "-c", "--config", envvar="PDH_CONFIG", default="~/.config/pdh.yaml", help="Configuration file location (default: ~/.config/pdh.yaml)", )
+@click.pass_context
+def cache(ctx, config):
+    ctx.ensure_object(dict)
+    ctx.obj = load_config(config)
+
+
+def parse_directories(directories: str) -> list[str]:
+    from rich import print
+
+    ret = directories.lower().strip().split(",")
+    for d in ret:
+        if d not in DIRECTORIES:
+            print(f"[red]Invalid directory: {d}[/red]")
+            print(f"[yellow]Available directories: {', '.join(DIRECTORIES)}[/yellow]")
+            sys.exit(-2)
+    return ret
+
+
+@cache.command(help="Fetch and store the directories in the cache", name="warm")
+@click.option("-d", "--directories", "directories", required=False, help="Directories to fetch, comma separated", default=",".join(DIRECTORIES))
+@click.pass_context
+def cache_warm(ctx, directories) -> None:
+    from .core import PDH
+
+    if not PDH.cache_warm(ctx.obj, parse_directories(directories)):
+        sys.exit(1)
+
+
+@cache.command(help="Show the cached directories", name="stats")
+@click.option("-o", "--output", "output", help="output format", required=False, type=click.Choice(VALID_OUTPUTS), default="table")
+@click.pass_context
+def cache_stats(ctx, output) -> None:
+    from .core import PDH
+
+    if not PDH.cache_stats(ctx.obj, output):
+        sys.exit(1)
+
+
+@cache.command(help="Remove the directories from the cache", name="clear")
+@click.option("-d", "--directories", "directories", required=False, help="Directories to remove, comma separated", default=",".join(DIRECTORIES))
+@click.pass_context
+def cache_clear(ctx, directories) -> None:
+    from .core import PDH
+
+    if not PDH.cache_clear(ctx.obj, parse_directories(directories)):
+        sys.exit(1)
+
+
+@main.command(help="Run a daemon keeping the account warm, inc ls, ack and resolve are forwarded to it", name="serve")
+@click.option( "-c", "--config", envvar="PDH_CONFIG", default="~/.config/pdh.yaml", help="Configuration file location (default: ~/.config/pdh.yaml)", )
+@click.option("--max-age", "max_age", required=False, help="Seconds an incidents list is served before being refreshed", default=DEFAULT_MAX_AGE)
+@click.option("--stop", "stop", required=False, help="Stop the running daemon", is_flag=True, default=False)
+def serve(config, max_age, stop) -> None:
+    from .core import PDH
+
+    if not PDH.serve(load_config(config), max_age, stop):
+        sys.exit(1)
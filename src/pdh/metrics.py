@@ -0,0 +1,105 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import math
+import threading
+from typing import Any, Dict, List, Tuple
+
+"""
+  Metrics module records every HTTP request sent to PagerDuty APIs in an in-process registry.
+  A request is recorded once, its retries (network errors, throttling) are counted as attempts of the same request.
+"""
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of the given values, 0 if empty"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Registry(object):
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, method: str, endpoint: str, status: int | None, latency: float, retries: int = 0, size: int = 0, page: bool = False, waited: float = 0.0) -> None:
+        """Record a completed request, status is None if no response was received"""
+        key = f"{method} {endpoint}"
+        with self.lock:
+            e = self.endpoints.setdefault(key, {"latencies": [], "errors": 0, "retries": 0, "bytes": 0, "pages": 0, "waited": 0.0, "statuses": {}})
+            e["latencies"].append(latency)
+            e["statuses"][status] = e["statuses"].get(status, 0) + 1
+            if status is None or status >= 400:
+                e["errors"] += 1
+            e["retries"] += retries
+            e["bytes"] += size
+            e["pages"] += 1 if page else 0
+            e["waited"] += waited
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One entry per endpoint, latencies in milliseconds"""
+        ret = []
+        with self.lock:
+            for key, e in sorted(self.endpoints.items()):
+                ret.append({
+                    "endpoint": key,
+                    "count": len(e["latencies"]),
+                    "errors": e["errors"],
+                    "retries": e["retries"],
+                    "pages": e["pages"],
+                    "bytes": e["bytes"],
+                    "p50": round(percentile(e["latencies"], 50) * 1000, 1),
+                    "p95": round(percentile(e["latencies"], 95) * 1000, 1),
+                    "p99": round(percentile(e["latencies"], 99) * 1000, 1),
+                    "total": round(sum(e["latencies"]) * 1000, 1),
+                    "wait": round(e["waited"] * 1000, 1),
+                })
+        return ret
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints = {}
+
+
+# the registry shared by all the sessions of this process
+registry = Registry()
+
+# attempts and throttling wait of the request running in the current thread
+_current = threading.local()
+
+
+def begin() -> None:
+    _current.attempts = 0
+    _current.waited = 0.0
+
+
+def attempt(waited: float = 0.0) -> None:
+    """Called by the transport for every attempt of the current request"""
+    if hasattr(_current, "attempts"):
+        _current.attempts += 1
+        _current.waited += waited
+
+
+def end() -> Tuple[int, float]:
+    """Return the number of attempts and the seconds spent waiting for the current request"""
+    ret = (getattr(_current, "attempts", 0), getattr(_current, "waited", 0.0))
+    if hasattr(_current, "attempts"):
+        del _current.attempts
+        del _current.waited
+    return ret
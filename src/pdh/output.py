@@ -20,7 +20,10 @@ from rich.table import Table
 from rich.console import Console
 from rich import print as rich_print
 
-VALID_OUTPUTS = ["plain", "table", "json", "yaml", "raw"]
+from .defaults import VALID_OUTPUTS, STREAM_OUTPUTS
+
+# VALID_OUTPUTS moved to pdh.defaults, still importable from here
+__all__ = ["Output", "print_items", "print", "VALID_OUTPUTS", "STREAM_OUTPUTS"]
 
 
 class Output(object):
@@ -36,6 +39,15 @@ class Output(object):
             else:
                 console.print(i)
 
+    def ndjson(self, **kwargs) -> None:
+        items = kwargs["items"] if "items" in kwargs else []
+        console = kwargs["console"] if "console" in kwargs else None
+        if console is None:
+            console = Console()
+        for i in items:
+            console.file.write(json.dumps(i) + "\n")
+            console.file.flush()
+
     def raw(self, **kwargs) -> None:
         items = kwargs["items"] if "items" in kwargs else []
         console = kwargs["console"] if "console" in kwargs else None
@@ -93,6 +105,9 @@ def print_items(
         even_color: str = "grey50 on black"
     ) -> None:
 
+    if output not in STREAM_OUTPUTS and not isinstance(items, list):
+        items = list(items)
+
     getattr(Output(), output)(
         items=items,
         skip_columns=skip_columns,
@@ -14,17 +14,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
+import re
 import subprocess
-from typing import Any, Dict, Iterator, List, Callable
+from typing import Any, Dict, Iterable, Iterator, List, Callable
 from rich import print
-from pagerduty import RestApiV2Client, Error
+from pagerduty import RestApiV2Client, Error, HttpError, UrlError, successful_response
 import json
-from .config import Config
-from functools import lru_cache
+import random
 import time
+from datetime import datetime, timezone
+from requests import Response
+from .config import Config
+from .cache import DirectoryCache
+from .index import DirectoryIndex
+from . import executor
+from . import scheduler
+from . import metrics
+from . import cassette
+from .executor import TaskResult
 
 
-class UnauthorizedException(Exception):
+class UnauthorizedException(Error):
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
 
@@ -38,9 +48,33 @@ STATUS_RESOLVED = "resolved"
 DEFAULT_STATUSES = [STATUS_TRIGGERED, STATUS_ACK]
 DEFAULT_URGENCIES = [URGENCY_HIGH, URGENCY_LOW]
 
+# PUT /incidents accepts at most this number of incidents per request
+BULK_UPDATE_LIMIT = 250
+BULK_UPDATE_RETRIES = 2
+# seconds before the first retry of a failed chunk, doubled at every attempt up to the max
+BULK_UPDATE_BACKOFF = 0.5
+BULK_UPDATE_MAX_BACKOFF = 8.0
+# seconds a cached service catalog is trusted to resolve service names into IDs for a query
+MATCH_MAX_AGE = 300
+
+
+def backoff(attempt: int, base: float = BULK_UPDATE_BACKOFF, cap: float = BULK_UPDATE_MAX_BACKOFF) -> float:
+    """Seconds to wait before the retry number attempt (from 0): exponential, the second half of it random (equal jitter)"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.random() * delay / 2
 
-def ttl_hash(seconds=30):
-    return round(time.time() / seconds)
+
+def match_services(services: Iterable[Dict], regexp: str | re.Pattern | None = None, excluded_regexp: str | re.Pattern | None = None) -> List[str]:
+    """The IDs of the services whose name matches regexp and doesn't match excluded_regexp"""
+    ids = []
+    for s in services:
+        name = s.get("name") or ""
+        if regexp and not re.search(regexp, name):
+            continue
+        if excluded_regexp and re.search(excluded_regexp, name):
+            continue
+        ids.append(s["id"])
+    return ids
 
 
 class RuleExecutionError(Exception):
@@ -51,6 +85,131 @@ class RuleInvalidOutput(TypeError):
     pass
 
 
+def log_entry_params(since: datetime, teams: List[str] | None = None) -> Dict[str, Any]:
+    """The parameters listing the log entries of the given teams (all if None) since the given time"""
+    params: Dict[str, Any] = {"since": since.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), "is_overview": "true"}
+    if teams:
+        params["team_ids[]"] = teams
+    return params
+
+
+def log_entry_incidents(entries: Iterable[Dict], services: List[str] | None = None, limit: int | None = None) -> List[str]:
+    """
+    The IDs of the incidents referenced by the log entries, once each in first-seen order.
+    Entries of services not in services are skipped, no more than limit + 1 IDs are collected.
+    """
+    # a dict keeps the first-seen order with constant time lookups
+    ids: Dict[str, None] = {}
+    for entry in entries:
+        if "incident" not in entry:
+            continue
+        if services and "service" in entry and entry["service"].get("id") not in services:
+            continue
+        ids.setdefault(entry["incident"]["id"], None)
+        if limit is not None and len(ids) > limit:
+            break
+    return list(ids)
+
+
+def user_teams(users: Iterable[Dict]) -> List[Dict]:
+    """The teams of the given users"""
+    teams = []
+    for user in users:
+        teams.extend(user["teams"])
+    return teams
+
+
+def rule_output(returncode: int | None, stdout: str | bytes, stderr: str | bytes) -> Dict:
+    """The incidents returned by a rule, raises RuleExecutionError if the rule failed and RuleInvalidOutput if it printed no JSON object"""
+    if returncode != 0:
+        raise RuleExecutionError(f"Error executing rule: {stderr.decode() if isinstance(stderr, bytes) else stderr}")
+    output = json.loads(stdout)
+    if type(output) not in [dict, list, tuple]:
+        raise RuleInvalidOutput(
+            f"invalid rule output it must be a json object, found: {type(output)}")
+    return output
+
+
+class BulkUpdate(object):
+    """
+    The bookkeeping of a bulk update: incidents split in chunks accepted by the API, the outcome of every incident
+    and the chunks left to retry, for the synchronous and asyncio clients sending the chunks.
+
+        update = BulkUpdate(incs)
+        for delay in update.rounds():
+            time.sleep(delay)
+            update.collect(executor.run(send, update.pending, key=update.key))
+        return update.results()
+    """
+
+    def __init__(self, incs: Iterable[Dict], chunk_size: int = BULK_UPDATE_LIMIT, retries: int = BULK_UPDATE_RETRIES) -> None:
+        self.incs = list(incs)
+        self.retries = retries
+        self.pending = [self.incs[n:n + chunk_size] for n in range(0, len(self.incs), chunk_size)]
+        self.outcomes: Dict[str, TaskResult] = {}
+
+    @staticmethod
+    def key(chunk: List[Dict]) -> List[str]:
+        return [i["id"] for i in chunk]
+
+    def rounds(self) -> Iterator[float]:
+        """The seconds to wait before sending the pending chunks, for every attempt while some chunks are pending"""
+        for attempt in range(self.retries + 1):
+            if not self.pending:
+                return
+            yield backoff(attempt - 1) if attempt else 0.0
+
+    def collect(self, sent: List[TaskResult]) -> None:
+        """Record the results of the pending chunks, in the same order, keeping the ones to retry"""
+        self.pending = [chunk for chunk, r in zip(self.pending, sent) if Incidents.collect(chunk, r, self.outcomes)]
+
+    def results(self) -> List[TaskResult]:
+        """One result per incident, in the order given"""
+        return [self.outcomes[i["id"]] for i in self.incs]
+
+
+class Session(RestApiV2Client):
+    """
+    RestApiV2Client raising UnauthorizedException as soon as the API key is rejected
+    and recording every request in a metrics Registry.
+    """
+
+    def __init__(self, *args, registry: metrics.Registry = metrics.registry, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = registry
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        response = None
+        metrics.begin()
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+            return response
+        except HttpError as e:
+            response = e.response
+            if e.response is not None and e.response.status_code == 401:
+                raise UnauthorizedException(str(e))
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            attempts, waited = metrics.end()
+            try:
+                endpoint = self.canonical_path(url)
+            except UrlError:
+                endpoint = url
+            params = kwargs.get("params") or {}
+            self.metrics.record(
+                method.upper(),
+                endpoint,
+                response.status_code if response is not None else None,
+                latency,
+                retries=max(0, attempts - 1),
+                size=len(response.content or b"") if response is not None else 0,
+                page="offset" in params or "cursor" in params,
+                waited=waited,
+            )
+
+
 class PagerDuty(object):
 
     # Expose the constants to the outside (rules)
@@ -69,22 +228,52 @@ class PagerDuty(object):
         super().__init__()
 
         self.cfg: Config = cfg
-        self.session: RestApiV2Client = RestApiV2Client(
+        self.session: RestApiV2Client = Session(
             cfg["apikey"], default_from=cfg["email"])
         self.session.max_network_attempts = 5
-        self.users = Users(self.cfg, self.session)
-        self.services = Services(self.cfg, self.session)
+        self.metrics: metrics.Registry = self.session.metrics
+        self.scheduler = scheduler.shared(cfg["apikey"], cfg["rate_limit"] if "rate_limit" in cfg else scheduler.DEFAULT_RATE_LIMIT)
+        transport = cassette.from_env()
+        if isinstance(transport, cassette.ReplayAdapter):
+            # replayed exchanges don't consume the API rate limit
+            self.session.mount("https://", transport)
+        else:
+            self.session.mount("https://", scheduler.SchedulerAdapter(self.scheduler, inner=transport))
+        self.cache = DirectoryCache.for_config(cfg)
+        self.users = Users(self.cfg, self.session, self.cache)
+        self.services = Services(self.cfg, self.session, self.cache)
         self.incidents = Incidents(self.cfg, self.session)
-        self.teams = Teams(self.cfg, self.session)
-        try:
-            self.abilities: List | Dict = self.session.rget("/abilities")
-        except Error as e:
-            raise UnauthorizedException(str(e))
-        try:
-            self.me: List[Any] | Dict[Any,
-                                      Any] = self.session.rget("/users/me")
-        except Error:
-            self.me = {}
+        self.teams = Teams(self.cfg, self.session, self.cache)
+        self._abilities: List | Dict | None = None
+        self._me: List[Any] | Dict[Any, Any] | None = None
+
+    @property
+    def abilities(self) -> List | Dict:
+        """The account abilities, loaded on first use"""
+        if self._abilities is None:
+            self._abilities = self.cache.get_value("abilities")
+        if self._abilities is None:
+            try:
+                self._abilities = self.session.rget("/abilities")
+            except Error as e:
+                raise UnauthorizedException(str(e))
+            self.cache.set_value("abilities", self._abilities)
+        return self._abilities
+
+    @property
+    def me(self) -> List[Any] | Dict[Any, Any]:
+        """The user owning the API key, loaded on first use"""
+        if self._me is None:
+            self._me = self.cache.get_value("me")
+        if self._me is None:
+            try:
+                self._me = self.session.rget("/users/me")
+                self.cache.set_value("me", self._me)
+            except UnauthorizedException:
+                raise
+            except Error:
+                self._me = {}
+        return self._me
 
 
 class Incidents(object):
@@ -92,15 +281,41 @@ class Incidents(object):
     def __init__(self, cfg: Config, session: RestApiV2Client) -> None:
         self.cfg = cfg
         self.session = session
+        self.workers: int = cfg["workers"] if "workers" in cfg else executor.DEFAULT_WORKERS
 
-    def list(self, userid: list | None = None, statuses: list = DEFAULT_STATUSES, urgencies: list = DEFAULT_URGENCIES, teams=None) -> List[Any]:
-        """List all incidents"""
+    @staticmethod
+    def params(userid: list | None = None, statuses: list = DEFAULT_STATUSES, urgencies: list = DEFAULT_URGENCIES, teams=None, services=None,
+               since: str | None = None, until: str | None = None) -> Dict[str, Any]:
+        """Build the query parameters for the incidents list, since and until bound the creation time"""
         params = {"statuses[]": statuses, "urgencies[]": urgencies}
         if userid:
             params["user_ids[]"] = userid
         if teams:
             params["team_ids[]"] = teams
-        return self.session.list_all("incidents", params=params)
+        if services:
+            params["service_ids[]"] = services
+        if since:
+            params["since"] = since
+        if until:
+            params["until"] = until
+        return params
+
+    def list(self, userid: list | None = None, statuses: list = DEFAULT_STATUSES, urgencies: list = DEFAULT_URGENCIES, teams=None, services=None,
+             since: str | None = None, until: str | None = None) -> List[Any]:
+        """List all incidents"""
+        return self.session.list_all("incidents", params=self.params(userid, statuses, urgencies, teams, services, since, until))
+
+    def iter(self, userid: List | None = None, statuses: List = DEFAULT_STATUSES, urgencies: List = DEFAULT_URGENCIES, teams=None, services=None,
+             since: str | None = None, until: str | None = None) -> Iterator[Any]:
+        """Iterate over all incidents, fetching a page at a time"""
+        return self.session.iter_all("incidents", params=self.params(userid, statuses, urgencies, teams, services, since, until))
+
+    def changed_since(self, since: datetime, teams: List[str] | None = None, services: List[str] | None = None, limit: int | None = None) -> List[str]:
+        """
+        Return the IDs of the incidents with at least one log entry (trigger, ack, assign, resolve...) since the given time,
+        of the given teams and services only if any. With a limit, the log entries stop being listed after limit + 1 incidents.
+        """
+        return log_entry_incidents(self.session.iter_all("log_entries", params=log_entry_params(since, teams)), services, limit)
 
     def mine(self, statuses: List = DEFAULT_STATUSES, urgencies: List = DEFAULT_URGENCIES) -> List:
         """List all incidents assigned to the configured UserID"""
@@ -110,39 +325,77 @@ class Incidents(object):
         r = self.session.rget(f"/incidents/{id}/alerts")
         return r
 
+    def alerts_batch(self, ids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Retrieve the alerts of many incidents concurrently, one result per ID in the same order"""
+        return executor.run(self.alerts, ids, workers=workers or self.workers)
+
     def get(self, id: str) -> Dict | List:
         """Retrieve a single incident by ID"""
         r = self.session.rget(f"/incidents/{id}")
         return r
 
-    def ack(self, incs) -> None:
-        self.change_status(incs, STATUS_ACK)
+    def get_many(self, ids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Retrieve many incidents by ID concurrently, one result per ID in the same order"""
+        return executor.run(self.get, ids, workers=workers or self.workers)
 
-    def resolve(self, incs) -> None:
-        self.change_status(incs, STATUS_RESOLVED)
+    @staticmethod
+    def references(ids: List[str]) -> List[Dict]:
+        """Build incident references: enough for the mutations needing only the incident ID"""
+        return [{"id": id, "type": "incident_reference"} for id in ids]
 
-    def change_status(self, incs, status: str = STATUS_ACK) -> None:
-        for i in incs:
-            if "status" in i:
-                i["status"] = status
+    def ack(self, incs) -> List[TaskResult]:
+        return self.change_status(incs, STATUS_ACK)
 
-        self.bulk_update(incs)
+    def resolve(self, incs) -> List[TaskResult]:
+        return self.change_status(incs, STATUS_RESOLVED)
 
-    def snooze(self, incs, duration=14400) -> None:
+    def change_status(self, incs, status: str = STATUS_ACK) -> List[TaskResult]:
         for i in incs:
-            try:
-                self.session.post(
-                    f"/incidents/{i['id']}/snooze", json={"duration": duration})
-            except Exception as e:
-                print(e)
-
-    def bulk_update(self, incs):
-        ret = None
-        try:
-            ret = self.session.rput("incidents", json=incs)
-        except Error as e:
-            print(e)
-        return ret
+            i["status"] = status
+
+        return self.bulk_update(incs)
+
+    def snooze(self, incs, duration=14400, workers: int | None = None) -> List[TaskResult]:
+        """Snooze the given incidents concurrently, returning one result per incident"""
+        def f(i) -> Any:
+            return successful_response(self.session.post(f"/incidents/{i['id']}/snooze", json={"duration": duration}))
+
+        return executor.run(f, incs, key=lambda i: i["id"], workers=workers or self.workers)
+
+    def bulk_update(self, incs, chunk_size: int = BULK_UPDATE_LIMIT, retries: int = BULK_UPDATE_RETRIES, workers: int | None = None) -> List[TaskResult]:
+        """
+        Update many incidents at once.
+        Incidents are split in chunks accepted by the API, chunks are sent concurrently and the failed ones retried
+        after an exponential backoff with jitter.
+        Returns one result per incident: ok if the incident is part of the API answer, failed otherwise.
+        """
+        update = BulkUpdate(incs, chunk_size, retries)
+
+        def send(chunk: List) -> Any:
+            return self.session.rput("incidents", json=chunk)
+
+        for delay in update.rounds():
+            if delay:
+                time.sleep(delay)
+            update.collect(executor.run(send, update.pending, key=update.key, workers=workers or self.workers))
+
+        return update.results()
+
+    @staticmethod
+    def collect(chunk: List, r: TaskResult, results: Dict[str, TaskResult]) -> bool:
+        """Store in results the outcome of a bulk update for every incident of chunk, return True if the chunk should be retried"""
+        if r.ok:
+            updated = {u["id"]: u for u in r.value} if isinstance(r.value, list) else None
+            for i in chunk:
+                if updated is None or i["id"] in updated:
+                    results[i["id"]] = TaskResult(i["id"], True, updated[i["id"]] if updated else i, None, None)
+                else:
+                    results[i["id"]] = TaskResult(i["id"], False, None, "not updated", None)
+            return False
+        for i in chunk:
+            results[i["id"]] = TaskResult(i["id"], False, None, r.error, r.status)
+        # client errors will fail again, retry only network, throttling and server errors
+        return r.status is None or r.status == 429 or r.status >= 500
 
     def update(self, inc):
         ret = None
@@ -152,19 +405,19 @@ class Incidents(object):
             print(e)
         return ret
 
-    def reassign(self, incs, uids: List[str]) -> None:
-        for i in incs:
-            assignments = [
-                {"assignee": {"id": u, "type": "user_reference"}} for u in uids]
+    def reassign(self, incs, uids: List[str], workers: int | None = None) -> List[TaskResult]:
+        """Reassign the given incidents concurrently to the users IDs, returning one result per incident"""
+        assignments = [{"assignee": {"id": u, "type": "user_reference"}} for u in uids]
+
+        def f(i) -> Any:
             new_inc = {
                 "id": i["id"],
                 "type": "incident_reference",
                 "assignments": assignments,
             }
-            try:
-                self.session.rput(f"/incidents/{i['id']}", json=new_inc)
-            except Exception as e:
-                print(str(e))
+            return successful_response(self.session.put(f"/incidents/{i['id']}", json={"incident": new_inc}))
+
+        return executor.run(f, incs, key=lambda i: i["id"], workers=workers or self.workers)
 
     def apply(self, incs: List[Any] | Dict[Any, Any] | Iterator[Any], paths: List[str], printFunc, errFunc: Callable) -> List[Any] | Dict[Any, Any] | Iterator[Any]:
         try:
@@ -185,141 +438,128 @@ class Incidents(object):
                                    stderr=subprocess.PIPE, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
         stdout, stderr = process.communicate(json.dumps(incs))
         process.wait()
+        return rule_output(process.returncode, stdout, stderr)
 
-        if process.returncode == 0:
-            output = json.loads(stdout)
-            if type(output) not in [dict, list, tuple]:
-                raise RuleInvalidOutput(
-                    f"invalid rule output it must be a json object, found: {type(output)}")
-        else:
-            raise RuleExecutionError(f"Error executing rule: {stderr}")
-
-        return output
 
+class Directory(object):
+    """
+    Base class for the account directories (users, teams, services).
+    Directories are fetched once and served from the on disk cache until they expire,
+    lookups go through an in memory index rebuilt only when the directory changes.
+    """
 
-class Users(object):
+    kind = ""
 
-    def __init__(self, cfg: Config, session: RestApiV2Client) -> None:
+    def __init__(self, cfg: Config, session: RestApiV2Client, cache: DirectoryCache | None = None) -> None:
         self.cfg = cfg
         self.session = session
+        self.cache = cache
+        self._items: List[Dict] | None = None
+        self._version: float | None = None
+        self._fetched_at: float | None = None
+        self._index: DirectoryIndex | None = None
+
+    def _loaded(self) -> bool:
+        """True if the directory in memory is still the one in the cache"""
+        if self._items is None:
+            return False
+        if self.cache is None or self.cache.ttls.get(self.kind, 0) <= 0:
+            # not cached on disk: keep it for the whole session
+            return True
+        return self.cache.fresh(self.kind) and self.cache.refreshed_at(self.kind) == self._version
+
+    def list(self, refresh: bool = False) -> List[Dict]:
+        """List all the entries of the directory, fetching them only if not cached or refresh is True"""
+        if not refresh and self._loaded():
+            return self._items
+        items = self.cache.load(self.kind) if self.cache and not refresh else None
+        fetched = items is None
+        if fetched:
+            items = [i for i in self.session.iter_all(self.kind)]
+            if self.cache:
+                self.cache.store(self.kind, items)
+        return self._keep(items, fetched)
+
+    def _keep(self, items: List[Dict], fetched: bool) -> List[Dict]:
+        """Keep in memory the directory just loaded from the cache or fetched from the API"""
+        self._items = items
+        self._version = self.cache.refreshed_at(self.kind) if self.cache else None
+        if self._version is not None or fetched:
+            self._fetched_at = self._version or time.time()
+        self._index = None
+        return items
+
+    def age(self) -> float:
+        """Seconds since the directory in memory was fetched from the API"""
+        if self._fetched_at is None:
+            return 0.0
+        return time.time() - self._fetched_at
+
+    def index(self) -> DirectoryIndex:
+        """The lookup index over the current directory"""
+        items = self.list()
+        if self._index is None:
+            self._index = DirectoryIndex(items)
+        return self._index
 
-    @lru_cache()
-    def list(self, ttl=ttl_hash()) -> List[Dict] | Iterator[Dict]:
-        """List all users in PagerDuty account"""
-        users = self.session.iter_all("users")
-
-        return users
+    def get(self, id: str) -> Dict | List:
+        """Get a single entry by ID"""
+        item = self.cache.get(self.kind, id) if self.cache else None
+        if item is None:
+            return self.session.rget(f"/{self.kind}/{id}")
+        return item
 
-    @lru_cache()
-    def get(self, id: str, ttl=ttl_hash()) -> Dict | List:
-        """Get a single user by ID"""
-        return self.session.rget(f"/users/{id}")
+    def search(self, query: str, key: str = "name", fuzzy: bool = False) -> List[dict]:
+        """Retrieve all entries matching query on the attribute name, best matches first"""
+        return self.index().search(query, key, fuzzy)
 
-    @lru_cache()
-    def search(self, query: str, key: str = "name", ttl=ttl_hash()) -> List[dict]:
-        """Retrieve all users matching query on the attribute name"""
+    def id(self, query: str, key: str = "name", fuzzy: bool = False) -> List[str]:
+        """Retrieve all IDs matching query on the attribute name, best matches first"""
+        return [u["id"] for u in self.search(query, key, fuzzy)]
 
-        def equiv(s) -> bool:
-            return query.lower() in s[key].lower()
 
-        users = [u for u in filter(equiv, self.session.iter_all("users"))]
-        return users
+class Users(Directory):
 
-    @lru_cache()
-    def id(self, query: str, key: str = "name", ttl=ttl_hash()) -> List[str]:
-        """Retrieve all userIDs matching query on the attribute name"""
-        users = self.search(query, key)
-        userIDs = [u["id"] for u in users]
-        return userIDs
+    kind = "users"
 
-    @lru_cache()
-    def id_by_email(self, query, ttl=ttl_hash()):
+    def id_by_email(self, query) -> List[str]:
         """Retrieve all usersIDs matching the given (partial) email"""
         return self.id(query, "email")
 
-    @lru_cache()
-    def teams(self, name: str, ttl=ttl_hash()) -> List[Dict]:
+    def teams(self, name: str) -> List[Dict]:
         """Retrieve all teams for a given user"""
-        users = self.search(query=name)
-        teams = []
-        for user in users:
-            teams.append(user["teams"])
-        return teams
-
-    @lru_cache()
-    def team_id(self, name: str, ttl=ttl_hash()) -> List[str]:
-        """Retrieve all team IDs for a given user"""
-        teams = self.teams(name)
-        teamIDs = [team["id"] for team in teams]
-        return teamIDs
+        return user_teams(self.search(query=name))
 
-
-class Services(object):
-
-    def __init__(self, cfg: Config, session: RestApiV2Client) -> None:
-        self.cfg = cfg
-        self.session = session
-
-    def list(self, params: dict | None = None) -> List[Dict] | Iterator[Dict]:
-        """List all services in PagerDuty account"""
-        if params:
-            services = self.session.iter_all("services", params=params)
-        else:
-            services = self.session.iter_all("services")
-        return services
-
-    def get(self, id: str) -> Dict | List:
-        """Get a single service by ID"""
-        return self.session.rget(f"/services/{id}")
-
-    def search(self, query: str, key: str = "name") -> List[dict]:
-        """Retrieve all services matching query on the attribute name"""
-
-        def equiv(s):
-            return query.lower() in s[key].lower()
-
-        services = [u for u in filter(
-            equiv, self.session.iter_all("services"))]
-        return services
-
-    def id(self, query: str, key: str = "name") -> List[str]:
-        """Retrieve all serviceIDs matching query on the attribute name"""
-        services = self.search(query, key)
-        serviceIDs = [u["id"] for u in services]
-        return serviceIDs
+    def team_id(self, name: str) -> List[str]:
+        """Retrieve all team IDs for a given user"""
+        return [team["id"] for team in self.teams(name)]
 
 
-class Teams(object):
+class Services(Directory):
 
-    def __init__(self, cfg: Config, session: RestApiV2Client) -> None:
-        self.cfg = cfg
-        self.session = session
+    kind = "services"
 
-    @lru_cache()
-    def list(self, ttl=ttl_hash()) -> List[Dict] | Iterator[Dict]:
-        """List all teams in PagerDuty account"""
-        users = self.session.iter_all("teams")
+    def match(self, regexp: str | re.Pattern | None = None, excluded_regexp: str | re.Pattern | None = None,
+              max_age: float = MATCH_MAX_AGE) -> List[str]:
+        """
+        Retrieve all serviceIDs whose name matches regexp and doesn't match excluded_regexp.
+        The catalog is fetched again if older than max_age seconds, or if nothing matches (the service may be new).
+        """
+        services, refreshed = self.list(), False
+        if self.age() > max_age:
+            services, refreshed = self.list(refresh=True), True
+        ids = match_services(services, regexp, excluded_regexp)
+        if not ids and not refreshed:
+            ids = match_services(self.list(refresh=True), regexp, excluded_regexp)
+        return ids
 
-        return users
-
-    @lru_cache()
-    def get(self, id: str, ttl=ttl_hash()) -> Dict | List:
-        """Get a single team by ID"""
-        return self.session.rget(f"/teams/{id}")
-
-    @lru_cache()
-    def search(self, query: str, key: str = "name", ttl=ttl_hash()) -> List[dict]:
-        """Retrieve all teams matching query on the attribute name"""
+    def list(self, params: dict | None = None, refresh: bool = False) -> List[Dict] | Iterator[Dict]:
+        """List all services in PagerDuty account, queries with params are never cached"""
+        if params:
+            return self.session.iter_all("services", params=params)
+        return super().list(refresh)
 
-        def equiv(s) -> bool:
-            return query.lower() in s[key].lower()
 
-        teams = [u for u in filter(equiv, self.session.iter_all("teams"))]
-        return teams
+class Teams(Directory):
 
-    @lru_cache()
-    def id(self, query: str, key: str = "name", ttl=ttl_hash()) -> List[str]:
-        """Retrieve all teams id matching query on the attribute name"""
-        teams = self.search(query, key)
-        teamids = [u["id"] for u in teams]
-        return teamids
+    kind = "teams"
@@ -0,0 +1,409 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from .accessor import MISSING, compile as compile_path
+from .filters import Filter, costed, COST_EQ, COST_REGEXP, COST_DATE
+from .timeindex import DURATION_UNITS
+
+"""
+  Query module parses filter expressions like
+
+    urgency == "high" and service.summary =~ /db/i and created_at > now-2h
+
+  into a tree, compiled once into a single short-circuiting predicate over incidents (or any dict):
+  the terms of and/or run cheapest first (equality, then regexps, then dates).
+
+  Fields are dotted paths (service.summary, assignments.0.assignee.id), compiled once by pdh.accessor.
+  A path crossing a list without an index (teams.id, assignments.assignee.id) reads the field of every element:
+  the comparison matches if any of them does, != and !~ if none of them matches the value.
+  Operators: == != =~ !~ > >= < <= in, combined with and, or, not and parentheses.
+  Values: "strings", 'strings', numbers, true, false, null, /regexps/i, [lists] and times: now, now-2h, now+1d
+  (units s, m, h, d, w). Quoted ISO dates compared with > >= < <= are compared as times.
+"""
+
+ORDERING = {">": lambda a, b: a > b, ">=": lambda a, b: a >= b, "<": lambda a, b: a < b, "<=": lambda a, b: a <= b}
+KEYWORDS = {"and", "or", "not", "in", "true", "false", "null", "now"}
+
+TOKENS = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<regexp>/(?:[^/\\]|\\.)*/[imsx]*)
+  | (?P<duration>[+-]\d+[smhdw]\b)
+  | (?P<number>-?\d+(?:\.\d+)?\b)
+  | (?P<op>==|!=|=~|!~|>=|<=|>|<)
+  | (?P<punct>[()\[\],])
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z0-9_]+)*)
+""", re.VERBOSE)
+
+Token = namedtuple("Token", "kind value pos")
+
+# parsed expression nodes
+And = namedtuple("And", "terms")
+Or = namedtuple("Or", "terms")
+Not = namedtuple("Not", "term")
+Compare = namedtuple("Compare", "field op value")
+# a time relative to the evaluation: now + offset seconds
+Now = namedtuple("Now", "offset")
+
+
+class QueryError(ValueError):
+    pass
+
+
+def tokenize(text: str) -> List[Token]:
+    ret = []
+    pos = 0
+    while pos < len(text):
+        m = TOKENS.match(text, pos)
+        if m is None:
+            raise QueryError(f"unexpected character {text[pos]!r} at {pos}")
+        if m.lastgroup != "ws":
+            ret.append(Token(m.lastgroup, m.group(), pos))
+        pos = m.end()
+    return ret
+
+
+class Parser(object):
+    """Recursive descent parser: or_expr := and_expr ("or" and_expr)*, and_expr := not_expr ("and" not_expr)*"""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> Token | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> Token:
+        t = self.peek()
+        if t is None:
+            raise QueryError("unexpected end of expression")
+        self.pos += 1
+        return t
+
+    def keyword(self, word: str) -> bool:
+        t = self.peek()
+        if t is not None and t.kind == "name" and t.value.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value: str) -> None:
+        t = self.next()
+        if t.value != value:
+            raise QueryError(f"expected {value!r} at {t.pos}, found {t.value!r}")
+
+    def parse(self) -> Any:
+        if not self.tokens:
+            raise QueryError("empty expression")
+        node = self.or_expr()
+        t = self.peek()
+        if t is not None:
+            raise QueryError(f"unexpected {t.value!r} at {t.pos}")
+        return node
+
+    def or_expr(self) -> Any:
+        terms = [self.and_expr()]
+        while self.keyword("or"):
+            terms.append(self.and_expr())
+        return terms[0] if len(terms) == 1 else Or(terms)
+
+    def and_expr(self) -> Any:
+        terms = [self.not_expr()]
+        while self.keyword("and"):
+            terms.append(self.not_expr())
+        return terms[0] if len(terms) == 1 else And(terms)
+
+    def not_expr(self) -> Any:
+        if self.keyword("not"):
+            return Not(self.not_expr())
+        return self.comparison()
+
+    def comparison(self) -> Any:
+        t = self.next()
+        if t.value == "(":
+            node = self.or_expr()
+            self.expect(")")
+            return node
+        if t.kind != "name" or t.value.lower() in KEYWORDS:
+            raise QueryError(f"expected a field at {t.pos}, found {t.value!r}")
+        op = self.next()
+        if op.kind == "op":
+            return Compare(t.value, op.value, self.value())
+        if op.kind == "name" and op.value.lower() == "in":
+            return Compare(t.value, "in", self.list())
+        raise QueryError(f"expected an operator at {op.pos}, found {op.value!r}")
+
+    def list(self) -> List[Any]:
+        self.expect("[")
+        ret = []
+        if self.peek() is not None and self.peek().value == "]":
+            self.next()
+            return ret
+        while True:
+            ret.append(self.value())
+            t = self.next()
+            if t.value == "]":
+                return ret
+            if t.value != ",":
+                raise QueryError(f"expected ',' or ']' at {t.pos}, found {t.value!r}")
+
+    def value(self) -> Any:
+        t = self.next()
+        if t.kind == "string":
+            return re.sub(r"\\(.)", r"\1", t.value[1:-1])
+        if t.kind == "number":
+            return float(t.value) if "." in t.value else int(t.value)
+        if t.kind == "regexp":
+            body, flags = t.value[1:].rsplit("/", 1)
+            try:
+                return re.compile(body.replace("\\/", "/"), sum(getattr(re, f.upper()) for f in flags))
+            except re.error as e:
+                raise QueryError(f"invalid regular expression at {t.pos}: {e}")
+        if t.kind == "name":
+            word = t.value.lower()
+            if word == "true":
+                return True
+            if word == "false":
+                return False
+            if word == "null":
+                return None
+            if word == "now":
+                offset = 0
+                d = self.peek()
+                if d is not None and d.kind == "duration":
+                    self.next()
+                    offset = int(d.value[:-1]) * DURATION_UNITS[d.value[-1]]
+                return Now(offset)
+            # bare words are strings: status == triggered
+            return t.value
+        raise QueryError(f"expected a value at {t.pos}, found {t.value!r}")
+
+
+class Many(list):
+    """The values of a path crossing a list, one per element"""
+
+
+def _walk(item: Any, keys: List[str]) -> Any:
+    for n, k in enumerate(keys):
+        if isinstance(item, list):
+            if k.isdigit():
+                item = item[int(k)] if int(k) < len(item) else None
+                continue
+            ret = Many()
+            for i in item:
+                v = _walk(i, keys[n:])
+                if isinstance(v, Many):
+                    ret.extend(v)
+                elif v is not None:
+                    ret.append(v)
+            return ret
+        if not isinstance(item, dict):
+            return None
+        item = item.get(k)
+    return item
+
+
+def accessor(field: str) -> Callable[[Dict], Any]:
+    """
+    Resolve a dotted path once: return a function reading it from an item, None if missing
+    and the Many values of the elements if the path crosses a list (teams.id)
+    """
+    # numeric parts index lists: assignments.0.assignee.id is assignments[0].assignee.id
+    get = compile_path(re.sub(r"\.(\d+)(?=\.|$)", r"[\1]", field))
+    keys = field.split(".")
+
+    def read(item: Dict) -> Any:
+        value = get.get(item, MISSING)
+        # only paths missing in the item can cross a list
+        return _walk(item, keys) if value is MISSING else value
+    return read
+
+
+def _any(get: Callable[[Dict], Any], test: Callable[[Any], bool]) -> Callable[[Dict], bool]:
+    """A predicate applying test to the value of an item, to any of them if many"""
+    def f(item: Dict) -> bool:
+        v = get(item)
+        if type(v) is Many:
+            return any(test(x) for x in v)
+        return test(v)
+    return f
+
+
+def parse_time(value: Any) -> datetime | None:
+    """Parse an API timestamp (2025-01-01T10:00:00Z), None if value is not a time"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        t = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+
+def compile_node(node: Any, now: datetime) -> Callable[[Dict], bool]:
+    """Compile a node into a filter function, and/or terms are evaluated cheapest first"""
+    if isinstance(node, And):
+        return Filter.all_of([compile_node(t, now) for t in node.terms])
+    if isinstance(node, Or):
+        return Filter.any_of([compile_node(t, now) for t in node.terms])
+    if isinstance(node, Not):
+        return Filter.negate(compile_node(node.term, now))
+    return costed(*compare(node, now))
+
+
+def compare(node: Compare, now: datetime) -> Tuple[Callable[[Dict], bool], int]:
+    """A comparison function and its relative cost"""
+
+    get = accessor(node.field)
+    op, value = node.op, node.value
+
+    if op in ("=~", "!~"):
+        if not isinstance(value, re.Pattern):
+            value = re.compile(str(value))
+        search = value.search
+        matches = _any(get, lambda v: search(str(v or "")) is not None)
+        if op == "=~":
+            return matches, COST_REGEXP
+        return (lambda item: not matches(item)), COST_REGEXP
+    if op == "in":
+        values = [v for v in value]
+        return _any(get, lambda v: v in values), COST_EQ
+    if op == "==":
+        return _any(get, lambda v: v == value), COST_EQ
+    if op == "!=":
+        equal = _any(get, lambda v: v == value)
+        return (lambda item: not equal(item)), COST_EQ
+
+    cmp = ORDERING[op]
+    if isinstance(value, Now):
+        value = now + timedelta(seconds=value.offset)
+    elif isinstance(value, str) and parse_time(value) is not None:
+        value = parse_time(value)
+    if isinstance(value, datetime):
+        when = value
+
+        def f_time(v: Any) -> bool:
+            t = parse_time(v)
+            return t is not None and cmp(t, when)
+        return _any(get, f_time), COST_DATE
+
+    def f_cmp(v: Any) -> bool:
+        if v is None:
+            return False
+        try:
+            return cmp(v, value)
+        except TypeError:
+            return False
+    return _any(get, f_cmp), COST_EQ
+
+
+def fields(node: Any) -> List[str]:
+    """The fields referenced by an expression"""
+    if isinstance(node, (And, Or)):
+        return [f for t in node.terms for f in fields(t)]
+    if isinstance(node, Not):
+        return fields(node.term)
+    return [node.field]
+
+
+# incident fields the API can filter on: field -> Incidents.list parameter
+PUSHDOWN = {"status": "statuses", "urgency": "urgencies", "service.id": "services", "teams.id": "teams"}
+
+
+class Query(object):
+    """A parsed expression: parse once, compile a predicate per evaluation time"""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tree = Parser(text).parse()
+
+    def __repr__(self) -> str:
+        return f"Query({self.text!r})"
+
+    def fields(self) -> List[str]:
+        return list(dict.fromkeys(fields(self.tree)))
+
+    def compile(self, now: datetime | None = None) -> Callable[[Dict], bool]:
+        """Return the predicate, relative times (now-2h) are resolved against now (default: the current time)"""
+        return compile_node(self.tree, now or datetime.now(timezone.utc))
+
+    def pushdown(self, now: datetime | None = None) -> Dict[str, Any]:
+        """
+        Incidents.list parameters narrowing the API results to a superset of the matching incidents.
+        Only the comparisons every match must satisfy (top level and terms) are used:
+        status, urgency, service.id and teams.id equal to or in a list, created_at lower bounds (since)
+        and absolute upper bounds (until). The predicate must still be applied to the results.
+        """
+        now = now or datetime.now(timezone.utc)
+        terms = self.tree.terms if isinstance(self.tree, And) else [self.tree]
+        ret: Dict[str, Any] = {}
+        for t in terms:
+            if not isinstance(t, Compare):
+                continue
+            if t.field in PUSHDOWN and t.op in ("==", "in"):
+                values = t.value if t.op == "in" else [t.value]
+                if not all(isinstance(v, str) for v in values):
+                    continue
+                key = PUSHDOWN[t.field]
+                # more terms on the same field: only the values satisfying all of them
+                ret[key] = [v for v in values if v in ret[key]] if key in ret else list(values)
+            elif t.field == "created_at" and t.op in ORDERING:
+                self._bounds(t, now, ret)
+        return ret
+
+    @staticmethod
+    def _bounds(t: Compare, now: datetime, ret: Dict[str, Any]) -> None:
+        relative = isinstance(t.value, Now)
+        when = now + timedelta(seconds=t.value.offset) if relative else parse_time(t.value)
+        if when is None:
+            return
+        iso = when.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if t.op in (">", ">="):
+            ret["since"] = max(ret.get("since", iso), iso)
+        elif not relative:
+            # a relative upper bound moves forward while watching, pushing it would drop new matches
+            ret["until"] = min(ret.get("until", iso), iso)
+
+
+def parse(text: str) -> Query:
+    return Query(text)
+
+
+def merge(params: Dict[str, Any], pushed: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Narrow Incidents.list parameters with the pushed down ones, None if nothing can match"""
+    ret = dict(params)
+    for key, value in pushed.items():
+        if isinstance(value, list) and ret.get(key):
+            # the pushed down values can only narrow the given ones
+            value = [v for v in ret[key] if v in value]
+        # API timestamps in the same format compare as strings: keep the narrowest bounds
+        if key == "since" and ret.get(key):
+            value = max(ret[key], value)
+        if key == "until" and ret.get(key):
+            value = min(ret[key], value)
+        if isinstance(value, list) and not value:
+            # an empty list would mean no filter at all for the API
+            return None
+        ret[key] = value
+    return ret
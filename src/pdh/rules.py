@@ -18,10 +18,14 @@ import json
 import sys
 import functools
 import subprocess
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 from collections import namedtuple
-from pdh import config, PagerDuty, Filters, Transformations
+import pdh
+from pdh import config
+
+if TYPE_CHECKING:
+    from pdh import PagerDuty
 
 ShellResponse = namedtuple("ShellResponse", "stdout stderr rc")
 
@@ -48,8 +52,8 @@ def rule(func):
         input = __load_data_from_stdin()
         kwargs["alerts"] = input
         kwargs["pagerduty"] = client()
-        kwargs["Filters"] = Filters
-        kwargs["Transformations"] = Transformations
+        kwargs["Filters"] = pdh.Filters
+        kwargs["Transformations"] = pdh.Transformations
         ret = func(*args, **kwargs)
         print(json.dumps(ret))
         return ret
@@ -75,7 +79,7 @@ def exec(cmd: Union[str, list]) -> ShellResponse:
     return ShellResponse(out, err, rc)
 
 
-def chain(incs: list, path: str, pd: PagerDuty | None = None):
+def chain(incs: list, path: str, pd: "PagerDuty | None" = None):
     """
     Chain loading another rule with the given list of incidents
       Parameters:
@@ -97,7 +101,7 @@ def chain(incs: list, path: str, pd: PagerDuty | None = None):
     return None
 
 
-def client(config_file: str = "~/.config/pdh.yaml") -> PagerDuty:
+def client(config_file: str = "~/.config/pdh.yaml") -> "PagerDuty":
 
     """
     Initialize the Pagerduty APIs in a more easy way
@@ -106,4 +110,4 @@ def client(config_file: str = "~/.config/pdh.yaml") -> PagerDuty:
       Returns:
         Incidents (object): the api object capable of doing things
     """
-    return PagerDuty(config.load_and_validate(config_file))
+    return pdh.PagerDuty(config.load_and_validate(config_file))
@@ -0,0 +1,190 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Callable, Dict
+
+from pagerduty import HttpError
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from . import metrics
+
+"""
+  Scheduler module throttles the HTTP requests sent to PagerDuty APIs.
+  A token bucket sized on the account rate limit is shared by every session using the same API key,
+  rate limit headers and Retry-After are honored by pausing the bucket.
+"""
+
+# PagerDuty REST API allows 960 requests per minute per user token, keep some headroom
+DEFAULT_RATE_LIMIT = 900
+MAX_THROTTLED_RETRIES = 5
+
+
+class Throttled(HttpError):
+    """The request has still been throttled (429) after the allowed retries"""
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket: `rate` tokens are added every second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take one token if available returning 0, otherwise return the seconds to wait before trying again"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            if now < self.paused_until:
+                return self.paused_until - now
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available. Returns the seconds spent waiting"""
+        waited = 0.0
+        while (delay := self.try_acquire()) > 0:
+            self.sleep(delay)
+            waited += delay
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given amount of seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0
+
+
+class Scheduler(object):
+    """
+    Schedule requests through a TokenBucket, keeping counters about throttling.
+    """
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+        self.lock = threading.Lock()
+        self.counters: Dict[str, float] = {"requests": 0, "throttled": 0, "waited": 0.0, "max_wait": 0.0}
+
+    def _count(self, waited: float) -> None:
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["waited"] += waited
+            self.counters["max_wait"] = max(self.counters["max_wait"], waited)
+
+    def acquire(self) -> float:
+        waited = self.bucket.acquire()
+        self._count(waited)
+        return waited
+
+    async def acquire_async(self) -> float:
+        """Take one token without blocking the event loop. Returns the seconds spent waiting"""
+        waited = 0.0
+        while (delay := self.bucket.try_acquire()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        self._count(waited)
+        return waited
+
+    def observe(self, response: Response) -> float:
+        """
+        Inspect the response rate limit headers, pausing the bucket when the limit is reached.
+        Returns the seconds the bucket has been paused for (0 if not paused).
+        """
+        delay = 0.0
+        headers = response.headers
+        if response.status_code == 429:
+            with self.lock:
+                self.counters["throttled"] += 1
+            delay = _seconds(headers.get("retry-after")) or _seconds(headers.get("ratelimit-reset")) or 1.0
+        elif headers.get("ratelimit-remaining") == "0":
+            delay = _seconds(headers.get("ratelimit-reset")) or 0.0
+        if delay > 0:
+            self.bucket.pause(delay)
+        return delay
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return dict(self.counters)
+
+
+def _seconds(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class SchedulerAdapter(BaseAdapter):
+    """
+    Requests transport adapter sending every request through a Scheduler.
+    Throttled (429) responses are retried by the adapter itself once the bucket allows it, up to max_retries times,
+    then Throttled is raised: a 429 is never given back to RestApiV2Client, retrying it again without limit.
+    """
+
+    def __init__(self, scheduler: Scheduler, inner: BaseAdapter | None = None, max_retries: int = MAX_THROTTLED_RETRIES) -> None:
+        super().__init__()
+        self.scheduler = scheduler
+        self.inner = inner if inner is not None else HTTPAdapter()
+        self.max_retries = max_retries
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        attempt = 0
+        while True:
+            metrics.attempt(self.scheduler.acquire())
+            response = self.inner.send(request, **kwargs)
+            self.scheduler.observe(response)
+            if response.status_code != 429:
+                return response
+            if attempt >= self.max_retries:
+                raise Throttled(f"{request.method} {request.url}: still throttled (status 429) after {attempt} retries", response)
+            attempt += 1
+            response.close()
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+_schedulers: Dict[str, Scheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def shared(apikey: str, rate_limit: int = DEFAULT_RATE_LIMIT) -> Scheduler:
+    """Return the Scheduler shared by all the sessions using the given API key"""
+    key = hashlib.sha256(apikey.encode()).hexdigest()
+    with _schedulers_lock:
+        if key not in _schedulers:
+            per_second = rate_limit / 60
+            _schedulers[key] = Scheduler(TokenBucket(rate=per_second, capacity=max(1.0, per_second)))
+        return _schedulers[key]
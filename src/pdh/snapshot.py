@@ -0,0 +1,110 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from .pd import Incidents, DEFAULT_STATUSES, DEFAULT_URGENCIES
+from .defaults import DEFAULT_RESYNC
+
+# look back a bit more than the last refresh to cope with clock skew and late log entries
+OVERLAP = 10
+# more changed incidents than this in a refresh: reload the full list rather than fetching them one by one
+MAX_CHANGED = 20
+
+
+class IncidentSnapshot(object):
+    """
+    Keep in memory the incidents matching a query, refreshing them incrementally.
+
+    The first refresh loads the full list, the following ones fetch only the incidents changed
+    since the previous refresh (see Incidents.changed_since) and merge them in: incidents that
+    no longer match the query are dropped. The log entries are read for the teams and services of the query only
+    (the API can't select them by assignee). A full reload happens every `resync` seconds, or as soon as more than
+    `max_changed` incidents changed: a GET per incident would cost more than the list.
+    """
+
+    def __init__(self, incidents: Incidents, userid: List[str] | None = None, statuses: List[str] = DEFAULT_STATUSES,
+                 urgencies: List[str] = DEFAULT_URGENCIES, teams: List[str] | None = None, services: List[str] | None = None,
+                 since: str | None = None, until: str | None = None, resync: int = DEFAULT_RESYNC, clock: Callable[[], float] = time.time,
+                 max_changed: int = MAX_CHANGED) -> None:
+        self.incidents = incidents
+        self.userid = userid
+        self.statuses = statuses
+        self.urgencies = urgencies
+        self.teams = teams
+        self.services = services
+        self.since = since
+        self.until = until
+        self.resync = resync
+        self.clock = clock
+        self.max_changed = max_changed
+        self.snapshot: Dict[str, Dict] = {}
+        self.synced_at: float | None = None
+        self.refreshed_at: float | None = None
+
+    def matches(self, inc: Dict) -> bool:
+        """True if the incident would be returned by the full list query"""
+        if inc.get("status") not in self.statuses or inc.get("urgency") not in self.urgencies:
+            return False
+        if self.userid and not any(a["assignee"]["id"] in self.userid for a in inc.get("assignments", [])):
+            return False
+        if self.teams and not any(t["id"] in self.teams for t in inc.get("teams", [])):
+            return False
+        if self.services and inc.get("service", {}).get("id") not in self.services:
+            return False
+        if self.since and not self._after(inc.get("created_at"), self.since):
+            return False
+        if self.until and self._after(inc.get("created_at"), self.until):
+            return False
+        return True
+
+    @staticmethod
+    def _after(created_at: str | None, bound: str) -> bool:
+        if not created_at:
+            return False
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00")) >= datetime.fromisoformat(bound.replace("Z", "+00:00"))
+
+    def refresh(self) -> List[Dict]:
+        """Bring the snapshot up to date and return its incidents"""
+        now = self.clock()
+        changed = None
+        if self.synced_at is not None and now - self.synced_at < self.resync:
+            since = datetime.fromtimestamp(self.refreshed_at - OVERLAP, timezone.utc)
+            changed = self.incidents.changed_since(since, teams=self.teams, services=self.services, limit=self.max_changed)
+            if len(changed) > self.max_changed:
+                changed = None
+        if changed is None:
+            incs = self.incidents.list(self.userid, statuses=self.statuses, urgencies=self.urgencies, teams=self.teams, services=self.services,
+                                       since=self.since, until=self.until)
+            self.snapshot = {i["id"]: i for i in incs}
+            self.synced_at = now
+        else:
+            for r in self.incidents.get_many(changed):
+                if not r.ok:
+                    # keep the last known state, the next full reload will fix it
+                    continue
+                if self.matches(r.value):
+                    self.snapshot[r.id] = r.value
+                else:
+                    self.snapshot.pop(r.id, None)
+        self.refreshed_at = now
+        return self.items()
+
+    def items(self) -> List[Dict]:
+        """Shallow copies of the incidents, callers can add fields without touching the snapshot"""
+        return [dict(i) for i in self.snapshot.values()]
@@ -0,0 +1,124 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import re
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+
+from . import accessor
+
+"""
+  Timeindex module answers time range queries (since, until, older than 2h) over incidents.
+
+  TimeIndex parses the timestamps of the items once into epoch seconds, keeps the items sorted by time
+  and finds the bounds of a range by bisection. Bounds are parsed by parse_when: ISO dates
+  (2025-01-01, 2025-01-01T10:00:00Z), epoch seconds, durations ago (2h) or relative to now (now-2h, now+1d).
+"""
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+RELATIVE = re.compile(r"(?:now)?\s*(?:(?P<sign>[+-])?\s*(?P<amount>\d+)(?P<unit>[smhdw]))?")
+
+
+def epoch(value: Any) -> int | None:
+    """An API timestamp (2025-01-01T10:00:00Z) or datetime as epoch seconds, None if value is not a time"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return None
+
+
+def relative(value: Any) -> bool:
+    """True if value is a time relative to now (2h, now-2h), moving forward while watching"""
+    return isinstance(value, str) and value.strip().lower() != "" and RELATIVE.fullmatch(value.strip().lower()) is not None
+
+
+def parse_when(value: Any, now: float | None = None) -> int:
+    """
+    Parse a time bound into epoch seconds: datetime, epoch number, ISO date, now, now-2h, now+1d
+    or a bare duration meaning that long ago (2h). Raises ValueError if value is not a time.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return epoch(value)  # type: ignore[return-value]
+    text = str(value).strip().lower()
+    if relative(text):
+        m = RELATIVE.fullmatch(text)
+        offset = int(m["amount"]) * DURATION_UNITS[m["unit"]] if m["amount"] else 0
+        # a bare duration (2h) is in the past
+        if m["sign"] == "-" or (m["sign"] is None and not text.startswith("now")):
+            offset = -offset
+        return int((time.time() if now is None else now) + offset)
+    if text.isdigit():
+        return int(text)
+    ret = epoch(str(value).strip())
+    if ret is None:
+        raise ValueError(f"invalid time {value!r}, expected an ISO date, epoch seconds, a duration (2h) or now-2h")
+    return ret
+
+
+def iso(when: int) -> str:
+    """Epoch seconds as an API timestamp"""
+    return datetime.fromtimestamp(when, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TimeIndex(object):
+    """Items sorted by the time of a field, parsed once. Items without a time are kept apart in missing"""
+
+    def __init__(self, items: Iterable[Dict], field: str = "created_at") -> None:
+        self.field = field
+        get = accessor.compile(field)
+        keyed = []
+        self.missing: List[Dict] = []
+        for i in items:
+            t = epoch(get(i))
+            if t is None:
+                self.missing.append(i)
+            else:
+                keyed.append((t, i))
+        keyed.sort(key=lambda k: k[0])
+        self.times = [k[0] for k in keyed]
+        self.items = [k[1] for k in keyed]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def range(self, since: Any = None, until: Any = None, now: float | None = None) -> List[Dict]:
+        """The items with since <= time < until, sorted by time. Bounds are anything parse_when accepts, None for no bound"""
+        lo = 0 if since is None else bisect_left(self.times, parse_when(since, now))
+        hi = len(self.times) if until is None else bisect_left(self.times, parse_when(until, now))
+        return self.items[lo:hi] if lo < hi else []
+
+    def since(self, when: Any, now: float | None = None) -> List[Dict]:
+        return self.range(since=when, now=now)
+
+    def until(self, when: Any, now: float | None = None) -> List[Dict]:
+        return self.range(until=when, now=now)
+
+    def older_than(self, duration: Any, now: float | None = None) -> List[Dict]:
+        """The items at least duration old (seconds or 2h)"""
+        now = time.time() if now is None else now
+        seconds = duration if isinstance(duration, (int, float)) else now - parse_when(duration, now)
+        # time <= now - duration
+        return self.range(until=int(now - seconds) + 1, now=now)
@@ -14,48 +14,98 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
+import contextlib
+import contextvars
+import functools
+import time
 from typing import Any, Callable, Dict, Iterator, List
 from datetime import datetime, timezone
-import jsonpath_ng
 from rich.pretty import pretty_repr
 from dikdik import Dict as DikDik
+from . import accessor
+from .defaults import DATE_MODES, DATE_RELATIVE, DATE_ABSOLUTE, DATE_EPOCH
 
 """
   Transformations module contains functions to extract and mutate dictionary fields.
   Almost all functions here are meant to be used with apply() function
 """
 
+# the time relative dates are measured from, pinned by now_snapshot
+_now: contextvars.ContextVar[float | None] = contextvars.ContextVar("pdh_transformations_now", default=None)
 
-def apply(objects: List[Any] | List[Dict[Any, Any]] | Iterator[Any], transformers: Dict[str, Callable[[Dict], Any]] | None = None, preserve: bool = False) -> List[Any] | List[Dict[Any, Any]] | Iterator[Any]:
+
+class Projection(object):
+    """
+    A transformers dictionary compiled into a row builder, called once per object.
+    Target paths are split once: keys without dots are assigned directly, dotted ones create the
+    nested dictionaries DikDik.set_path would. Build it once and reuse it, e.g. on every --watch refresh.
+    """
+
+    def __init__(self, transformers: Dict[str, Callable[[Dict], Any]], preserve: bool = False) -> None:
+        self.transformers = dict(transformers)
+        self.preserve = preserve
+        self.steps = [(path.split("."), func) for path, func in self.transformers.items()]
+        if not preserve and all(len(keys) == 1 for keys, _ in self.steps):
+            self.build = self._flat
+        else:
+            self.build = self._nested
+
+    def _flat(self, obj: Any) -> Dict[str, Any]:
+        return {path: func(obj) for path, func in self.transformers.items()}
+
+    def _nested(self, obj: Any) -> Any:
+        item = obj if self.preserve else {}
+        for keys, func in self.steps:
+            value = func(obj)
+            d = item
+            for k in keys[:-1]:
+                d = d.setdefault(k, {})
+            d[keys[-1]] = value
+        return item
+
+    def __call__(self, obj: Any) -> Any:
+        return self.build(obj)
+
+
+def apply(objects: List[Any] | List[Dict[Any, Any]] | Iterator[Any], transformers: Dict[str, Callable[[Dict], Any]] | Projection | None = None, preserve: bool = False, lazy: bool = False) -> List[Any] | List[Dict[Any, Any]] | Iterator[Any]:
     """
     Apply a set of transformation functions to a list or iterator of objects.
 
     Args:
       objects (List[Any] | List[Dict[Any, Any]] | Iterator[Any]):
         A list or iterator of objects to be transformed.
-      transformers (Dict[str, Callable[[Dict], Any]] | None, optional):
-        A dictionary where keys are paths and values are functions to be applied to the objects.
+      transformers (Dict[str, Callable[[Dict], Any]] | Projection | None, optional):
+        A dictionary where keys are paths and values are functions to be applied to the objects,
+        or a Projection already compiled from one (preserve is then the Projection's own).
         Defaults to None.
-      copy (bool, optional):
+      preserve (bool, optional):
         If True, preserve the original fields if not mutated by a transformations function.
         Defaults to False.
+      lazy (bool, optional):
+        If True, return a generator transforming objects one at a time.
+        Defaults to False.
 
     Returns:
       List[Any] | List[Dict[Any, Any]] | Iterator[Any]:
         A list or iterator of transformed objects.
     """
-    ret = list()
+    if transformers is None:
+        return (obj for obj in objects) if lazy else [obj for obj in objects]
+    projection = transformers if isinstance(transformers, Projection) else Projection(transformers, preserve)
 
-    for obj in objects:
-        if transformers is not None:
-            item = obj if preserve else {}
-            for path, func in transformers.items():
-                DikDik.set_path(item, path, func(obj))
-            ret.append(item)
-        else:
-            ret.append(obj)
+    if lazy:
+        return _lazy(projection, objects, current_time())
 
-    return ret
+    with now_snapshot():
+        return list(map(projection.build, objects))
+
+
+def _lazy(projection: Projection, objects: Any, now: float) -> Iterator[Any]:
+    # the snapshot is set only while building each row, never across a yield
+    for obj in objects:
+        with now_snapshot(now):
+            row = projection.build(obj)
+        yield row
 
 def extract(path: str, default: str | None = None) -> Callable[[Dict,], Any]:
     """
@@ -82,16 +132,16 @@ def extract_change(path: str, change_map: Dict[str, str] | None = None, default:
     Raises:
       KeyError: If the specified path does not exist in the dictionary and no default value is provided.
     """
+    # recursively return inner fields if they exist in the form of "field.subfield"
+    compiled = accessor.compile(path)
+
     def f(i: dict) -> Any:
         try:
-            # recursively return inner fields if they exist in the form of "field.subfield"
-            expr = jsonpath_ng.parse(path)
-            matches = [match.value for match in expr.find(i)]
-            if not matches:
+            ret = compiled.get(i)
+            if ret is accessor.MISSING:
                 if default is not None:
                     return default
                 raise KeyError(f"Path '{path}' not found in the dictionary.")
-            ret = matches[0]
             #ret = DikDik.get_path(i, path)
             if change_map and ret in change_map.keys():
                 return change_map[ret]
@@ -104,31 +154,99 @@ def extract_change(path: str, change_map: Dict[str, str] | None = None, default:
     return f
 
 
-def extract_date(field_name: str, format: str = "%Y-%m-%dT%H:%M:%SZ", tz: timezone | None = None) -> Callable[[Dict], str]:
+@functools.lru_cache(maxsize=65536)
+def parse_date(value: str, format: str = "%Y-%m-%dT%H:%M:%SZ") -> float | None:
     """
-    Converts a date string from a dictionary into a human-readable relative time format.
-      - item_name (str): The key in the dictionary containing the date string.
-      - format (str, optional): The format of the date string. Defaults to "%Y-%m-%dT%H:%M:%SZ".
-      - tz (timezone, optional): The timezone to use for the current time. Defaults to None.
-      - Callable[[Dict], Any]: A function that takes a dictionary and returns a human-readable relative time string.
+    Parse a timestamp once into epoch seconds, None if it does not match: ISO 8601 strings go through
+    datetime.fromisoformat, anything else through strptime with format. Naive times are UTC.
     """
-    def f(i: dict) -> str:
-      expr = jsonpath_ng.parse(field_name)
-      val = [match.value for match in expr.find(i)][0]
-
-      #val = DikDik.get_path(i, field_name)
-      duration = datetime.now(tz) - datetime.strptime(val, format)
-      date = {}
-      date["d"], remaining = divmod(duration.total_seconds(), 86_400)
-      date["h"], remaining = divmod(remaining, 3_600)
-      date["m"], date["s"] = divmod(remaining, 60)
-
-      time_parts = [f"{round(value)}{name}" for name,
-                    value in date.items() if value > 0]
-      if time_parts:
-          return " ".join(time_parts) + " ago"
-      else:
-          return f"{date['s']}s ago"
+    try:
+        t = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            t = datetime.strptime(value, format)
+        except ValueError:
+            return None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+
+def current_time() -> float:
+    """The pinned time of the current now_snapshot, else the current time"""
+    now = _now.get()
+    return time.time() if now is None else now
+
+
+@contextlib.contextmanager
+def now_snapshot(now: float | None = None) -> Iterator[float]:
+    """
+    Pin the current time (epoch seconds) for the relative dates rendered inside the block, so all the rows agree.
+    apply() takes one snapshot per pass, an enclosing snapshot is kept.
+    """
+    if now is None and _now.get() is not None:
+        yield current_time()
+        return
+    token = _now.set(time.time() if now is None else now)
+    try:
+        yield current_time()
+    finally:
+        _now.reset(token)
+
+
+@functools.lru_cache(maxsize=4096)
+def _relative(seconds: int) -> str:
+    d, remaining = divmod(seconds, 86_400)
+    h, remaining = divmod(remaining, 3_600)
+    m, s = divmod(remaining, 60)
+    parts = [(d, "d"), (h, "h"), (m, "m"), (s, "s")]
+    first = next((n for n, (value, _) in enumerate(parts) if value), len(parts) - 1)
+    shown = [f"{value}{name}" for value, name in parts[first:first + 2] if value]
+    return " ".join(shown or ["0s"]) + " ago"
+
+
+def relative_date(seconds: float) -> str:
+    """
+    A human-readable age with its two most significant units (3d 4h ago, 5m 12s ago).
+    Ages are bucketed to the second unit shown, so the strings are built once per bucket.
+    """
+    seconds = max(int(seconds), 0)
+    if seconds >= 86_400:
+        seconds -= seconds % 3_600
+    elif seconds >= 3_600:
+        seconds -= seconds % 60
+    return _relative(seconds)
+
+
+@functools.lru_cache(maxsize=65536)
+def _absolute(when: float, tz: timezone | None) -> str:
+    return datetime.fromtimestamp(when, tz or timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def extract_date(field_name: str, format: str = "%Y-%m-%dT%H:%M:%SZ", tz: timezone | None = None, mode: str = DATE_RELATIVE) -> Callable[[Dict], Any]:
+    """
+    Converts a date string from a dictionary into a human-readable relative time, an ISO 8601 time or epoch seconds.
+    Every distinct string is parsed once, relative times are measured from the now_snapshot of the apply pass.
+      - field_name (str): The key in the dictionary containing the date string.
+      - format (str, optional): The format of the date string when it is not ISO 8601. Defaults to "%Y-%m-%dT%H:%M:%SZ".
+      - tz (timezone, optional): The timezone of the absolute times. Defaults to UTC.
+      - mode (str, optional): relative (3d 4h ago), absolute (2025-01-01T10:00:00Z) or epoch (1735725600). Defaults to relative.
+      - Callable[[Dict], Any]: A function that takes a dictionary and returns the rendered time, "" if it is missing or invalid.
+    """
+    if mode not in DATE_MODES:
+        raise ValueError(f"Invalid date mode {mode}, valid modes: {', '.join(DATE_MODES)}")
+    path = accessor.compile(field_name)
+
+    def f(i: dict) -> Any:
+        val = path(i)
+        when = parse_date(val, format) if isinstance(val, str) else None
+        if when is None:
+            return ""
+        if mode == DATE_EPOCH:
+            return int(when)
+        if mode == DATE_ABSOLUTE:
+            return _absolute(when, tz)
+        return relative_date(current_time() - when)
     return f
 
 
@@ -147,9 +265,10 @@ def extract_decorate(field_name: str, color_map: dict | None = None, default_col
     Returns:
     - Callable: A function that takes a dictionary and returns the transformed field value as a string.
     """
+    path = accessor.compile(field_name)
+
     def f(i: dict) -> str:
-        expr = jsonpath_ng.parse(field_name)
-        item = [match.value for match in expr.find(i)][0]
+        item = path.find(i)[0]
         #item = DikDik.get_path(i, field_name)
 
         if not item:
@@ -191,9 +310,10 @@ def extract_assignees(color: str = "magenta") -> Callable[[dict], str]:
 
 
 def extract_alerts(field_name, alert_fields: list[str] = ["id", "summary", "created_at", "status"]):
+    path = accessor.compile(field_name)
+
     def f(i: dict) -> str:
-        expr = jsonpath_ng.parse(field_name)
-        alerts = [match.value for match in expr.find(i)][0]
+        alerts = path.find(i)[0]
         # alerts = DikDik.get_path(i, field_name)
         ret = dict()
         for alert in alerts:
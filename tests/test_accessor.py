@@ -0,0 +1,51 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+import jsonpath_ng
+import pytest
+from pdh import accessor
+
+incs = json.load(open("./tests/incidents_list.json"))
+items = incs + [{"service": None}, {"service": "a string"}, {"service": [{"summary": "in a list"}]}, {"incident_key": None}, {}]
+
+
+@pytest.mark.parametrize("path", ["id", "service.summary", "service.summary.missing", "incident_key", "first_trigger_log_entry.self",
+                                  "assignments[0].assignee.summary", "assignments[*].assignee.id", "teams[0].id"])
+def test_same_matches_as_jsonpath(path):
+    expr = jsonpath_ng.parse(path)
+    compiled = accessor.compile(path)
+    for item in items:
+        assert compiled.find(item) == [m.value for m in expr.find(item)]
+
+
+def test_plain_paths():
+    assert accessor.is_plain("service.summary")
+    assert accessor.is_plain("body.cef_details-x")
+    assert not accessor.is_plain("assignments[0].id")
+    assert not accessor.is_plain("alerts.0.id")
+    assert not accessor.is_plain("a.where")
+    assert accessor.compile("service.summary") is accessor.compile("service.summary")
+
+
+def test_get():
+    p = accessor.compile("service.summary")
+    assert p(incs[0]) == "SAAS low priority"
+    assert p({}) is None
+    assert p({}, "default") == "default"
+    assert p.get({}) is accessor.MISSING
+    assert p.get({"service": {"summary": None}}) is None
+    assert accessor.compile("assignments[0].assignee.id")({"assignments": []}, "none") == "none"
@@ -0,0 +1,201 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, List
+import pytest
+from pdh import metrics
+from pdh.config import Config
+from pdh.pd import UnauthorizedException
+
+httpx = pytest.importorskip("httpx")
+from pdh.aio import AsyncPagerDuty  # noqa: E402
+
+
+class FakeAPI(object):
+    """Serve incidents and users from the test fixtures, recording the requests"""
+
+    def __init__(self) -> None:
+        with open("tests/incidents_list.json") as f:
+            self.incidents: List[Dict] = json.load(f)
+        with open("tests/users_list.json") as f:
+            self.users: List[Dict] = json.load(f)
+        self.services: List[Dict] = [{"id": "S1", "name": "Cassandra prod"}, {"id": "S2", "name": "Web"}]
+        self.requests: List[httpx.Request] = []
+        self.throttle = 0
+        self.failures: Dict[str, List] = {}
+
+    def page(self, request: httpx.Request, wrapper: str, items: List) -> httpx.Response:
+        offset = int(request.url.params.get("offset", 0))
+        limit = int(request.url.params.get("limit", 100))
+        return httpx.Response(200, json={wrapper: items[offset:offset + limit], "more": offset + limit < len(items)})
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+        if self.throttle > 0:
+            self.throttle -= 1
+            return httpx.Response(429, headers={"Retry-After": "0.01"})
+        if self.failures.get(path):
+            failure = self.failures[path].pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, json={"error": "failed"})
+        if path == "/incidents" and request.method == "GET":
+            return self.page(request, "incidents", self.incidents)
+        if path == "/incidents" and request.method == "PUT":
+            return httpx.Response(200, json={"incidents": json.loads(request.content)["incidents"]})
+        if path == "/users":
+            return self.page(request, "users", self.users)
+        if path == "/services":
+            return self.page(request, "services", self.services)
+        if path == "/log_entries":
+            entries = [{"incident": {"id": i["id"]}} for i in self.incidents for _ in range(3)]
+            return self.page(request, "log_entries", entries + [{"type": "other"}])
+        if path.startswith("/incidents/"):
+            inc = [i for i in self.incidents if i["id"] == path.split("/")[2]]
+            return httpx.Response(200, json={"incident": inc[0]}) if inc else httpx.Response(404, json={"error": "not found"})
+        if path == "/users/me":
+            return httpx.Response(401, json={"error": "unauthorized"})
+        return httpx.Response(404, json={})
+
+
+@pytest.fixture
+def config(tmp_path) -> Config:
+    c = Config()
+    c.from_dict({"apikey": "y_NbAkKc66ryYTWUXYEu", "email": "user@domain.tld", "uid": "PXCT22H", "cache_dir": str(tmp_path)})
+    return c
+
+
+@pytest.fixture
+def api() -> FakeAPI:
+    return FakeAPI()
+
+
+def run(config: Config, api: FakeAPI, f):
+    async def main():
+        async with AsyncPagerDuty(config, transport=httpx.MockTransport(api)) as pd:
+            return await f(pd)
+    return asyncio.run(main())
+
+
+def test_list_paginates(config: Config, api: FakeAPI):
+    async def f(pd):
+        return [i async for i in pd.session.iter_all("incidents", page_size=2)]
+
+    incs = run(config, api, f)
+    assert [i["id"] for i in incs] == [i["id"] for i in api.incidents]
+    assert len(api.requests) == (len(api.incidents) + 1) // 2
+    assert api.requests[0].headers["Authorization"] == "Token token=y_NbAkKc66ryYTWUXYEu"
+
+
+def test_list_params(config: Config, api: FakeAPI):
+    incs = run(config, api, lambda pd: pd.incidents.list(statuses=["triggered"], services=["S1", "S2"]))
+    assert len(incs) == len(api.incidents)
+    assert api.requests[0].url.params.get_list("service_ids[]") == ["S1", "S2"]
+
+
+def test_get_many(config: Config, api: FakeAPI):
+    ids = [api.incidents[0]["id"], "MISSING"]
+    results = run(config, api, lambda pd: pd.incidents.get_many(ids))
+    assert [r.id for r in results] == ids
+    assert results[0].ok and results[0].value["id"] == ids[0]
+    assert not results[1].ok and results[1].status == 404
+
+
+def test_bulk_update(config: Config, api: FakeAPI):
+    incs = [{"id": i["id"], "type": "incident_reference"} for i in api.incidents]
+    results = run(config, api, lambda pd: pd.incidents.resolve(incs))
+    assert all(r.ok for r in results)
+    assert all(r.value["status"] == "resolved" for r in results)
+
+
+def test_throttled_requests_are_retried(config: Config, api: FakeAPI):
+    registry = metrics.Registry()
+    api.throttle = 1
+
+    async def f(pd):
+        pd.session.metrics = registry
+        return await pd.incidents.get(api.incidents[0]["id"])
+
+    assert run(config, api, f)["id"] == api.incidents[0]["id"]
+    assert registry.summary()[0]["endpoint"] == "GET /incidents/{id}"
+    assert registry.summary()[0]["retries"] == 1
+
+
+def test_users_cached(config: Config, api: FakeAPI):
+    async def f(pd):
+        first = await pd.users.id_by_email(api.users[0]["email"])
+        again = await pd.users.list()
+        return first, again
+
+    ids, users = run(config, api, f)
+    assert ids[0] == api.users[0]["id"]
+    assert len(users) == len(api.users)
+    assert len([r for r in api.requests if r.url.path == "/users"]) == 1
+
+
+def test_unauthorized(config: Config, api: FakeAPI):
+    async def f(pd):
+        return await pd.me
+
+    with pytest.raises(UnauthorizedException):
+        run(config, api, f)
+
+
+def test_bulk_update_retries(config: Config, api: FakeAPI, monkeypatch):
+    attempts: List[int] = []
+
+    def backoff(attempt: int) -> float:
+        attempts.append(attempt)
+        return 0.001
+
+    monkeypatch.setattr("pdh.pd.backoff", backoff)
+    api.failures["/incidents"] = [503, 503]
+    incs = [{"id": i["id"], "type": "incident_reference"} for i in api.incidents]
+    results = run(config, api, lambda pd: pd.incidents.resolve(incs))
+    assert all(r.ok for r in results)
+    # the failed chunk is sent again after the backoff of every retry
+    assert attempts == [0, 1]
+
+
+def test_changed_since(config: Config, api: FakeAPI):
+    results = run(config, api, lambda pd: pd.incidents.changed_since(datetime.now(timezone.utc)))
+    assert results == [i["id"] for i in api.incidents]
+
+
+def test_services_match(config: Config, api: FakeAPI):
+    async def f(pd):
+        first = await pd.services.match("Cassandra")
+        api.services.append({"id": "S3", "name": "Cassandra staging"})
+        # a recent catalog is trusted, unless nothing matches
+        return first, await pd.services.match("Cassandra"), await pd.services.match("staging")
+
+    assert run(config, api, f) == (["S1"], ["S1"], ["S3"])
+    assert len([r for r in api.requests if r.url.path == "/services"]) == 2
+
+
+def test_me_network_error(config: Config, api: FakeAPI):
+    api.failures["/users/me"] = [httpx.ConnectError("unreachable")]
+
+    async def f(pd):
+        pd.session.max_network_attempts = 1
+        return await pd.me
+
+    # as the synchronous client: no user rather than a transport error
+    assert run(config, api, f) == {}
@@ -0,0 +1,90 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import time
+from pdh.cache import DirectoryCache
+from pdh.config import Config
+
+users = [{"id": "U1", "name": "Alice"}, {"id": "U2", "name": "Bob"}]
+
+
+def test_store_and_load(tmp_path):
+    c = DirectoryCache(str(tmp_path / "cache.db"))
+    assert c.load("users") is None
+    c.store("users", users)
+    assert c.load("users") == users
+    assert c.get("users", "U2") == {"id": "U2", "name": "Bob"}
+    assert c.get("users", "U3") is None
+
+
+def test_persisted(tmp_path):
+    DirectoryCache(str(tmp_path / "cache.db")).store("teams", users)
+    assert DirectoryCache(str(tmp_path / "cache.db")).load("teams") == users
+
+
+def test_expired(tmp_path, mocker):
+    c = DirectoryCache(str(tmp_path / "cache.db"), ttls={"users": 10})
+    c.store("users", users)
+    mocker.patch("pdh.cache.time.time", return_value=time.time() + 11)
+    assert c.load("users") is None
+
+
+def test_disabled(tmp_path):
+    c = DirectoryCache(str(tmp_path / "cache.db"), ttls={"services": 0})
+    c.store("services", users)
+    assert c.load("services") is None
+
+
+def test_clear_and_stats(tmp_path):
+    c = DirectoryCache(str(tmp_path / "cache.db"))
+    c.store("users", users)
+    c.store("teams", users)
+    c.clear(["users"])
+    stats = {s["directory"]: s for s in c.stats()}
+    assert stats["users"]["entries"] == 0
+    assert not stats["users"]["fresh"]
+    assert stats["teams"]["entries"] == 2
+    assert stats["teams"]["fresh"]
+
+
+def test_for_config(tmp_path):
+    cfg = Config()
+    cfg.from_dict({"apikey": "key", "cache_dir": str(tmp_path), "cache_ttl": {"users": 5}})
+    c = DirectoryCache.for_config(cfg)
+    assert os.path.dirname(c.path) == str(tmp_path)
+    assert c.ttls["users"] == 5
+    assert c.ttls["teams"] == 86_400
+
+
+def test_private_files(tmp_path):
+    c = DirectoryCache(str(tmp_path / "pdh" / "key.db"))
+    assert os.stat(tmp_path / "pdh").st_mode & 0o777 == 0o700
+    assert os.stat(c.path).st_mode & 0o777 == 0o600
+
+
+def test_for_config_unavailable(tmp_path, capsys):
+    # the cache directory can't be created: a file is in the way
+    (tmp_path / "file").write_text("")
+    cfg = Config()
+    cfg.from_dict({"apikey": "key", "cache_dir": str(tmp_path / "file" / "pdh")})
+    c = DirectoryCache.for_config(cfg)
+    assert c.path == ":memory:"
+    c.store("users", [{"id": "A"}])
+    assert c.load("users") == [{"id": "A"}]
+    assert "unavailable" in capsys.readouterr().err
+    DirectoryCache.for_config(cfg)
+    assert capsys.readouterr().err == ""
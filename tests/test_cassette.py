@@ -0,0 +1,134 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import io
+import json
+import threading
+from typing import List
+import pytest
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from pdh import cassette, pd
+from pdh.config import Config
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, responses: List[Response]) -> None:
+        super().__init__()
+        self.responses = responses
+
+    def send(self, request, **kwargs) -> Response:
+        r = self.responses.pop(0)
+        r.request = request
+        return r
+
+    def close(self) -> None:
+        pass
+
+
+def response(status: int, body: dict) -> Response:
+    r = Response()
+    r.status_code = status
+    r.raw = io.BytesIO(json.dumps(body).encode())
+    r.headers.update({"Content-Type": "application/json", "Authorization": "secret"})
+    return r
+
+
+def request(method: str, url: str, body: bytes | None = None) -> PreparedRequest:
+    r = PreparedRequest()
+    r.prepare(method=method, url=url, data=body)
+    return r
+
+
+def test_key_ignores_host_and_query_order():
+    assert cassette.key("get", "https://api.pagerduty.com/incidents?b=2&a=1") == ("GET", "/incidents?a=1&b=2", "")
+    assert cassette.key("PUT", "https://example.com/incidents", b'{"a": 1}') == ("PUT", "/incidents", '{"a": 1}')
+
+
+@pytest.mark.parametrize("name", ["cassette.jsonl", "cassette.jsonl.gz"])
+def test_record_and_replay(tmp_path, name):
+    path = str(tmp_path / name)
+    inner = FakeAdapter([response(200, {"n": 1}), response(200, {"n": 2}), response(404, {"error": "not found"})])
+    rec = cassette.RecordingAdapter(path, inner=inner)
+    rec.send(request("GET", "https://api.pagerduty.com/incidents?offset=0&limit=100"))
+    rec.send(request("GET", "https://api.pagerduty.com/incidents?limit=100&offset=0"))
+    rec.send(request("PUT", "https://api.pagerduty.com/incidents/X", b'{"status": "resolved"}'))
+    rec.close()
+
+    sleeps: List[float] = []
+    replay = cassette.ReplayAdapter(path, latency=0.2, sleep=sleeps.append)
+    r = replay.send(request("GET", "https://api.pagerduty.com/incidents?limit=100&offset=0"))
+    assert r.json() == {"n": 1}
+    assert r.headers["content-type"] == "application/json"
+    assert "authorization" not in r.headers
+    assert replay.send(request("GET", "https://api.pagerduty.com/incidents?limit=100&offset=0")).json() == {"n": 2}
+    # exhausted: the last answer is repeated
+    assert replay.send(request("GET", "https://api.pagerduty.com/incidents?limit=100&offset=0")).json() == {"n": 2}
+    r = replay.send(request("PUT", "https://api.pagerduty.com/incidents/X", b'{"status": "resolved"}'))
+    assert r.status_code == 404
+    assert sleeps == [0.2] * 4
+
+    with pytest.raises(cassette.CassetteError):
+        replay.send(request("PUT", "https://api.pagerduty.com/incidents/Y", b'{"status": "resolved"}'))
+
+
+def test_from_env(tmp_path):
+    path = str(tmp_path / "c.jsonl")
+    assert cassette.from_env({}) is None
+    assert isinstance(cassette.from_env({cassette.RECORD_ENV: path}), cassette.RecordingAdapter)
+    replay = cassette.from_env({cassette.REPLAY_ENV: path, cassette.LATENCY_ENV: "0.5"})
+    assert isinstance(replay, cassette.ReplayAdapter)
+    assert replay.latency == 0.5
+
+
+def test_pagerduty_replay(tmp_path, monkeypatch):
+    path = tmp_path / "c.jsonl"
+    path.write_text(json.dumps({
+        "method": "GET",
+        "url": "/users/me",
+        "body": "",
+        "status": 200,
+        "headers": {"content-type": "application/json"},
+        "response": json.dumps({"user": {"id": "PXCT22H"}}),
+    }) + "\n")
+    monkeypatch.setenv(cassette.REPLAY_ENV, str(path))
+    c = Config()
+    c.from_dict({"apikey": "x", "email": "user@domain.tld", "uid": "PXCT22H", "cache_dir": str(tmp_path), "cache_ttl": {"session": 0}})
+    p = pd.PagerDuty(c)
+    assert p.me == {"id": "PXCT22H"}
+
+
+@pytest.mark.parametrize("name", ["cassette.jsonl", "cassette.jsonl.gz"])
+def test_record_many_writers(tmp_path, name):
+    path = str(tmp_path / name)
+    # clients of many accounts and rules record to the same cassette, some of them never closed
+    recorders = [cassette.RecordingAdapter(path, inner=FakeAdapter([response(200, {"n": n}) for n in range(20)])) for _ in range(4)]
+
+    def record(n: int) -> None:
+        for i in range(20):
+            recorders[n].send(request("GET", f"https://api.pagerduty.com/incidents/{n}-{i}"))
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    recorders[0].close()
+    recorders[0].close()
+
+    replay = cassette.ReplayAdapter(path)
+    assert sum(len(e) for e in replay.exchanges.values()) == 80
+    assert replay.send(request("GET", "https://api.pagerduty.com/incidents/3-19")).json() == {"n": 19}
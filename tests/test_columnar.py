@@ -0,0 +1,89 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+import re
+import pytest
+from pdh.filters import Filter
+
+pytest.importorskip("numpy")
+
+from pdh.columnar import Columns, Frame  # noqa: E402
+
+incs = json.load(open("./tests/incidents_list.json"))
+FIELDS = ["id", "status", "urgency", "service.summary", "created_at", "incident_number", "title"]
+
+
+@pytest.fixture
+def frame():
+    return Frame.from_items(incs, FIELDS)
+
+
+def ids(items):
+    return [i["id"] for i in items]
+
+
+@pytest.mark.parametrize("columnar,row", [
+    (Columns.eq("status", "triggered"), Filter.eq("status", "triggered")),
+    (Columns.eq("status", "unknown"), Filter.eq("status", "unknown")),
+    (Columns.eq("incident_number", incs[0]["incident_number"]), Filter.eq("incident_number", incs[0]["incident_number"])),
+    (Columns.inList("urgency", ["high", "other"]), Filter.inList("urgency", ["high", "other"])),
+    (Columns.regexp("service.summary", "(?i)prod"), Filter.regexp("service.summary", re.compile("(?i)prod"))),
+    (Columns.not_regexp("title", "a"), Filter.not_regexp("title", re.compile("a"))),
+    (Columns.ge("created_at", incs[1]["created_at"]), Filter.ge("created_at", incs[1]["created_at"])),
+    (Columns.lt("incident_number", incs[1]["incident_number"]), Filter.lt("incident_number", incs[1]["incident_number"])),
+])
+def test_same_rows_as_filters(frame, columnar, row):
+    assert ids(frame.apply([columnar])) == ids(Filter.apply(incs, [row]))
+
+
+def test_sort_and_items(frame):
+    expected = sorted(incs, key=lambda i: (i["service"]["summary"], i["created_at"]))
+    assert ids(frame.sort(["service.summary", "created_at"]).items()) == ids(expected)
+    latest = frame.sort("created_at", reverse=True).items(limit=2)
+    assert ids(latest) == ids(sorted(incs, key=lambda i: i["created_at"], reverse=True))[:2]
+    assert latest[0] is next(i for i in incs if i["id"] == latest[0]["id"])
+
+
+def test_counts(frame):
+    counts = frame.counts("service.summary", "urgency")
+    assert sum(c["count"] for c in counts) == len(incs)
+    for c in counts:
+        assert c["count"] == len([i for i in incs if i["service"]["summary"] == c["service.summary"] and i["urgency"] == c["urgency"]])
+    assert [c["count"] for c in counts] == sorted((c["count"] for c in counts), reverse=True)
+    assert frame.apply([Columns.eq("status", "unknown")]).counts("status") == []
+
+
+def test_missing_values():
+    items = [{"status": "triggered", "created_at": "2025-01-01T00:00:00Z", "n": 1}, {"created_at": None}, {}]
+    f = Frame.from_items(items, ["status", "created_at", "n"])
+    assert len(f.apply([Columns.eq("status", None)])) == 0
+    assert len(f.apply([Columns.ge("created_at", "2024-12-31T00:00:00+02:00")])) == 1
+    assert len(f.apply([Columns.regexp("status", ".*")])) == 1
+    assert f.counts("status") == [{"status": None, "count": 2}, {"status": "triggered", "count": 1}]
+    with pytest.raises(KeyError):
+        f.apply([Columns.eq("urgency", "high")])
+
+
+def test_missing_values_in_object_columns():
+    items = [{"title": "b", "n": 2}, {"title": None}, {"title": "a", "n": 1}, {"title": "b"}, {"title": ["a list"]}]
+    f = Frame.from_items(items, ["title", "n"])
+    # missing first, then the values in order
+    assert [i.get("title") for i in f.sort("title").items()] == [None, ["a list"], "a", "b", "b"]
+    assert [i.get("title") for i in f.sort(["title", "n"], reverse=True).items()][:2] == ["b", "b"]
+    assert f.counts("title") == [{"title": "b", "count": 2}, {"title": "a", "count": 1},
+                                 {"title": ["a list"], "count": 1}, {"title": None, "count": 1}]
+    assert f.apply([Columns.eq("title", "b")]).counts("title") == [{"title": "b", "count": 2}]
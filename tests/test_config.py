@@ -15,6 +15,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 from json.decoder import JSONDecodeError
+import pytest
 from pdh import config
 import tempfile
 import json
@@ -189,3 +190,23 @@ def test_load_and_validate():
 
     assert "uid" in config.config
     assert config.config["uid"] == "UI"
+
+
+def test_accounts():
+    cfg = config.Config()
+    cfg.from_dict(dict(valid_config, workers=4, accounts={"staging": {"apikey": "STAGING", "uid": "UID2"}}))
+
+    assert cfg.accounts() == [config.DEFAULT_ACCOUNT, "staging"]
+    staging = cfg.account("staging")
+    assert staging["apikey"] == "STAGING"
+    assert staging["uid"] == "UID2"
+    # settings not overridden are inherited from the top level
+    assert staging["email"] == valid_config["email"]
+    assert staging["workers"] == 4
+    assert "accounts" not in staging
+    assert cfg.account(config.DEFAULT_ACCOUNT)["apikey"] == "APIKEY"
+
+    assert list(cfg.select("all")) == [config.DEFAULT_ACCOUNT, "staging"]
+    assert list(cfg.select("staging")) == ["staging"]
+    with pytest.raises(ValueError):
+        cfg.select("default,prod")
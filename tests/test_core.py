@@ -24,6 +24,11 @@ from pdh.config import Config
 def mock_config():
     return MagicMock(spec=Config)
 
+@pytest.fixture(autouse=True)
+def no_daemon():
+    with patch('pdh.core.daemon.connect', return_value=None):
+        yield
+
 @pytest.fixture
 def mock_users():
     with patch('pdh.core.PagerDuty') as mock:
@@ -39,3 +44,39 @@ def test_list_user_with_fields_list(mock_config, mock_users):
     result = PDH.list_user(mock_config, 'raw', fields=fields)
     mock_users.assert_called_once()
     assert result is True
+
+def test_ack_targets_ids_only(mock_config, mock_users):
+    pd = mock_users.return_value
+    pd.incidents.ack.return_value = []
+    PDH.ack(mock_config, ["INC1", "INC2"])
+    pd.incidents.list.assert_not_called()
+    pd.incidents.ack.assert_called_once_with([{"id": "INC1", "type": "incident_reference"}, {"id": "INC2", "type": "incident_reference"}])
+
+
+def test_snooze_targets_ids_only(mock_config, mock_users):
+    pd = mock_users.return_value
+    pd.incidents.snooze.return_value = []
+    PDH.snooze(mock_config, ["INC1"], 60)
+    pd.incidents.list.assert_not_called()
+    pd.incidents.snooze.assert_called_once_with([{"id": "INC1", "type": "incident_reference"}], 60)
+
+
+def test_fan_out_tags_and_merges_accounts():
+    cfg = Config()
+    cfg.from_dict({"apikey": "A", "uid": "U", "email": "e", "accounts": {"staging": {"apikey": "B"}, "broken": {"apikey": "C"}}})
+
+    returned = []
+
+    def func(c):
+        if c["apikey"] == "C":
+            raise RuntimeError("unauthorized")
+        rows = [{"name": f"{c['apikey']}-2"}, {"name": f"{c['apikey']}-1"}]
+        returned.extend(rows)
+        return rows
+
+    rows = PDH.fan_out(cfg, "all", func, sort_key=lambda r: r["name"])
+    assert [(r["account"], r["name"]) for r in rows] == [("default", "A-1"), ("default", "A-2"), ("staging", "B-1"), ("staging", "B-2")]
+    # the objects returned by the API are not modified
+    assert all("account" not in r for r in returned)
+    # a single account is not tagged
+    assert PDH.fan_out(cfg, None, func) == [{"name": "A-2"}, {"name": "A-1"}]
@@ -0,0 +1,117 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import tempfile
+import threading
+import pytest
+from pdh import daemon
+from pdh.config import Config
+from pdh.executor import TaskResult
+
+QUERY = {"userid": None, "statuses": ["triggered"], "urgencies": ["high", "low"], "teams": None, "services": None}
+
+
+class Clock(object):
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cfg():
+    c = Config()
+    c.from_dict({"apikey": "KEY", "uid": "U", "email": "e"})
+    return c
+
+
+@pytest.fixture
+def served(mocker, cfg):
+    pd = mocker.patch("pdh.daemon.PagerDuty").return_value
+    pd.incidents.list.return_value = [{"id": "INC1", "status": "triggered", "urgency": "high"}]
+    pd.incidents.ack.return_value = [TaskResult("INC1", True, {"id": "INC1"}, None, None)]
+    clock = Clock()
+    return daemon.Daemon(cfg, max_age=10, clock=clock), pd, clock
+
+
+def test_incidents_are_served_from_snapshot(served):
+    d, pd, clock = served
+    assert d.handle({"command": "incidents", "args": {"query": QUERY}}) == {"ok": True, "result": [{"id": "INC1", "status": "triggered", "urgency": "high"}]}
+    clock.now += 5
+    d.handle({"command": "incidents", "args": {"query": QUERY}})
+    assert pd.incidents.list.call_count == 1
+    clock.now += 5
+    d.handle({"command": "incidents", "args": {"query": QUERY}})
+    assert pd.incidents.changed_since.call_count == 1
+
+
+def test_ack_invalidates_snapshots(served):
+    d, pd, clock = served
+    d.incidents(QUERY)
+    clock.now += 1
+    assert d.handle({"command": "ack", "args": {"ids": ["INC1"]}}) == {"ok": True, "result": [{"id": "INC1", "ok": True, "value": {"id": "INC1"}, "error": None, "status": None}]}
+    pd.incidents.ack.assert_called_once_with([{"id": "INC1", "type": "incident_reference"}])
+    clock.now += 1
+    d.incidents(QUERY)
+    assert pd.incidents.changed_since.call_count == 1
+
+
+def test_errors_are_returned(served):
+    d, pd, _ = served
+    pd.incidents.list.side_effect = RuntimeError("boom")
+    assert d.handle({"command": "incidents", "args": {"query": QUERY}}) == {"ok": False, "error": "boom"}
+    assert d.handle({"command": "nope"})["ok"] is False
+
+
+def test_socket_roundtrip(served, cfg):
+    d, _, _ = served
+    # unix socket paths are limited to ~100 chars, keep it short
+    with tempfile.TemporaryDirectory(dir="/tmp") as tmp:
+        cfg["socket"] = os.path.join(tmp, "run", "pdh.sock")
+        path = daemon.socket_path(cfg)
+        umask = os.umask(0o022)
+        t = threading.Thread(target=d.serve, args=(path,))
+        t.start()
+        try:
+            for _ in range(100):
+                if daemon.connect(cfg) is not None:
+                    break
+                threading.Event().wait(0.01)
+            remote = daemon.connect(cfg)
+            assert remote is not None
+            # never reachable by other users, the process umask is restored
+            assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+            assert os.stat(path).st_mode & 0o777 == 0o600
+            assert os.umask(umask) == 0o022
+            assert remote.call("incidents", query=QUERY)[0]["id"] == "INC1"
+            with pytest.raises(daemon.DaemonError):
+                remote.call("nope")
+            remote.call("stop")
+        finally:
+            d.stopped.set()
+            t.join(5)
+        assert not os.path.exists(path)
+
+
+def test_connect_without_daemon(cfg, tmp_path, monkeypatch):
+    cfg["socket"] = str(tmp_path / "missing.sock")
+    assert daemon.connect(cfg) is None
+    open(cfg["socket"], "w").close()
+    assert daemon.connect(cfg) is None
+    monkeypatch.setenv(daemon.DISABLE_ENV, "1")
+    assert daemon.connect(cfg) is None
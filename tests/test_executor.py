@@ -0,0 +1,73 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import asyncio
+from requests.models import Response
+from pagerduty import HttpError
+from pdh import executor
+
+
+def test_run_keeps_order():
+    results = executor.run(lambda x: x * 2, [3, 1, 2], workers=4)
+    assert [r.value for r in results] == [6, 2, 4]
+    assert [r.id for r in results] == [3, 1, 2]
+    assert all(r.ok for r in results)
+
+
+def test_run_collects_failures():
+    def func(item: dict):
+        if item["id"] == "B":
+            r = Response()
+            r.status_code = 404
+            raise HttpError("not found", r)
+        return item["id"]
+
+    results = executor.run(func, [{"id": "A"}, {"id": "B"}], key=lambda i: i["id"])
+    assert results[0].ok
+    assert not results[1].ok
+    assert results[1].id == "B"
+    assert results[1].status == 404
+    assert executor.failed(results) == [results[1]]
+
+
+def test_run_sequential():
+    results = executor.run(str, [1], workers=1)
+    assert results[0].value == "1"
+
+
+def test_summary():
+    results = executor.run(lambda x: 1 / x, [1, 0, 2])
+    assert executor.summary(results) == {"total": 3, "ok": 2, "failed": 1}
+
+
+def test_run_async_keeps_order_and_bounds_concurrency():
+    running = []
+    peak = []
+
+    async def f(n):
+        running.append(n)
+        peak.append(len(running))
+        await asyncio.sleep(0.001 * (5 - n))
+        running.remove(n)
+        if n == 3:
+            raise ValueError("boom")
+        return n * 2
+
+    results = asyncio.run(executor.run_async(f, range(5), workers=2))
+    assert [r.id for r in results] == [0, 1, 2, 3, 4]
+    assert [r.value for r in results if r.ok] == [0, 2, 4, 8]
+    assert results[3].error == "boom"
+    assert max(peak) <= 2
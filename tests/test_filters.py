@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
-from pdh.filters import Filter
+from pdh.filters import Filter, Plan, costed, COST_EQ
 from pdh import Transformations
 from typing import Any, List
 
@@ -104,3 +104,80 @@ def test_transformation_extract_field():
         {"afield": "this is kiwi"},
         {"afield": "this is orange"},
     ]
+
+
+def test_filter_lazy():
+    seen = []
+
+    def objects():
+        for o in ilist:
+            seen.append(o["strfield"])
+            yield o
+
+    result = Filter.apply(objects(), [Filter.ge("intfield", 20), Filter.regexp("afield", "orange")], lazy=True)
+    assert seen == []
+    assert next(result) == orange
+    assert seen == ["apple", "kiwi", "orange"]
+
+
+def test_filter_where():
+    result = Filter.apply(ilist, [Filter.where('intfield > 10 and strfield =~ /^o/')])
+    assert result == [orange]
+
+
+def test_filter_time():
+    now = 1735732800  # 2025-01-01T12:00:00Z
+    times = [{"created_at": "2025-01-01T11:30:00Z"}, {"created_at": "2025-01-01T09:00:00Z"}, {"created_at": None}, {}]
+    assert Filter.apply(times, [Filter.since("created_at", "1h", now)]) == times[:1]
+    assert Filter.apply(times, [Filter.until("created_at", "2025-01-01T10:00:00Z")]) == times[1:2]
+    assert Filter.apply(times, [Filter.older_than("created_at", "2h", now)]) == times[1:2]
+    assert Filter.time_range(times, since="now-4h", now=now) == [times[1], times[0]]
+    # in the given order, objects without a time kept on demand
+    assert Filter.apply(times, [Filter.between("created_at", "now-4h", now=now)]) == times[:2]
+    assert Filter.apply(times, [Filter.between("created_at", "1h", None, now, missing=True)]) == [times[0], times[2], times[3]]
+    assert Filter.apply(times, [Filter.between("created_at", until="2025-01-01T10:00:00Z", missing=True)]) == times[1:]
+
+
+def test_filter_groups():
+    assert Filter.apply(ilist, [Filter.any_of([Filter.eq("strfield", "kiwi"), Filter.gt("intfield", 40)])]) == [apple, kiwi]
+    assert Filter.apply(ilist, [Filter.negate(Filter.regexp("afield", "apple|kiwi"))]) == [orange]
+    assert Filter.apply(ilist, [Filter.all_of([Filter.ge("intfield", 8), Filter.negate(Filter.eq("strfield", "kiwi"))])]) == [apple, orange]
+
+
+def test_filter_apply_lazy_single_pass():
+    calls = []
+
+    def tracked(name, f):
+        def g(item):
+            calls.append(name)
+            return f(item)
+        return g
+
+    result = Filter.apply(iter(ilist), [tracked("lt", Filter.lt("intfield", 30)), tracked("eq", Filter.eq("strfield", "orange"))], lazy=True)
+    assert not isinstance(result, list)
+    assert next(result) == orange
+    # apple is rejected by the first filter and never reaches the second one
+    assert calls == ["lt", "lt", "eq", "lt", "eq"]
+
+
+def test_filter_apply_orders_by_cost():
+    calls = []
+    custom = lambda item: calls.append("custom") or True  # noqa: E731
+    regexp = Filter.regexp("afield", "this")
+
+    def eq(item):
+        calls.append("eq")
+        return item["intfield"] > 0
+
+    Filter.apply([apple], [custom, regexp, costed(eq, COST_EQ)])
+    assert calls == ["eq", "custom"]
+
+
+def test_plan_reorders_by_measured_rejections():
+    ticks = iter(range(1000))
+    rarely = Filter.eq("intfield", 42)
+    always = Filter.ieq("strfield", "kiwi")
+    plan = Plan([rarely, always], sample=3, clock=lambda: next(ticks))
+    assert list(plan.select(ilist + ilist)) == []
+    # every call takes 1 tick: the first filter spent 3 ticks for 2 rejections, the second 1 tick for 1 rejection
+    assert plan.order() == [always, rarely]
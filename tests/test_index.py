@@ -0,0 +1,61 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+from pdh.index import DirectoryIndex, normalize
+
+users = [
+    {"id": "U1", "name": "Annabel Lee", "email": "annabel@example.com"},
+    {"id": "U2", "name": "Ann", "email": "ann@example.com"},
+    {"id": "U3", "name": "Joanna Ward", "email": "jward@example.com"},
+    {"id": "U4", "name": "Zoë Ann Smith", "email": "zoe@example.com"},
+    {"id": "U5", "name": "Bob", "email": None},
+]
+
+
+def ids(items):
+    return [i["id"] for i in items]
+
+
+def test_normalize():
+    assert normalize("  Zoë   ANN ") == "zoe ann"
+    assert normalize(None) == ""
+
+
+def test_ranked_substring_search():
+    idx = DirectoryIndex(users)
+    # exact, whole word, prefix, substring
+    assert ids(idx.search("ann")) == ["U2", "U4", "U1", "U3"]
+    assert ids(idx.search("ANNABEL")) == ["U1"]
+    assert ids(idx.search("zoe")) == ["U4"]
+    assert ids(idx.search("nobody")) == []
+
+
+def test_short_query():
+    idx = DirectoryIndex(users)
+    assert ids(idx.search("b")) == ["U5", "U1"]
+    assert len(idx.search("")) == len(users)
+
+
+def test_other_keys():
+    idx = DirectoryIndex(users)
+    assert ids(idx.search("jward", "email")) == ["U3"]
+    assert ids(idx.search("U5", "id")) == ["U5"]
+
+
+def test_fuzzy():
+    idx = DirectoryIndex(users)
+    assert ids(idx.search("joana ward")) == []
+    assert ids(idx.search("joana ward", fuzzy=True)) == ["U3"]
@@ -15,6 +15,8 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import io
+import subprocess
+import sys
 from rich.console import Console
 from pdh import main
 from click import testing
@@ -37,6 +39,29 @@ def test_main_version():
     assert result.stdout == f"v{importlib.metadata.version('pdh')}\n"
 
 
+def imported_by(module: str) -> list:
+    # a fresh interpreter: this one has already imported everything
+    code = f"import sys, {module}; print(','.join(sorted(sys.modules)))"
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip().split(",")
+
+
+def test_import_is_lazy():
+    modules = imported_by("pdh.main")
+    for heavy in ["rich", "pagerduty", "jsonpath_ng", "yaml", "dikdik", "pdh.core", "pdh.pd", "pdh.filters", "pdh.transformations"]:
+        assert heavy not in modules
+    # rules load the configuration, the API client only when used
+    modules = imported_by("pdh.rules")
+    for heavy in ["pagerduty", "jsonpath_ng", "dikdik", "pdh.pd"]:
+        assert heavy not in modules
+
+
+def test_lazy_exports():
+    import pdh
+    from pdh.filters import Filter
+    assert pdh.Filters is Filter
+    assert main.PDH.__name__ == "PDH"
+
+
 def test_print_items_table():
     items = [{"Title": "text", "Url": "https://localhost"}]
     expected = "┏━━━━━━━┳━━━━━━━━━━━━━━━━━━━┓\n┃ Title ┃ Url               ┃\n┡━━━━━━━╇━━━━━━━━━━━━━━━━━━━┩\n│ text  │ https://localhost │\n└───────┴───────────────────┘\n"
@@ -87,3 +112,42 @@ def test_print_items_plain():
                       _environ={}, color_system=None)
     main.print_items(items, output="plain", console=console)
     assert console.file.getvalue() == expected
+
+
+def test_print_items_ndjson_stream():
+    consumed = []
+
+    def items():
+        for n in range(2):
+            consumed.append(n)
+            yield {"Title": f"text{n}"}
+
+    console = Console(force_terminal=True, file=io.StringIO(),
+                      _environ={}, color_system=None)
+    main.print_items(items(), output="ndjson", console=console)
+    assert console.file.getvalue() == '{"Title": "text0"}\n{"Title": "text1"}\n'
+    assert consumed == [0, 1]
+
+
+def test_by_account():
+    incs = [{"id": "A"}, {"id": "B"}, {"id": "C"}]
+    assert main.by_account(incs, lambda i: "staging" if i["id"] in "AC" else "default") == {"staging": [incs[0], incs[2]], "default": [incs[1]]}
+    assert main.by_account(incs) == {"default": incs}
+    assert all(list(i) == ["id"] for i in incs)
+
+
+def test_listed():
+    listed = main.Listed()
+    default, staging = {"id": "A"}, {"id": "A"}
+    listed.add(default, "default")
+    listed.add(staging, "staging")
+    # the same incident ID in two accounts: by object
+    assert listed(default) == "default" and listed(staging) == "staging"
+    # an incident returned by a rule: by ID
+    assert listed({"id": "A", "status": "resolved"}) == "staging"
+    assert listed({"id": "B"}) == main.DEFAULT_ACCOUNT
+    # a dict at the address of a listed one is not mistaken for it
+    listed.objects[id(other := {"id": "B"})] = ({"id": "B"}, "staging")
+    assert listed(other) == main.DEFAULT_ACCOUNT
+    listed.clear()
+    assert listed(staging) == main.DEFAULT_ACCOUNT
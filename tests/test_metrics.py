@@ -0,0 +1,95 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import io
+from typing import List
+from requests import Response
+from requests.adapters import BaseAdapter
+from pdh import metrics, scheduler
+from pdh.pd import Session
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, responses: List[Response]) -> None:
+        super().__init__()
+        self.responses = responses
+
+    def send(self, request, **kwargs) -> Response:
+        r = self.responses.pop(0)
+        r.request = request
+        return r
+
+    def close(self) -> None:
+        pass
+
+
+def response(status: int, body: bytes = b"{}", headers: dict | None = None) -> Response:
+    r = Response()
+    r.status_code = status
+    r.raw = io.BytesIO(body)
+    r.headers.update(headers or {})
+    return r
+
+
+def test_percentile():
+    assert metrics.percentile([], 50) == 0
+    values = [float(i) for i in range(1, 101)]
+    assert metrics.percentile(values, 50) == 50
+    assert metrics.percentile(values, 95) == 95
+    assert metrics.percentile(values, 99) == 99
+    assert metrics.percentile([3.0], 99) == 3
+
+
+def test_registry_summary():
+    r = metrics.Registry()
+    r.record("GET", "/incidents", 200, 0.1, size=10, page=True)
+    r.record("GET", "/incidents", 200, 0.3, retries=1, size=20, page=True, waited=0.5)
+    r.record("PUT", "/incidents", 500, 0.2)
+    r.record("GET", "/users/me", None, 1.0)
+
+    summary = {e["endpoint"]: e for e in r.summary()}
+    assert summary["GET /incidents"]["count"] == 2
+    assert summary["GET /incidents"]["pages"] == 2
+    assert summary["GET /incidents"]["bytes"] == 30
+    assert summary["GET /incidents"]["retries"] == 1
+    assert summary["GET /incidents"]["p50"] == 100
+    assert summary["GET /incidents"]["p99"] == 300
+    assert summary["GET /incidents"]["wait"] == 500
+    assert summary["GET /incidents"]["errors"] == 0
+    assert summary["PUT /incidents"]["errors"] == 1
+    assert summary["GET /users/me"]["errors"] == 1
+
+    r.reset()
+    assert r.summary() == []
+
+
+def test_session_records_requests():
+    registry = metrics.Registry()
+    session = Session("key", registry=registry)
+    s = scheduler.Scheduler(scheduler.TokenBucket(rate=100, capacity=100, sleep=lambda _: None))
+    inner = FakeAdapter([response(429, headers={"Retry-After": "0.01"}), response(200, b'{"user": {}}'), response(200, b'{"incidents": []}')])
+    session.mount("https://", scheduler.SchedulerAdapter(s, inner=inner))
+
+    session.get("/users/PXCT22H")
+    session.get("/incidents", params={"limit": 100, "offset": 0})
+
+    summary = {e["endpoint"]: e for e in registry.summary()}
+    # the throttled attempt is counted as a retry of the same request
+    assert summary["GET /users/{id}"]["count"] == 1
+    assert summary["GET /users/{id}"]["retries"] == 1
+    assert summary["GET /users/{id}"]["bytes"] == len(b'{"user": {}}')
+    assert summary["GET /users/{id}"]["pages"] == 0
+    assert summary["GET /incidents"]["pages"] == 1
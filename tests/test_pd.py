@@ -18,8 +18,11 @@ from typing import Dict, List
 import pytest
 from pytest_mock import MockerFixture
 import json
+import datetime
+import time
 
-from requests.models import Response
+from requests.models import PreparedRequest, Response
+from pagerduty import HttpError
 from pdh import pd
 from pdh.config import Config
 
@@ -54,7 +57,7 @@ class FakePD(object):
     @staticmethod
     def iter_all(*args, **kwargs) -> List:
         loaded = []
-        if args[1] == "users":
+        if args[0] == "users":
             with open("tests/users_list.json", "r") as f:
                 loaded = json.load(f)
         return loaded
@@ -69,11 +72,19 @@ class FakePD(object):
 
     @staticmethod
     def post(addr: str, json: dict) -> Response:
-        return Response()
+        r = Response()
+        r.status_code = 201
+        return r
 
     @staticmethod
-    def rput(*argv, **kwargs) -> Response:
-        return Response()
+    def put(addr: str, json: dict) -> Response:
+        r = Response()
+        r.status_code = 200
+        return r
+
+    @staticmethod
+    def rput(*argv, **kwargs):
+        return kwargs["json"] if "json" in kwargs else None
 
     @staticmethod
     def rget(*argv, **kawargs) -> List:
@@ -98,11 +109,11 @@ class FakePD(object):
 
 
 @pytest.fixture
-def config() -> Config:
+def config(tmp_path) -> Config:
     # This is the test token from https://developer.pagerduty.com/api-reference
     c = Config()
     c.from_dict({"apikey": "y_NbAkKc66ryYTWUXYEu",
-                "email": "user@domain.tld", "uid": "PXCT22H"})
+                "email": "user@domain.tld", "uid": "PXCT22H", "cache_dir": str(tmp_path)})
     return c
 
 
@@ -116,6 +127,7 @@ def incidents(mocker: MockerFixture, config: Config) -> pd.Incidents:
     mocker.patch("pagerduty.RestApiV2Client.rput", side_effect=FakePD.rput)
     mocker.patch("pagerduty.RestApiV2Client.get", side_effect=FakePD.get)
     mocker.patch("pagerduty.RestApiV2Client.post", side_effect=FakePD.post)
+    mocker.patch("pagerduty.RestApiV2Client.put", side_effect=FakePD.put)
     return pd.PagerDuty(config).incidents
 
 
@@ -129,9 +141,34 @@ def users(mocker: MockerFixture, config: Config) -> pd.Users:
     mocker.patch("pagerduty.RestApiV2Client.rput", side_effect=FakePD.rput)
     mocker.patch("pagerduty.RestApiV2Client.get", side_effect=FakePD.get)
     mocker.patch("pagerduty.RestApiV2Client.post", side_effect=FakePD.post)
+    mocker.patch("pagerduty.RestApiV2Client.put", side_effect=FakePD.put)
     return pd.PagerDuty(config).users
 
 
+def test_lazy_session(mocker: MockerFixture, config: Config):
+    rget = mocker.patch("pagerduty.RestApiV2Client.rget", side_effect=lambda path, **kw: {"path": path})
+    p = pd.PagerDuty(config)
+    assert rget.call_count == 0
+    assert p.me == {"path": "/users/me"}
+    assert p.abilities == {"path": "/abilities"}
+    assert p.me == {"path": "/users/me"}
+    assert rget.call_count == 2
+    # a new client reuses the values cached on disk
+    assert pd.PagerDuty(config).me == {"path": "/users/me"}
+    assert rget.call_count == 2
+
+
+def test_unauthorized(mocker: MockerFixture, config: Config):
+    r = Response()
+    r.status_code = 401
+    mocker.patch("pagerduty.ApiClient.request", side_effect=HttpError("unauthorized", r))
+    p = pd.PagerDuty(config)
+    with pytest.raises(pd.UnauthorizedException):
+        p.abilities
+    with pytest.raises(pd.UnauthorizedException):
+        p.me
+
+
 def test_list_incidents(incidents: pd.Incidents, config: Dict):
     incs = incidents.list()
     assert incs is not None
@@ -139,6 +176,15 @@ def test_list_incidents(incidents: pd.Incidents, config: Dict):
     assert incs[0]["assignments"][0]["assignee"]["id"] == config["uid"]
 
 
+def test_iter_incidents(incidents: pd.Incidents, mocker: MockerFixture):
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", return_value=iter([{"id": "A"}]))
+    incs = incidents.iter(["U1"], teams=["T1"])
+    assert next(incs) == {"id": "A"}
+    params = iter_all.call_args.kwargs["params"]
+    assert params["user_ids[]"] == ["U1"]
+    assert params["team_ids[]"] == ["T1"]
+
+
 def test_list_my_incidents(incidents: pd.Incidents, config: Dict):
     incs = incidents.mine()
     assert incs is not None
@@ -154,11 +200,45 @@ def test_get_incident(incidents: pd.Incidents):
     assert inc[0]["id"] == "Q0VVEEB5HX4U06"
 
 
+def test_get_many(incidents: pd.Incidents):
+    results = incidents.get_many(["Q0VVEEB5HX4U06", "MISSING"])
+    assert [r.id for r in results] == ["Q0VVEEB5HX4U06", "MISSING"]
+    assert results[0].value[0]["id"] == "Q0VVEEB5HX4U06"
+    assert results[1].value == []
+
+
+def test_changed_since(incidents: pd.Incidents, mocker: MockerFixture):
+    entries = [{"incident": {"id": "A"}}, {"incident": {"id": "B"}}, {"incident": {"id": "A"}}, {"type": "other"}]
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", return_value=entries)
+    since = datetime.datetime(2024, 6, 24, 8, 4, 18, tzinfo=datetime.timezone.utc)
+    assert incidents.changed_since(since) == ["A", "B"]
+    assert iter_all.call_args.kwargs["params"]["since"] == "2024-06-24T08:04:18Z"
+
+
+def test_changed_since_scoped(incidents: pd.Incidents, mocker: MockerFixture):
+    entries = [{"incident": {"id": "A"}, "service": {"id": "S1"}}, {"incident": {"id": "B"}, "service": {"id": "S9"}},
+               {"incident": {"id": "C"}, "service": {"id": "S2"}}, {"incident": {"id": "D"}, "service": {"id": "S1"}}]
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", side_effect=lambda url, params=None: iter(entries))
+    since = datetime.datetime(2024, 6, 24, 8, 4, 18, tzinfo=datetime.timezone.utc)
+    # the entries of other services are skipped, their incidents are not fetched
+    assert incidents.changed_since(since, teams=["T1"], services=["S1", "S2"]) == ["A", "C", "D"]
+    assert iter_all.call_args.kwargs["params"]["team_ids[]"] == ["T1"]
+    # the log stops being read past the limit
+    assert incidents.changed_since(since, limit=1) == ["A", "B"]
+
+
+def test_ack_references(incidents: pd.Incidents):
+    results = incidents.ack(pd.Incidents.references(["A", "B"]))
+    assert [r.id for r in results] == ["A", "B"]
+    assert results[0].value == {"id": "A", "type": "incident_reference", "status": pd.STATUS_ACK}
+
+
 def test_ack(incidents: pd.Incidents):
     inc = incidents.get("Q0VVEEB5HX4U06")
     assert inc is not None
-    incidents.ack(inc)
+    results = incidents.ack(inc)
     assert inc[0]["status"] == pd.STATUS_ACK
+    assert results[0].ok
 
 
 def test_resolve(incidents: pd.Incidents):
@@ -168,44 +248,180 @@ def test_resolve(incidents: pd.Incidents):
     assert inc[0]["status"] == pd.STATUS_RESOLVED
 
 
+def test_bulk_update_chunks(incidents: pd.Incidents, mocker: MockerFixture):
+    sleep = mocker.patch("pdh.pd.time.sleep")
+    calls = []
+
+    def rput(path: str, json: list):
+        calls.append([i["id"] for i in json])
+        if len(calls) == 1:
+            # first chunk fails once with a server error, then succeeds on retry
+            r = Response()
+            r.status_code = 503
+            raise HttpError("unavailable", r)
+        # the API silently skips incident "C"
+        return [i for i in json if i["id"] != "C"]
+
+    mocker.patch("pagerduty.RestApiV2Client.rput", side_effect=rput)
+    incs = [{"id": id, "type": "incident_reference", "status": pd.STATUS_TRIGGERED} for id in "ABCDE"]
+    results = incidents.bulk_update(incs, chunk_size=2, workers=1)
+    assert [r.id for r in results] == ["A", "B", "C", "D", "E"]
+    assert [r.ok for r in results] == [True, True, False, True, True]
+    assert results[2].error == "not updated"
+    assert calls == [["A", "B"], ["C", "D"], ["E"], ["A", "B"]]
+    assert sleep.call_count == 1
+
+
+def test_bulk_update_backoff(incidents: pd.Incidents, mocker: MockerFixture):
+    sleep = mocker.patch("pdh.pd.time.sleep")
+    mocker.patch("pdh.pd.random.random", return_value=0.5)
+
+    def rput(path: str, json: list):
+        raise HttpError("unavailable", None)
+
+    mock = mocker.patch("pagerduty.RestApiV2Client.rput", side_effect=rput)
+    results = incidents.bulk_update([{"id": "A"}], retries=3, workers=1)
+    assert not results[0].ok
+    assert mock.call_count == 4
+    # 0.5s doubled at every retry, a quarter of the delay added by the jitter
+    assert [c.args[0] for c in sleep.call_args_list] == [0.375, 0.75, 1.5]
+    assert pd.backoff(10) <= pd.BULK_UPDATE_MAX_BACKOFF
+    assert pd.BULK_UPDATE_MAX_BACKOFF / 2 <= pd.backoff(10)
+
+
+def test_bulk_update_client_error_not_retried(incidents: pd.Incidents, mocker: MockerFixture):
+    def rput(path: str, json: list):
+        r = Response()
+        r.status_code = 400
+        raise HttpError("bad request", r)
+
+    mock = mocker.patch("pagerduty.RestApiV2Client.rput", side_effect=rput)
+    results = incidents.ack([{"id": "A", "status": pd.STATUS_TRIGGERED}])
+    assert not results[0].ok
+    assert results[0].status == 400
+    assert mock.call_count == 1
+
+
 def test_snooze(incidents: pd.Incidents):
     inc = incidents.get("Q0VVEEB5HX4U06")
     assert inc is not None
-    incidents.snooze(inc, 6000)
-    # TODO: verify
+    results = incidents.snooze(inc, 6000)
+    assert len(results) == 1
+    assert results[0].id == "Q0VVEEB5HX4U06"
+    assert results[0].ok
+    assert results[0].status == 201
 
 
 def test_reassign(incidents: pd.Incidents, config: Dict):
     inc = incidents.get("Q0VVEEB5HX4U06")
     assert inc is not None
     # Reassign to me
-    incidents.reassign(inc, uids=["1P3E4F"])
-    # TODO: verify
-
-
-# def test_list_users(users: pd.Users, config):
-#     assert False
-
-
-# def test_get_users(users: pd.Users):
-#     assert False
-
+    results = incidents.reassign(inc, uids=["1P3E4F"])
+    assert len(results) == 1
+    assert results[0].ok
+    assert results[0].status == 200
 
-# def test_search(users: pd.Users):
-#     assert False
 
-
-# def test_filter(users: pd.Users):
-#     assert False
-
-
-# def test_userIDs(users: pd.Users):
-#     assert False
-
-
-# def test_userID_by_mail(users: pd.Users):
-#     assert False
-
-
-# def test_userID_by_name(users: pd.Users):
-#     assert False
+def test_snooze_failures(incidents: pd.Incidents, mocker: MockerFixture):
+    def post(addr: str, json: dict) -> Response:
+        r = Response()
+        r.status_code = 404 if "BROKEN" in addr else 201
+        r.request = PreparedRequest()
+        r.request.prepare(method="POST", url=f"https://api.pagerduty.com{addr}")
+        return r
+
+    mocker.patch("pagerduty.RestApiV2Client.post", side_effect=post)
+    results = incidents.snooze([{"id": "ONE"}, {"id": "BROKEN"}, {"id": "TWO"}], 600, workers=2)
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].status == 404
+
+
+def test_alerts_batch(incidents: pd.Incidents, mocker: MockerFixture):
+    def alerts(id: str):
+        if id == "BROKEN":
+            raise pd.Error("not found")
+        return [{"id": f"A-{id}"}]
+
+    mocker.patch.object(incidents, "alerts", side_effect=alerts)
+    results = incidents.alerts_batch(["ONE", "BROKEN", "TWO"], workers=3)
+    assert [r.id for r in results] == ["ONE", "BROKEN", "TWO"]
+    assert results[0].ok and results[0].value == [{"id": "A-ONE"}]
+    assert not results[1].ok and results[1].error == "not found"
+    assert results[2].ok and results[2].value == [{"id": "A-TWO"}]
+
+
+def test_services_match(mocker: MockerFixture, config: Config):
+    catalog = [{"id": "S1", "name": "Cassandra prod"}, {"id": "S2", "name": "Cassandra staging"}, {"id": "S3", "name": "Web"}]
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", side_effect=lambda *a, **kw: iter(catalog))
+    services = pd.PagerDuty(config).services
+    assert services.match("Cassandra") == ["S1", "S2"]
+    assert services.match("Cassandra", "staging") == ["S1"]
+    assert services.match(excluded_regexp="Cassandra") == ["S3"]
+    assert iter_all.call_count == 1
+    assert services.match("nothing") == []
+    # no match: the catalog is fetched again in case the service is new
+    assert iter_all.call_count == 2
+
+
+def test_services_match_refresh(mocker: MockerFixture, config: Config):
+    catalog = [{"id": "S1", "name": "Cassandra prod"}]
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", side_effect=lambda *a, **kw: iter(list(catalog)))
+    services = pd.PagerDuty(config).services
+    assert services.match("Cassandra") == ["S1"]
+    catalog.append({"id": "S2", "name": "Cassandra staging"})
+    # a new service matching nothing known yet is found
+    assert services.match("staging") == ["S2"]
+    assert iter_all.call_count == 2
+    # a recent catalog is trusted
+    assert services.match("Cassandra") == ["S1", "S2"]
+    assert iter_all.call_count == 2
+    catalog.append({"id": "S3", "name": "Cassandra dev"})
+    now = time.time()
+    mocker.patch("pdh.pd.time.time", return_value=now + pd.MATCH_MAX_AGE + 1)
+    assert services.match("Cassandra") == ["S1", "S2", "S3"]
+    assert iter_all.call_count == 3
+
+
+def test_list_incidents_by_service(incidents: pd.Incidents, mocker: MockerFixture):
+    list_all = mocker.patch("pagerduty.RestApiV2Client.list_all", return_value=[])
+    incidents.list(services=["S1"])
+    assert list_all.call_args.kwargs["params"]["service_ids[]"] == ["S1"]
+
+
+def test_list_users(users: pd.Users, mocker: MockerFixture):
+    iter_all = mocker.patch("pagerduty.RestApiV2Client.iter_all", side_effect=FakePD.iter_all)
+    assert len(users.list()) == 2
+    # the second call is served from the cache
+    assert len(users.list()) == 2
+    assert iter_all.call_count == 1
+    assert len(users.list(refresh=True)) == 2
+    assert iter_all.call_count == 2
+
+
+def test_search_index_reused(users: pd.Users, mocker: MockerFixture):
+    build = mocker.spy(pd.DirectoryIndex, "_build")
+    users.search("kyler")
+    users.search("earline")
+    assert build.call_count == 1
+    users.list(refresh=True)
+    users.search("kyler")
+    assert build.call_count == 2
+
+
+def test_get_users(users: pd.Users):
+    users.list()
+    assert users.get("PAM4FGS")["name"] == "Kyler Kuhn"
+
+
+def test_search(users: pd.Users):
+    found = users.search("kyler")
+    assert len(found) == 1
+    assert found[0]["id"] == "PAM4FGS"
+
+
+def test_userID_by_mail(users: pd.Users):
+    assert users.id_by_email("greenholt") == ["PXPGF42"]
+
+
+def test_userID_by_name(users: pd.Users):
+    assert users.id("e") == ["PXPGF42", "PAM4FGS"]
@@ -0,0 +1,116 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+from datetime import datetime, timezone
+import pytest
+from pdh.query import Query, QueryError, accessor, merge
+
+NOW = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+db = {"id": "A", "urgency": "high", "status": "triggered", "incident_number": 10, "created_at": "2025-01-01T11:00:00Z",
+      "service": {"id": "S1", "summary": "Prod DB"}, "assignments": [{"assignee": {"id": "U1"}}]}
+web = {"id": "B", "urgency": "low", "status": "acknowledged", "incident_number": 20, "created_at": "2024-12-31T09:00:00Z",
+       "service": {"id": "S2", "summary": "Web frontend"}, "assignments": []}
+incs = [db, web]
+
+
+def select(expression: str) -> list:
+    f = Query(expression).compile(NOW)
+    return [i["id"] for i in incs if f(i)]
+
+
+@pytest.mark.parametrize("expression,expected", [
+    ('urgency == "high"', ["A"]),
+    ("urgency != high", ["B"]),
+    ("service.summary =~ /db/i", ["A"]),
+    ("service.summary !~ /db/i", ["B"]),
+    ("incident_number >= 20", ["B"]),
+    ("incident_number < 20 and status == triggered", ["A"]),
+    ("status in [triggered, 'acknowledged']", ["A", "B"]),
+    ("created_at > now-2h", ["A"]),
+    ('created_at < "2025-01-01"', ["B"]),
+    ("assignments.0.assignee.id == U1", ["A"]),
+    ("missing.field == null", ["A", "B"]),
+    ("not (urgency == high or incident_number > 15)", []),
+    ("urgency == low or service.id == S1 and status == acknowledged", ["B"]),
+])
+def test_expressions(expression, expected):
+    assert select(expression) == expected
+
+
+@pytest.mark.parametrize("expression", ["", "urgency ==", "urgency high", "(urgency == high", "status in [a b]", "x =~ /(/", "urgency == high)"])
+def test_invalid_expressions(expression):
+    with pytest.raises(QueryError):
+        Query(expression)
+
+
+def test_short_circuit():
+    seen = []
+    f = Query("urgency == low and id == B").compile(NOW)
+
+    class Tracking(dict):
+        def get(self, key, default=None):
+            seen.append(key)
+            return super().get(key, default)
+
+    assert not f(Tracking(db))
+    assert seen == ["urgency"]
+
+
+def test_list_fields():
+    with open("tests/incidents_list.json") as f:
+        api = json.load(f)
+    team = api[0]["teams"][0]["id"]
+    assert [i["id"] for i in api if Query(f'teams.id == "{team}"').compile(NOW)(i)] == [i["id"] for i in api]
+    assert not any(Query(f'teams.id != "{team}"').compile(NOW)(i) for i in api)
+    assert not any(Query('teams.id in [T1, T2]').compile(NOW)(i) for i in api)
+    assert all(Query("teams.summary =~ /devops/i and assignments.assignee.id == PXCT22H").compile(NOW)(i) for i in api)
+    # the path is pushed down and still checked on every row
+    assert Query(f'teams.id == "{team}"').pushdown(NOW) == {"teams": [team]}
+    multi = {"teams": [{"id": "T1"}, {"id": "T2"}]}
+    assert Query('teams.id == "T2"').compile(NOW)(multi)
+    assert not Query('teams.id == "T3"').compile(NOW)({"teams": []})
+
+
+def test_accessor():
+    assert accessor("service.summary")(db) == "Prod DB"
+    assert accessor("assignments.3.assignee")(db) is None
+    assert accessor("service.summary.x")(db) is None
+
+
+def test_pushdown():
+    q = Query('urgency == "high" and status in [triggered, resolved] and service.id in [S1, S2] and created_at > now-2h and created_at < "2025-01-02T00:00:00Z"')
+    assert q.pushdown(NOW) == {"urgencies": ["high"], "statuses": ["triggered", "resolved"], "services": ["S1", "S2"],
+                               "since": "2025-01-01T10:00:00Z", "until": "2025-01-02T00:00:00Z"}
+    # only terms every match must satisfy
+    assert Query("urgency == high or status == triggered").pushdown(NOW) == {}
+    assert Query("not urgency == high").pushdown(NOW) == {}
+    # relative upper bounds move while watching
+    assert Query("created_at < now-1h").pushdown(NOW) == {}
+
+
+def test_merge():
+    params = {"statuses": ["triggered", "acknowledged"], "services": ["S1", "S3"]}
+    assert merge(params, {"statuses": ["triggered", "resolved"], "services": ["S1", "S2"]}) == {"statuses": ["triggered"], "services": ["S1"]}
+    assert merge(params, {"services": ["S2"]}) is None
+    # pushed down values only narrow the command line ones: inc ls -h --where 'urgency == "low"' lists nothing
+    assert merge({"urgencies": ["high"]}, {"urgencies": ["low"]}) is None
+    assert merge(params, {"statuses": ["resolved"]}) is None
+    assert merge({"urgencies": ["high", "low"], "teams": None}, {"urgencies": ["low"], "teams": ["T1"]}) == {"urgencies": ["low"], "teams": ["T1"]}
+    assert merge(params, {"urgencies": []}) is None
+    bounded = {"since": "2025-01-01T00:00:00Z", "until": "2025-02-01T00:00:00Z"}
+    assert merge(bounded, {"since": "2024-12-01T00:00:00Z", "until": "2025-01-15T00:00:00Z"}) == {"since": "2025-01-01T00:00:00Z", "until": "2025-01-15T00:00:00Z"}
@@ -0,0 +1,131 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import io
+from typing import List
+import pytest
+from pagerduty import RestApiV2Client
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from pdh import scheduler
+
+
+class FakeClock(object):
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, responses: List[Response]) -> None:
+        super().__init__()
+        self.responses = responses
+        self.sent = 0
+
+    def send(self, request, **kwargs) -> Response:
+        self.sent += 1
+        return self.responses.pop(0)
+
+    def close(self) -> None:
+        pass
+
+
+def response(status: int, headers: dict | None = None) -> Response:
+    r = Response()
+    r.status_code = status
+    r.raw = io.BytesIO()
+    r.headers.update(headers or {})
+    return r
+
+
+def test_bucket_throttles():
+    c = FakeClock()
+    b = scheduler.TokenBucket(rate=2, capacity=2, clock=c.clock, sleep=c.sleep)
+    assert b.acquire() == 0
+    assert b.acquire() == 0
+    # bucket empty: next token arrives after 1/rate seconds
+    assert b.acquire() == 0.5
+    assert c.now == 0.5
+
+
+def test_bucket_pause():
+    c = FakeClock()
+    b = scheduler.TokenBucket(rate=10, capacity=10, clock=c.clock, sleep=c.sleep)
+    b.pause(3)
+    assert b.acquire() >= 3
+    assert c.now >= 3
+
+
+def test_adapter_retries_throttled_requests():
+    c = FakeClock()
+    s = scheduler.Scheduler(scheduler.TokenBucket(rate=100, capacity=100, clock=c.clock, sleep=c.sleep))
+    inner = FakeAdapter([response(429, {"Retry-After": "2"}), response(200)])
+    adapter = scheduler.SchedulerAdapter(s, inner=inner)
+
+    r = adapter.send(PreparedRequest())
+    assert r.status_code == 200
+    assert inner.sent == 2
+    stats = s.stats()
+    assert stats["requests"] == 2
+    assert stats["throttled"] == 1
+    assert stats["waited"] >= 2
+
+
+def test_adapter_retries_are_limited():
+    c = FakeClock()
+    s = scheduler.Scheduler(scheduler.TokenBucket(rate=100, capacity=100, clock=c.clock, sleep=c.sleep))
+    inner = FakeAdapter([response(429, {"Retry-After": "1"}) for _ in range(3)])
+    adapter = scheduler.SchedulerAdapter(s, inner=inner, max_retries=2)
+    with pytest.raises(scheduler.Throttled) as e:
+        adapter.send(PreparedRequest())
+    assert e.value.response.status_code == 429
+    assert inner.sent == 3
+
+
+def test_session_does_not_retry_throttled_requests(mocker):
+    c = FakeClock()
+    s = scheduler.Scheduler(scheduler.TokenBucket(rate=100, capacity=100, clock=c.clock, sleep=c.sleep))
+    inner = FakeAdapter([response(429, {"Retry-After": "1"}) for _ in range(3)])
+    session = RestApiV2Client("key")
+    session.mount("https://", scheduler.SchedulerAdapter(s, inner=inner, max_retries=2))
+    sleep = mocker.patch("pagerduty.api_client.time.sleep")
+    # the adapter cap reaches the caller, the client doesn't sleep and retry on its own
+    with pytest.raises(scheduler.Throttled):
+        session.get("/incidents")
+    assert inner.sent == 3
+    sleep.assert_not_called()
+
+
+def test_adapter_honors_ratelimit_headers():
+    c = FakeClock()
+    s = scheduler.Scheduler(scheduler.TokenBucket(rate=100, capacity=100, clock=c.clock, sleep=c.sleep))
+    inner = FakeAdapter([response(200, {"ratelimit-remaining": "0", "ratelimit-reset": "5"}), response(200)])
+    adapter = scheduler.SchedulerAdapter(s, inner=inner)
+    adapter.send(PreparedRequest())
+    adapter.send(PreparedRequest())
+    assert c.now >= 5
+
+
+def test_shared_scheduler():
+    assert scheduler.shared("key-a") is scheduler.shared("key-a")
+    assert scheduler.shared("key-a") is not scheduler.shared("key-b")
@@ -0,0 +1,146 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+from unittest.mock import MagicMock
+from pdh.config import Config
+from pdh.executor import TaskResult
+from pdh.pd import Incidents
+from pdh.snapshot import IncidentSnapshot
+
+
+def incident(id: str, status: str = "triggered", user: str = "U1") -> dict:
+    return {"id": id, "status": status, "urgency": "high", "assignments": [{"assignee": {"id": user}}]}
+
+
+class Clock(object):
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_delta_refresh():
+    incidents = MagicMock()
+    incidents.list.return_value = [incident("A"), incident("B")]
+    clock = Clock()
+    s = IncidentSnapshot(incidents, userid=["U1"], resync=300, clock=clock)
+    assert [i["id"] for i in s.refresh()] == ["A", "B"]
+
+    # A is resolved, B is reassigned to someone else, C is new
+    incidents.changed_since.return_value = ["A", "B", "C"]
+    incidents.get_many.return_value = [
+        TaskResult("A", True, incident("A", "resolved"), None, 200),
+        TaskResult("B", True, incident("B", user="U2"), None, 200),
+        TaskResult("C", True, incident("C", "acknowledged"), None, 200),
+    ]
+    clock.now += 5
+    assert [i["id"] for i in s.refresh()] == ["C"]
+    assert incidents.list.call_count == 1
+    since = incidents.changed_since.call_args[0][0]
+    assert since.timestamp() < clock.now - 5
+
+
+def test_failed_fetch_keeps_incident():
+    incidents = MagicMock()
+    incidents.list.return_value = [incident("A")]
+    clock = Clock()
+    s = IncidentSnapshot(incidents, clock=clock)
+    s.refresh()
+    incidents.changed_since.return_value = ["A"]
+    incidents.get_many.return_value = [TaskResult("A", False, None, "boom", 500)]
+    clock.now += 5
+    assert [i["id"] for i in s.refresh()] == ["A"]
+
+
+def test_full_resync():
+    incidents = MagicMock()
+    incidents.list.return_value = [incident("A")]
+    clock = Clock()
+    s = IncidentSnapshot(incidents, resync=60, clock=clock)
+    s.refresh()
+    clock.now += 61
+    incidents.list.return_value = []
+    assert s.refresh() == []
+    assert incidents.list.call_count == 2
+    incidents.changed_since.assert_not_called()
+
+
+def test_items_are_copies():
+    incidents = MagicMock()
+    incidents.list.return_value = [incident("A")]
+    s = IncidentSnapshot(incidents, clock=Clock())
+    s.refresh()[0]["alerts"] = []
+    assert "alerts" not in s.items()[0]
+
+
+class FakeSession(object):
+    """Serve incidents and their log entries, counting the API requests (one per page of 100)"""
+
+    def __init__(self, incs: list, changed: list) -> None:
+        self.incs = {i["id"]: i for i in incs}
+        self.changed = changed
+        self.requests: list = []
+
+    def iter_all(self, url: str, params: dict | None = None):
+        items = self.changed if url.endswith("log_entries") else list(self.incs.values())
+        for n in range(0, max(len(items), 1), 100):
+            self.requests.append(url)
+            yield from items[n:n + 100]
+
+    def list_all(self, url: str, params: dict | None = None) -> list:
+        return list(self.iter_all(url, params))
+
+    def rget(self, url: str) -> dict:
+        self.requests.append(url)
+        return self.incs[url.split("/")[-1]]
+
+
+def test_many_changes_resync():
+    cfg = Config()
+    cfg.from_dict({"apikey": "x", "email": "user@domain.tld", "uid": "U1"})
+    incs = [incident(f"I{n}") for n in range(150)]
+    session = FakeSession(incs, [])
+    clock = Clock()
+    s = IncidentSnapshot(Incidents(cfg, session), resync=300, clock=clock, max_changed=20)
+    s.refresh()
+    assert session.requests == ["incidents", "incidents"]
+
+    # a few changes: fetched one by one
+    session.requests.clear()
+    session.changed = [{"incident": {"id": f"I{n}"}} for n in range(5)]
+    clock.now += 5
+    assert len(s.refresh()) == 150
+    assert session.requests == ["log_entries"] + [f"/incidents/I{n}" for n in range(5)]
+
+    # every incident changed: the log is read up to the limit, then the list is reloaded
+    session.requests.clear()
+    session.changed = [{"incident": {"id": i["id"]}} for i in incs for _ in range(2)]
+    clock.now += 5
+    assert len(s.refresh()) == 150
+    assert session.requests == ["log_entries", "incidents", "incidents"]
+
+
+def test_log_entries_scoped():
+    incidents = MagicMock()
+    incidents.list.return_value = [incident("A")]
+    clock = Clock()
+    s = IncidentSnapshot(incidents, teams=["T1"], services=["S1"], clock=clock)
+    s.refresh()
+    incidents.changed_since.return_value = []
+    clock.now += 5
+    s.refresh()
+    assert incidents.changed_since.call_args.kwargs == {"teams": ["T1"], "services": ["S1"], "limit": s.max_changed}
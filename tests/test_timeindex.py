@@ -0,0 +1,70 @@
+#
+# This file is part of the pdh (https://github.com/mbovo/pdh).
+# Copyright (c) 2020-2025 Manuel Bovo.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+from datetime import datetime, timezone
+import pytest
+from pdh.timeindex import TimeIndex, epoch, iso, parse_when, relative
+
+NOW = 1735732800  # 2025-01-01T12:00:00Z
+
+incs = [
+    {"id": "C", "created_at": "2025-01-01T11:00:00Z"},
+    {"id": "A", "created_at": "2024-12-31T09:00:00Z"},
+    {"id": "B", "created_at": "2025-01-01T08:00:00+00:00"},
+    {"id": "D", "created_at": "2025-01-01T11:00:00Z"},
+    {"id": "X", "created_at": None},
+    {"id": "Y"},
+]
+
+
+def ids(items):
+    return [i["id"] for i in items]
+
+
+@pytest.mark.parametrize("value,expected", [
+    (NOW, NOW),
+    ("1735732800", NOW),
+    ("2025-01-01T12:00:00Z", NOW),
+    ("2025-01-01", NOW - 12 * 3600),
+    (datetime(2025, 1, 1, 12, tzinfo=timezone.utc), NOW),
+    ("now", NOW),
+    ("2h", NOW - 7200),
+    ("now-2h", NOW - 7200),
+    ("now+1d", NOW + 86400),
+])
+def test_parse_when(value, expected):
+    assert parse_when(value, NOW) == expected
+
+
+def test_parse_when_invalid():
+    with pytest.raises(ValueError):
+        parse_when("yesterday", NOW)
+    assert relative("2h") and relative("now-1d") and not relative("2025-01-01")
+    assert epoch("not a date") is None and epoch(None) is None
+    assert iso(NOW) == "2025-01-01T12:00:00Z"
+
+
+def test_range():
+    index = TimeIndex(incs)
+    assert len(index) == 4
+    assert ids(index.missing) == ["X", "Y"]
+    assert ids(index.range()) == ["A", "B", "C", "D"]
+    assert ids(index.since("2025-01-01T08:00:00Z")) == ["B", "C", "D"]
+    assert ids(index.until("2025-01-01T11:00:00Z")) == ["A", "B"]
+    assert ids(index.range("now-6h", "now", now=NOW)) == ["B", "C", "D"]
+    assert ids(index.older_than("1h", now=NOW)) == ["A", "B", "C", "D"]
+    assert ids(index.older_than(3601, now=NOW)) == ["A", "B"]
+    assert index.range("2025-02-01", "2025-01-01") == []
@@ -16,6 +16,8 @@
 #
 
 from pdh import Transformations
+from dikdik import Dict as DikDik
+import pytest
 import datetime
 
 apple = {
@@ -114,3 +116,64 @@ def test_extract_assignees() -> None:
     assert result[0]["newfield"] == "[magenta]Rakhi[/magenta]"
     assert result[1]["newfield"] == "[magenta]Prasanna[/magenta]"
     assert result[2]["newfield"] == "[magenta]Michele[/magenta]"
+
+
+def test_apply_lazy() -> None:
+    result = Transformations.apply(iter(ilist), {"newfield": Transformations.extract("strfield")}, lazy=True)
+    assert next(result) == {"newfield": "apple"}
+    assert [r["newfield"] for r in result] == ["kiwi", "orange"]
+
+
+def test_projection() -> None:
+    t: dict = {"name": Transformations.extract("strfield"), "inner.value": Transformations.extract("$.dictfield.inside", "-x-")}
+    projection = Transformations.Projection(t)
+    assert projection.build != projection._flat
+    expected = []
+    for i in ilist:
+        item: dict = {}
+        for path, func in t.items():
+            DikDik.set_path(item, path, func(i))
+        expected.append(item)
+    assert Transformations.apply(ilist, projection) == expected
+    # reusable, same result as the dictionary
+    assert Transformations.apply(ilist, projection) == Transformations.apply(ilist, t) == expected
+
+
+def test_projection_flat_and_preserve() -> None:
+    flat = Transformations.Projection({"a": Transformations.extract("strfield"), "b": Transformations.extract("intfield")})
+    assert flat.build == flat._flat
+    assert flat(ilist[0]) == {"a": "apple", "b": 42}
+    obj = {"strfield": "kiwi"}
+    assert Transformations.apply([obj], {"copy.of": Transformations.extract("strfield")}, preserve=True) == [{"strfield": "kiwi", "copy": {"of": "kiwi"}}]
+
+
+def test_extract_date_modes() -> None:
+    item = {"at": "2025-01-01T10:00:00Z", "local": "2025-01-01T12:00:00+02:00", "missing": None}
+    now = 1735732800  # 2025-01-01T12:00:00Z
+    with Transformations.now_snapshot(now):
+        assert Transformations.extract_date("at")(item) == "2h ago"
+        assert Transformations.extract_date("local")(item) == "2h ago"
+        assert Transformations.extract_date("missing")(item) == ""
+    assert Transformations.extract_date("local", mode="absolute")(item) == "2025-01-01T10:00:00Z"
+    assert Transformations.extract_date("at", mode="epoch")(item) == now - 7200
+    assert Transformations.extract_date("at", "%Y-%m-%dT%H:%M:%S%z", datetime.timezone.utc)({"at": "2025-01-01T10:00:00+0000"}) != ""
+    with pytest.raises(ValueError):
+        Transformations.extract_date("at", mode="weekday")
+
+
+@pytest.mark.parametrize("seconds,expected", [
+    (0, "0s ago"), (-5, "0s ago"), (59, "59s ago"), (61, "1m 1s ago"), (3_600, "1h ago"),
+    (3_661, "1h 1m ago"), (86_400 + 3_599, "1d ago"), (3 * 86_400 + 4 * 3_600 + 59, "3d 4h ago"),
+])
+def test_relative_date_buckets(seconds, expected) -> None:
+    assert Transformations.relative_date(seconds) == expected
+
+
+def test_now_snapshot_per_pass() -> None:
+    rows = [{"at": "2025-01-01T10:00:00Z"}] * 3
+    t = {"at": Transformations.extract_date("at")}
+    with Transformations.now_snapshot(1735732800):
+        assert [r["at"] for r in Transformations.apply(rows, t)] == ["2h ago"] * 3
+        lazy = Transformations.apply(iter(rows), t, lazy=True)
+    # the lazy rows keep the time of the pass they were created in
+    assert [r["at"] for r in lazy] == ["2h ago"] * 3